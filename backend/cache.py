@@ -0,0 +1,250 @@
+"""
+Caches used by the service layer.
+
+TTLCache is the interface: get/set/delete with per-entry TTLs, counters, and
+coalescing of concurrent fetches for a missing key. Where entries live is up
+to its backend, chosen for every cache with CACHE_BACKEND:
+
+    memory  in-process LRU (default); each worker has its own copy
+    sqlite  one file shared by the workers on a host (CACHE_URL is the path)
+    redis   a Redis server shared by every replica (CACHE_URL is redis://...)
+
+Shared backends store pickled values, so the cache store must be trusted.
+Fetch coalescing stays per process. Cross-worker invalidation of writes goes
+through the bus in invalidation.py, which uses the same setting.
+
+Shared backends block on a file lock or a socket, so async code reads with
+aget/apeek/aget_many/get_or_fetch, which run them in a worker thread. Writes
+made on the event loop (set, delete, clear) go to the cache's own writer
+thread, in order, and later reads through the cache wait for them.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.environ.get("CACHE_URL", "")
+DEFAULT_SQLITE_PATH = "cache.db"
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+
+class LRUBackend:
+    """In-process storage: an OrderedDict in LRU order, trimmed to maxsize."""
+
+    shared = False
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "evictions": self.evictions}
+
+
+class TTLCache:
+    """Bounded cache with per-entry TTL and in-flight request coalescing."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend if backend is not None else LRUBackend(maxsize)
+        self._inflight = {}  # key -> asyncio.Future
+        self._writer = None  # one thread, so writes reach the backend in the order they were made
+        self._last_write = None  # future of the latest write handed to it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key):
+        return self.backend.get(key)
+
+    def _write(self, fn, *args):
+        """Runs a backend write; on the event loop, a shared backend's runs in a thread."""
+        if self.backend.shared:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writes")
+                self._last_write = loop.run_in_executor(self._writer, fn, *args)
+                return
+        fn(*args)
+
+    async def _read(self, fn, *args):
+        """Runs a backend read off the event loop (shared backends), after this cache's pending writes."""
+        if not self.backend.shared:
+            return fn(*args)
+        await self.flush()
+        return await asyncio.to_thread(fn, *args)
+
+    async def flush(self):
+        """Waits for writes this cache handed to a thread; after it, other workers see them."""
+        last_write = self._last_write
+        if last_write is not None and not last_write.done():
+            await asyncio.gather(last_write, return_exceptions=True)
+
+    def _count(self, value, default):
+        if value is MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def get(self, key, default=None):
+        """Blocking lookup, for code off the event loop; async code uses aget()."""
+        return self._count(self._lookup(key), default)
+
+    async def aget(self, key, default=None):
+        return self._count(await self._read(self._lookup, key), default)
+
+    async def apeek(self, key, default=None):
+        """Like aget(), but without touching the hit/miss counters (for background writers)."""
+        value = await self._read(self._lookup, key)
+        return default if value is MISSING else value
+
+    async def aget_many(self, keys) -> dict:
+        """{key: value} for the keys present, in one backend round trip."""
+        keys = list(keys)
+        found = await self._read(self.backend.get_many, keys) if keys else {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl: float = None):
+        self._write(self.backend.set, key, value, self.ttl if ttl is None else ttl)
+
+    def set_many(self, items: dict, ttl: float = None):
+        ttl, items = self.ttl if ttl is None else ttl, dict(items)
+
+        def write():
+            for key, value in items.items():
+                self.backend.set(key, value, ttl)
+        self._write(write)
+
+    def delete(self, key):
+        self._write(self.backend.delete, key)
+
+    def clear(self):
+        self._write(self.backend.clear)
+
+    async def get_or_fetch(self, key, fetch):
+        """
+        Returns the cached value for key, or awaits fetch() to produce it.
+        Concurrent callers for the same missing key share a single fetch.
+        Exceptions are propagated to every waiter and nothing is cached.
+        """
+        pending = self._inflight.get(key)
+        if pending is None:
+            value = await self._read(self._lookup, key)
+            if value is not MISSING:
+                self.hits += 1
+                return value
+            # A concurrent caller may have started the fetch while this one read
+            pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited isn't logged
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Returned by backend get() for absent or expired keys
+MISSING = object()
+
+
+_shared_store = None  # one per process, opened on first use
+
+
+def shared_store():
+    """The configured SQLiteStore or RedisClient, or None for the in-process backend."""
+    global _shared_store
+    if CACHE_BACKEND == "memory":
+        return None
+    if _shared_store is None:
+        try:
+            import cache_backends
+        except ImportError:
+            from backend import cache_backends
+
+        if CACHE_BACKEND == "sqlite":
+            _shared_store = cache_backends.SQLiteStore(CACHE_URL or DEFAULT_SQLITE_PATH)
+        elif CACHE_BACKEND == "redis":
+            _shared_store = cache_backends.RedisClient(CACHE_URL or DEFAULT_REDIS_URL)
+        else:
+            raise ValueError(f"unknown CACHE_BACKEND {CACHE_BACKEND!r} (expected memory, sqlite or redis)")
+    return _shared_store
+
+
+def make_cache(namespace: str, maxsize: int = 256, ttl: float = 3600.0) -> TTLCache:
+    """A TTLCache on the configured backend; namespace keeps caches apart in a shared store."""
+    store = shared_store()
+    if store is None:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    return TTLCache(maxsize=maxsize, ttl=ttl, backend=store.backend(namespace, maxsize))
@@ -0,0 +1,448 @@
+"""
+Shared cache stores: a SQLite file for the workers on one host, and a Redis
+server for several hosts. Each store hands out per-namespace TTLCache
+backends and carries the invalidation bus messages for its workers.
+
+Both are blocking and meant to sit next to the app (local file, same
+network), with short timeouts. A store that fails is treated as a miss
+and is left alone for a few seconds rather than failing requests.
+"""
+import json
+import os
+import pickle
+import random
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+try:
+    from cache import MISSING
+    from log import get_logger
+except ImportError:
+    from backend.cache import MISSING
+    from backend.log import get_logger
+
+logger = get_logger("cache")
+
+CACHE_TIMEOUT = float(os.environ.get("CACHE_TIMEOUT", "0.25"))  # seconds per Redis call / SQLite lock wait
+CACHE_RETRY_AFTER = float(os.environ.get("CACHE_RETRY_AFTER", "5.0"))
+CACHE_POLL_INTERVAL = float(os.environ.get("CACHE_POLL_INTERVAL", "0.5"))  # SQLite invalidation polling
+
+KEY_PREFIX = "rentchecker:cache:"
+INVALIDATION_CHANNEL = "rentchecker:invalidate"
+PRUNE_EVERY = 64  # SQLite writes between expiry/size sweeps of a namespace
+GET_MANY_CHUNK = 500  # keys per SQLite query, under the bound-parameter limit
+EVENT_RETENTION = 60.0  # seconds SQLite invalidation events are kept for slow pollers
+
+
+def _dumps(value) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data):
+    try:
+        return pickle.loads(data)
+    except Exception:
+        # e.g. written by an older deploy whose classes have since changed
+        return MISSING
+
+
+# --- SQLite ---
+
+class SQLiteStore:
+    """A cache file shared by the workers on one host (WAL, so readers don't wait on writers)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self.errors = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=CACHE_TIMEOUT, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires ON cache_entries (namespace, expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, channel TEXT NOT NULL, "
+            "key TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_counters ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        return conn
+
+    def execute(self, sql: str, params=()) -> list:
+        """Runs one statement and returns its rows; raises sqlite3.Error while the store is unavailable."""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise sqlite3.OperationalError("cache store unavailable")
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                return self._conn.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                self.errors += 1
+                self._down_until = time.monotonic() + CACHE_RETRY_AFTER
+                logger.warning("sqlite cache %s failed, bypassing for %gs: %s", self.path, CACHE_RETRY_AFTER, e)
+                raise
+
+    def backend(self, namespace: str, maxsize: int):
+        return SQLiteBackend(self, namespace, maxsize)
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Counts a hit on key, which lives ttl seconds from its first hit; returns the count so far."""
+        now = time.time()
+        count = self.execute(
+            "INSERT INTO rate_counters (key, count, expires_at) VALUES (?, 1, ?) "
+            "ON CONFLICT (key) DO UPDATE SET count = count + 1 RETURNING count",
+            (key, now + ttl),
+        )[0][0]
+        if count == 1 and random.random() < 1 / PRUNE_EVERY:
+            self.execute("DELETE FROM rate_counters WHERE expires_at < ?", (now,))
+        return count
+
+    def publish(self, origin: str, channel: str, key):
+        self.execute(
+            "INSERT INTO cache_events (origin, channel, key, created_at) VALUES (?, ?, ?, ?)",
+            (origin, channel, json.dumps(key), time.time()),
+        )
+
+    def listen(self, on_message, stop: threading.Event):
+        """Polls for events written by other workers until stop is set."""
+        last_id = None
+        next_prune = time.monotonic() + EVENT_RETENTION
+        while not stop.wait(0 if last_id is None else CACHE_POLL_INTERVAL):
+            try:
+                if last_id is None:
+                    # Only events published from now on
+                    last_id = self.execute("SELECT COALESCE(MAX(id), 0) FROM cache_events")[0][0]
+                    continue
+                rows = self.execute(
+                    "SELECT id, origin, channel, key FROM cache_events WHERE id > ? ORDER BY id", (last_id,)
+                )
+                for event_id, origin, channel, key in rows:
+                    last_id = event_id
+                    on_message(origin, channel, json.loads(key))
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + EVENT_RETENTION
+                    self.execute("DELETE FROM cache_events WHERE created_at < ?", (time.time() - EVENT_RETENTION,))
+            except sqlite3.Error:
+                continue
+
+    def wake(self):
+        pass  # the poll loop checks stop at least every CACHE_POLL_INTERVAL
+
+
+class SQLiteBackend:
+    """
+    One namespace of a SQLiteStore. Expired rows and anything beyond maxsize
+    (soonest to expire first) are swept every PRUNE_EVERY writes.
+    """
+
+    shared = True
+
+    def __init__(self, store: SQLiteStore, namespace: str, maxsize: int):
+        self.store = store
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._writes = 0
+
+    def get(self, key):
+        try:
+            rows = self.store.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, str(key)),
+            )
+        except sqlite3.Error:
+            return MISSING
+        if not rows or rows[0][1] < time.time():
+            return MISSING
+        return _loads(rows[0][0])
+
+    def get_many(self, keys) -> dict:
+        keys = {str(key): key for key in keys}
+        names = list(keys)
+        found, now = {}, time.time()
+        try:
+            for start in range(0, len(names), GET_MANY_CHUNK):
+                chunk = names[start:start + GET_MANY_CHUNK]
+                rows = self.store.execute(
+                    "SELECT key, value, expires_at FROM cache_entries WHERE namespace = ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})",
+                    (self.namespace, *chunk),
+                )
+                for name, data, expires_at in rows:
+                    value = _loads(data) if expires_at >= now else MISSING
+                    if value is not MISSING:
+                        found[keys[name]] = value
+        except sqlite3.Error:
+            pass
+        return found
+
+    def set(self, key, value, ttl: float):
+        try:
+            self.store.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, str(key), _dumps(value), time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % PRUNE_EVERY == 0:
+                self._prune()
+        except sqlite3.Error:
+            pass
+
+    def _prune(self):
+        self.store.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?", (self.namespace, time.time())
+        )
+        excess = self.store.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )[0][0] - self.maxsize
+        if excess > 0:
+            self.store.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY expires_at LIMIT ?)",
+                (self.namespace, self.namespace, excess),
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        try:
+            self.store.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, str(key))
+            )
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        try:
+            self.store.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        try:
+            size = self.store.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at >= ?",
+                (self.namespace, time.time()),
+            )[0][0]
+        except sqlite3.Error:
+            size = None
+        return {"size": size, "evictions": self.evictions, "errors": self.store.errors}
+
+
+# --- Redis ---
+
+class RedisError(Exception):
+    """An error reply from the server."""
+
+
+def _encode(args) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+def read_reply(reader):
+    """Parses one RESP2 reply from a buffered socket reader."""
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed")
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [read_reply(reader) for _ in range(length)]
+    raise RedisError(f"unexpected reply {line[:40]!r}")
+
+
+class RedisClient:
+    """
+    Minimal blocking RESP2 client with one connection for commands; enough for
+    GET/SET/DEL/SCAN/INCR/PUBLISH, plus a separate SUBSCRIBE connection in listen().
+    """
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"CACHE_URL must be redis://host:port/db, got {url!r}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self._sock = None
+        self._reader = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self.errors = 0
+
+    def connect(self, timeout):
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = sock.makefile("rb")
+        if self.password:
+            sock.sendall(_encode(("AUTH", self.password)))
+            read_reply(reader)
+        if self.db:
+            sock.sendall(_encode(("SELECT", self.db)))
+            read_reply(reader)
+        return sock, reader
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def execute(self, *args):
+        """Runs one command. Raises OSError (then backs off for a while) or RedisError."""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise ConnectionError("redis unavailable")
+            try:
+                if self._sock is None:
+                    self._sock, self._reader = self.connect(CACHE_TIMEOUT)
+                self._sock.sendall(_encode(args))
+                return read_reply(self._reader)
+            except OSError as e:
+                self.errors += 1
+                self._close()
+                self._down_until = time.monotonic() + CACHE_RETRY_AFTER
+                logger.warning("redis %s:%s unavailable, bypassing for %gs: %r",
+                               self.host, self.port, CACHE_RETRY_AFTER, e)
+                raise
+            except RedisError:
+                self.errors += 1
+                raise
+
+    def backend(self, namespace: str, maxsize: int):
+        return RedisBackend(self, namespace)
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Counts a hit on key, which lives ttl seconds from its first hit; returns the count so far."""
+        count = self.execute("INCR", key)
+        if count == 1:
+            self.execute("PEXPIRE", key, int(ttl * 1000))
+        return count
+
+    def publish(self, origin: str, channel: str, key):
+        self.execute("PUBLISH", INVALIDATION_CHANNEL, json.dumps([origin, channel, key]))
+
+    def listen(self, on_message, stop: threading.Event):
+        """SUBSCRIBEs on its own connection and delivers messages until stop is set; reconnects on errors."""
+        while not stop.is_set():
+            try:
+                sock, reader = self.connect(CACHE_TIMEOUT)
+                self._listener = sock
+                sock.sendall(_encode(("SUBSCRIBE", INVALIDATION_CHANNEL)))
+                read_reply(reader)
+                sock.settimeout(None)  # block until a message arrives or wake() shuts the socket
+                if stop.is_set():
+                    break
+                while True:
+                    reply = read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        origin, channel, key = json.loads(reply[2])
+                        on_message(origin, channel, key)
+            except (OSError, RedisError, ValueError) as e:
+                if not stop.is_set():
+                    logger.warning("redis invalidation listener disconnected, retrying: %r", e)
+                    stop.wait(CACHE_RETRY_AFTER)
+            finally:
+                if self._listener is not None:
+                    self._listener.close()
+                    self._listener = None
+
+    def wake(self):
+        listener = self._listener
+        if listener is not None:
+            try:
+                listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class RedisBackend:
+    """One namespace of a Redis server; expiry is left to Redis (SET ... PX)."""
+
+    shared = True
+
+    def __init__(self, client: RedisClient, namespace: str):
+        self.client = client
+        self.prefix = f"{KEY_PREFIX}{namespace}:"
+
+    def get(self, key):
+        try:
+            data = self.client.execute("GET", self.prefix + str(key))
+        except (OSError, RedisError):
+            return MISSING
+        return MISSING if data is None else _loads(data)
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        try:
+            values = self.client.execute("MGET", *(self.prefix + str(key) for key in keys))
+        except (OSError, RedisError):
+            return {}
+        found = {}
+        for key, data in zip(keys, values):
+            value = MISSING if data is None else _loads(data)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl: float):
+        try:
+            self.client.execute("SET", self.prefix + str(key), _dumps(value), "PX", max(1, int(ttl * 1000)))
+        except (OSError, RedisError):
+            pass
+
+    def delete(self, key):
+        try:
+            self.client.execute("DEL", self.prefix + str(key))
+        except (OSError, RedisError):
+            pass
+
+    def clear(self):
+        cursor = b"0"
+        try:
+            while True:
+                cursor, keys = self.client.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+                if keys:
+                    self.client.execute("DEL", *keys)
+                if cursor in (b"0", "0"):
+                    break
+        except (OSError, RedisError):
+            pass
+
+    def stats(self):
+        # Counting keys would mean a SCAN per scrape; the server's INFO has memory and evictions
+        return {"errors": self.client.errors}
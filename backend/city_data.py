@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    from log import get_logger
+except ImportError:
+    from backend.log import get_logger
+
+logger = get_logger("city_data")
+
+DEFAULT_DATA_PATH = Path(__file__).parent / "data" / "cities.json"
+
+# How often (seconds) a worker checks the snapshot file for changes
+CHECK_INTERVAL = float(os.environ.get("CITY_DATA_CHECK_INTERVAL", "30"))
+
+SECTIONS = ("market", "images", "areas", "listings", "quality_of_life")
+
+
+def normalize_city(city_name: str) -> str:
+    return " ".join(city_name.lower().split())
+
+
+def _rent_stats(market: dict) -> dict:
+    return {
+        "average_rent": market["avg"],
+        "market_growth": market["growth"],
+        "rental_yield": market["yield"],
+        "range_low": int(market["avg"] * 0.8),
+        "range_high": int(market["avg"] * 1.3),
+        "currency": "₹"
+    }
+
+
+class CitySnapshot:
+    """
+    One immutable, fully resolved version of the city data.
+    Every city carries all sections, so reads are a single dict lookup.
+    Returned dicts/lists are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, raw: dict, mtime: float = 0.0):
+        self.version = raw.get("version", 0)
+        self.mtime = mtime
+        default = raw["default"]
+        self.default = self._resolve(default, default)
+        self.cities = {key: self._resolve(sections, default) for key, sections in raw.get("cities", {}).items()}
+        self.aliases = {normalize_city(alias): key for alias, key in raw.get("aliases", {}).items()}
+
+    @staticmethod
+    def _resolve(sections: dict, default: dict) -> dict:
+        resolved = {name: sections.get(name, default[name]) for name in SECTIONS}
+        resolved["rent_stats"] = _rent_stats(resolved["market"])
+        return resolved
+
+    def canonical_key(self, city_name: str):
+        """Maps a user-supplied city name to its canonical key, or None if unknown."""
+        key = normalize_city(city_name)
+        if key in self.cities:
+            return key
+        if key in self.aliases:
+            return self.aliases[key]
+        # Tolerate qualifiers such as "Bengaluru Urban" or "Greater Hyderabad"
+        for word in key.split():
+            canonical = word if word in self.cities else self.aliases.get(word)
+            if canonical:
+                return canonical
+        return None
+
+    def get(self, city_name: str) -> dict:
+        key = self.canonical_key(city_name)
+        return self.cities[key] if key else self.default
+
+
+class CityDataStore:
+    """Loads the city snapshot once and atomically swaps in a new one when the file changes."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.environ.get("CITY_DATA_PATH") or DEFAULT_DATA_PATH)
+        self._snapshot = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def on_reload(self, callback):
+        """Registers callback(snapshot), run after a new snapshot replaces the old one."""
+        self._listeners.append(callback)
+
+    def load(self) -> CitySnapshot:
+        mtime = self.path.stat().st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            snapshot = CitySnapshot(json.load(f), mtime)
+        previous, self._snapshot = self._snapshot, snapshot
+        self._next_check = time.monotonic() + CHECK_INTERVAL
+        if previous is not None:
+            for callback in self._listeners:
+                callback(snapshot)
+        return snapshot
+
+    def reload_if_changed(self) -> bool:
+        with self._lock:
+            self._next_check = time.monotonic() + CHECK_INTERVAL
+            try:
+                if self.path.stat().st_mtime == self._snapshot.mtime:
+                    return False
+                self.load()
+            except (OSError, ValueError, KeyError) as e:
+                # Keep serving the current snapshot if the new file is missing or malformed
+                logger.warning("reload of %s failed: %r", self.path, e)
+                return False
+        logger.info("loaded version %s from %s", self._snapshot.version, self.path)
+        return True
+
+    @property
+    def snapshot(self) -> CitySnapshot:
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.load()
+        elif time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._snapshot
+
+    def get(self, city_name: str) -> dict:
+        return self.snapshot.get(city_name)
+
+    def canonical_key(self, city_name: str):
+        return self.snapshot.canonical_key(city_name)
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+
+try:
+    from cache import make_cache
+    from log import get_logger
+    from services import CityService, DESCRIPTION_UNAVAILABLE, community_key, normalize_city
+except ImportError:
+    from backend.cache import make_cache
+    from backend.log import get_logger
+    from backend.services import CityService, DESCRIPTION_UNAVAILABLE, community_key, normalize_city
+
+logger = get_logger("city_info")
+
+# Per-source budgets; a source that misses its budget is replaced by a fallback
+DESCRIPTION_TIMEOUT = float(os.environ.get("CITY_INFO_DESCRIPTION_TIMEOUT", "3.0"))
+RENT_STATS_TIMEOUT = float(os.environ.get("CITY_INFO_RENT_STATS_TIMEOUT", "1.0"))
+
+# Assembled responses are fresh for FRESH_TTL, then served stale for up to
+# STALE_TTL while a background refresh runs (when STALE_WHILE_REVALIDATE is on)
+FRESH_TTL = int(os.environ.get("CITY_INFO_FRESH_TTL", "300"))
+STALE_TTL = int(os.environ.get("CITY_INFO_STALE_TTL", "3600"))
+PARTIAL_TTL = int(os.environ.get("CITY_INFO_PARTIAL_TTL", "15"))
+STALE_WHILE_REVALIDATE = os.environ.get("CITY_INFO_SWR", "1") != "0"
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    fresh_until: float  # wall-clock (time.time()), so it holds in any worker sharing the cache
+    partial: bool = False
+
+    @property
+    def cache_control(self):
+        max_age = PARTIAL_TTL if self.partial else FRESH_TTL
+        if STALE_WHILE_REVALIDATE:
+            return f"public, max-age={max_age}, stale-while-revalidate={STALE_TTL}"
+        return f"public, max-age={max_age}"
+
+
+async def _with_timeout(name, awaitable, timeout, fallback):
+    """Awaits a source with a budget. The underlying task keeps running on timeout
+    so a late result still lands in the source's own cache."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout), False
+    except Exception as e:
+        logger.warning("source %s failed or timed out: %r", name, e)
+        return fallback, True
+
+
+async def assemble_city_info(city_name: str):
+    """Collects every /city-info source concurrently. Returns (payload, partial)."""
+    (description, description_failed), (rent_est, rent_failed) = await asyncio.gather(
+        _with_timeout("description", CityService.get_city_description(city_name), DESCRIPTION_TIMEOUT, DESCRIPTION_UNAVAILABLE),
+        _with_timeout("rent_estimate", CityService.get_rent_stats(city_name), RENT_STATS_TIMEOUT, {}),
+    )
+    payload = {
+        "city_name": normalize_city(city_name).title(),
+        "description": description,
+        "images": CityService.get_mock_images(city_name),
+        "rent_estimate": rent_est,
+        "quality_of_life": CityService.get_quality_of_life(city_name),
+        "areas": CityService.get_areas(city_name),
+        "listings": CityService.get_listings(city_name) + CityService.get_community_listings(city_name),
+    }
+    partial = description_failed or rent_failed or description == DESCRIPTION_UNAVAILABLE
+    return payload, partial
+
+
+class CityInfoCache:
+    """
+    Per-city cache of serialized /city-info bodies with stale-while-revalidate.
+    Bodies differ by the name asked for (its title and description), so they
+    are cached per normalized name, but invalidating a city drops every name
+    this worker has served for it ("bangalore" along with "bengaluru").
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = make_cache("city_info", maxsize=maxsize, ttl=FRESH_TTL + STALE_TTL)
+        self._aliases = {}  # community key -> other cache keys served for it
+        self._refreshing = set()
+        self._tasks = set()
+
+    async def get(self, city_name: str, serialize):
+        """
+        Returns a CachedResponse for the city. `serialize` turns an assembled
+        payload dict into JSON bytes; it only runs when the body is (re)built.
+        """
+        key = normalize_city(city_name)
+        self._remember_alias(key)
+        entry = await self._entries.get_or_fetch(key, lambda: self._build(city_name, serialize))
+        if entry.fresh_until >= time.time():
+            return entry
+
+        if not STALE_WHILE_REVALIDATE:
+            self._entries.delete(key)
+            return await self._entries.get_or_fetch(key, lambda: self._build(city_name, serialize))
+
+        if key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.ensure_future(self._refresh(key, city_name, serialize))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _refresh(self, key, city_name, serialize):
+        try:
+            self._entries.set(key, await self._build(city_name, serialize))
+        except Exception as e:
+            logger.warning("background refresh for %s failed: %r", key, e)
+        finally:
+            self._refreshing.discard(key)
+
+    async def _build(self, city_name, serialize):
+        payload, partial = await assemble_city_info(city_name)
+        body = serialize(payload)
+        return CachedResponse(
+            body=body,
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            fresh_until=time.time() + (PARTIAL_TTL if partial else FRESH_TTL),
+            partial=partial,
+        )
+
+    def _remember_alias(self, key):
+        city_key = community_key(key)
+        if city_key == key:
+            return
+        aliases = self._aliases.setdefault(city_key, set())
+        # Past maxsize names, invalidate() clears the whole cache for this city instead
+        if len(aliases) <= self.maxsize:
+            aliases.add(key)
+
+    def invalidate(self, city_name: str = None):
+        if city_name is None:
+            self._entries.clear()
+            self._aliases.clear()
+            return
+        city_key = community_key(city_name)
+        aliases = self._aliases.pop(city_key, set())
+        if len(aliases) > self.maxsize:
+            self._entries.clear()
+            self._aliases.clear()
+            return
+        for key in {normalize_city(city_name), city_key} | aliases:
+            self._entries.delete(key)
+
+    def stats(self):
+        return {**self._entries.stats(), "refreshing": len(self._refreshing)}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
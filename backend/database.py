@@ -1,15 +1,49 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.util import await_only
 
+import asyncio
 import os
+import re
+
+try:
+    from metrics import instrument_engine
+    from migrations import mark_schema, pending_versions, run_migrations, schema_fingerprint, schema_is_current
+except ImportError:
+    from backend.metrics import instrument_engine
+    from backend.migrations import mark_schema, pending_versions, run_migrations, schema_fingerprint, schema_is_current
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# Engine tuning, overridable per deployment
+DB_ECHO = os.environ.get("DB_ECHO", "0") == "1"
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)  # seconds; avoids server-side idle disconnects
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
 
 # Check for DATABASE_URL env var (Railway/Prod), else fallback to SQLite (Local)
 database_url = os.environ.get("DATABASE_URL")
 
 if database_url and database_url.startswith("postgres"):
     # Fix for SQLAlchemy (requires postgresql:// instead of postgres://)
-    database_url = database_url.replace("postgres://", "postgresql://")
-    connect_args = {} # No check_same_thread for Postgres
-    engine = create_engine(database_url, echo=False)
+    database_url = database_url.replace("postgres://", "postgresql://", 1)
+    is_sqlite = False
+    connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    async_database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    async_connect_args = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    pool_args = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
 else:
     # Fallback to SQLite
     # On Vercel (or any read-only cloud env), we must use /tmp
@@ -17,14 +51,117 @@ else:
         sqlite_file_name = "/tmp/database.db"
     else:
         sqlite_file_name = "database.db"
-        
+
     database_url = f"sqlite:///{sqlite_file_name}"
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(database_url, echo=True, connect_args=connect_args)
+    is_sqlite = True
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    async_database_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
+    async_connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    pool_args = {}
+
+engine = create_engine(database_url, echo=DB_ECHO, connect_args=connect_args, **pool_args)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer commits; NORMAL sync is durable enough under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")  # ~16MB page cache
+    cursor.close()
+
+
+if is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+instrument_engine(engine, "sync")
+
+_WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+class SQLiteWriteGate:
+    """
+    SQLite has one writer at a time, and a blocked writer polls with growing
+    sleeps, so with many concurrent writers an unlucky one can wait out the
+    whole busy timeout and fail with "database is locked" while others keep
+    winning. Async connections instead queue here, first come first served,
+    before their first write statement, and leave at commit or rollback.
+    """
+
+    def __init__(self, engine):
+        self._lock = asyncio.Lock()
+        event.listen(engine, "before_cursor_execute", self._enter)
+        event.listen(engine, "commit", self._leave)
+        event.listen(engine, "rollback", self._leave)
+        # A connection returned or dropped mid-transaction must not keep the gate
+        for name in ("reset", "invalidate", "close"):
+            event.listen(engine.pool, name, self._leave_record)
+
+    def _enter(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("write_gate") or not _WRITE_STATEMENT.match(statement):
+            return
+        # Runs inside the async engine's greenlet, so it can wait on the event loop
+        await_only(asyncio.wait_for(self._lock.acquire(), DB_POOL_TIMEOUT))
+        conn.info["write_gate"] = True
+
+    def _release(self, info):
+        if info.pop("write_gate", False):
+            self._lock.release()
+
+    def _leave(self, conn):
+        self._release(conn.info)
+
+    def _leave_record(self, dbapi_connection, record, *args):
+        self._release(record.info)
+
+
+# The async engine is created on first use so sync-only tools don't need the async drivers
+_async_engine = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _async_engine = create_async_engine(
+            async_database_url, echo=DB_ECHO, connect_args=async_connect_args, **pool_args
+        )
+        if is_sqlite:
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+            SQLiteWriteGate(_async_engine.sync_engine)
+        instrument_engine(_async_engine.sync_engine, "async")
+    return _async_engine
+
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
 
 def create_db_and_tables():
+    # One SELECT on a current database; DDL only runs when models or migrations changed
+    fingerprint = schema_fingerprint(SQLModel.metadata)
+    if schema_is_current(engine, fingerprint):
+        return
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    if not pending_versions(engine):
+        mark_schema(engine, fingerprint)
+
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    # expire_on_commit=False so returned objects can be serialized without lazy reloads
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
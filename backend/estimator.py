@@ -0,0 +1,219 @@
+"""
+Rent estimation from observed rents (tenant reviews, approved listings, curated city listings).
+
+Each city gets a ridge regression on log(rent) over
+[1, extra bedrooms, extra bathrooms, is_pg, is_house], shrunk toward a prior
+built from the city's market average, plus shrunken per-area offsets. The
+regression keeps running sufficient statistics (XᵀX, Xᵀy), so a new rent is
+an O(1) update and the refit is a 5x5 solve. Ranges come from empirical
+residual quantiles instead of a fixed ±10%.
+"""
+import re
+import threading
+
+import numpy as np
+
+try:
+    from city_data import normalize_city
+    from search import parse_price
+except ImportError:
+    from backend.city_data import normalize_city
+    from backend.search import parse_price
+
+N_FEATURES = 5
+QUANTILES = np.array([0.10, 0.25, 0.50, 0.75, 0.90])
+PERCENTILE_NAMES = ("p10", "p25", "p50", "p75", "p90")
+
+RIDGE = 2.0  # prior strength, in observations
+AREA_SHRINK = 3.0  # an area needs a few rents before its offset counts
+MAX_LOG_RESIDUAL = 1.0  # winsorize new rents to within ~2.7x of the current fit
+MIN_OBS_FOR_SPREAD = 8
+MAX_SAMPLES = 4096  # per-city reservoir used for residual quantiles
+DEFAULT_SPREAD = np.log([0.9, 0.95, 1.0, 1.05, 1.1])
+# Estimates are clipped to ₹100 - ₹10 crore a month, so extreme inputs can't overflow exp()
+LOG_RENT_MIN, LOG_RENT_MAX = np.log(1e2), np.log(1e8)
+
+BEDROOMS_RE = re.compile(r"(\d+)\s*(?:bhk|bed)", re.IGNORECASE)
+
+
+def feature_matrix(bedrooms, bathrooms, types) -> np.ndarray:
+    bedrooms = np.maximum(np.asarray(bedrooms, dtype=float), 1.0)
+    bathrooms = np.maximum(np.asarray(bathrooms, dtype=float), 1.0)
+    types = [str(t or "").lower() for t in types]
+    return np.column_stack([
+        np.ones(len(bedrooms)),
+        bedrooms - 1,
+        bathrooms - 1,
+        np.array([t == "pg" for t in types], dtype=float),
+        np.array([t == "house" for t in types], dtype=float),
+    ])
+
+
+def prior_coefficients(average_rent: float) -> np.ndarray:
+    # Matches the old flat adjustment (+₹400 per bedroom, +₹200 per bathroom) at the city average
+    return np.array([np.log(average_rent), np.log1p(400 / average_rent), np.log1p(200 / average_rent), 0.0, 0.0])
+
+
+class CityModel:
+    def __init__(self, average_rent: float):
+        self.prior = prior_coefficients(average_rent)
+        self.xtx = RIDGE * np.eye(N_FEATURES)
+        self.xty = RIDGE * self.prior
+        self.samples_x = np.empty((MAX_SAMPLES, N_FEATURES))
+        self.samples_y = np.empty(MAX_SAMPLES)
+        self.sample_areas = [None] * MAX_SAMPLES
+        self.count = 0
+        self.coef = self.prior.copy()
+        self.spread = DEFAULT_SPREAD
+        self.area_offsets = {}
+        self.dirty = False
+
+    def observe(self, x: np.ndarray, log_rent: float, area_key: str):
+        if self.count:
+            fitted = float(x @ self.coef)
+            log_rent = min(max(log_rent, fitted - MAX_LOG_RESIDUAL), fitted + MAX_LOG_RESIDUAL)
+        self.xtx += np.outer(x, x)
+        self.xty += x * log_rent
+        slot = self.count % MAX_SAMPLES  # oldest samples are overwritten once the reservoir is full
+        self.samples_x[slot] = x
+        self.samples_y[slot] = log_rent
+        self.sample_areas[slot] = area_key
+        self.count += 1
+        self.dirty = True
+
+    def refit(self):
+        self.coef = np.linalg.solve(self.xtx, self.xty)
+        n = min(self.count, MAX_SAMPLES)
+        residuals = self.samples_y[:n] - self.samples_x[:n] @ self.coef
+
+        totals, counts = {}, {}
+        for area_key, residual in zip(self.sample_areas[:n], residuals):
+            if area_key:
+                totals[area_key] = totals.get(area_key, 0.0) + residual
+                counts[area_key] = counts.get(area_key, 0) + 1
+        self.area_offsets = {a: totals[a] / (counts[a] + AREA_SHRINK) for a in totals}
+
+        if n >= MIN_OBS_FOR_SPREAD:
+            offsets = np.array([self.area_offsets.get(a, 0.0) for a in self.sample_areas[:n]])
+            self.spread = np.quantile(residuals - offsets, QUANTILES)
+        self.dirty = False
+
+
+class RentEstimator:
+    def __init__(self, city_data):
+        self.city_data = city_data
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def _city_key(self, city: str) -> str:
+        return self.city_data.canonical_key(city) or normalize_city(city)
+
+    def _average_rent(self, city: str) -> float:
+        return float(self.city_data.get(city)["market"]["avg"])
+
+    def observe(self, city: str, rent, bedrooms=None, bathrooms=None, type=None, area=None):
+        """Feeds one observed monthly rent into the city's model."""
+        rent = parse_price(rent)
+        if not city or rent <= 0:
+            return
+        x = feature_matrix([bedrooms or 1], [bathrooms or 1], [type])[0]
+        with self._lock:
+            key = self._city_key(city)
+            model = self.models.get(key)
+            if model is None:
+                model = self.models[key] = CityModel(self._average_rent(city))
+            model.observe(x, float(np.log(rent)), normalize_city(area) if area else None)
+
+    def load(self, observations):
+        """Bulk-loads an iterable of observe() keyword dicts, e.g. at startup."""
+        for observation in observations:
+            self.observe(**observation)
+
+    def _city_params(self, city: str):
+        model = self.models.get(self._city_key(city))
+        if model is None:
+            return prior_coefficients(self._average_rent(city)), DEFAULT_SPREAD, {}, 0
+        if model.dirty:
+            with self._lock:
+                if model.dirty:
+                    model.refit()
+        return model.coef, model.spread, model.area_offsets, model.count
+
+    def estimate_batch(self, units) -> list:
+        """
+        Scores many units in one vectorized pass. Each unit is a dict with
+        city, bedrooms, bathrooms and optional type/area.
+        """
+        if not units:
+            return []
+        params = {}
+        city_index = np.empty(len(units), dtype=int)
+        offsets = np.zeros(len(units))
+        for i, unit in enumerate(units):
+            city = unit["city"]
+            if city not in params:
+                params[city] = (len(params), *self._city_params(city))
+            index, _, _, area_offsets, _ = params[city]
+            city_index[i] = index
+            if unit.get("area"):
+                offsets[i] = area_offsets.get(normalize_city(unit["area"]), 0.0)
+
+        ordered = sorted(params.values(), key=lambda p: p[0])
+        coefs = np.vstack([p[1] for p in ordered])
+        spreads = np.vstack([p[2] for p in ordered])
+        counts = np.array([p[4] for p in ordered])
+
+        x = feature_matrix(
+            [u.get("bedrooms", 1) for u in units],
+            [u.get("bathrooms", 1) for u in units],
+            [u.get("type") for u in units],
+        )
+        log_rent = np.einsum("ij,ij->i", x, coefs[city_index]) + offsets
+        percentiles = np.exp(np.clip(log_rent[:, None] + spreads[city_index], LOG_RENT_MIN, LOG_RENT_MAX)).astype(int)
+        estimates = np.exp(np.clip(log_rent, LOG_RENT_MIN, LOG_RENT_MAX)).astype(int)
+        observations = counts[city_index]
+
+        return [
+            {
+                "estimated_rent": int(estimates[i]),
+                "range_low": int(percentiles[i, 0]),
+                "range_high": int(percentiles[i, -1]),
+                "percentiles": dict(zip(PERCENTILE_NAMES, percentiles[i].tolist())),
+                "observations": int(observations[i]),
+                "currency": "₹",
+            }
+            for i in range(len(units))
+        ]
+
+    def estimate(self, unit: dict) -> dict:
+        return self.estimate_batch([unit])[0]
+
+
+def listing_observations(city_key: str, listings):
+    """Observations from curated city listings ("₹14,000/mo", "1 Bedroom • 650 sqft")."""
+    for listing in listings:
+        bedrooms = BEDROOMS_RE.search(f"{listing.get('specs', '')} {listing.get('name', '')}")
+        yield {
+            "city": city_key,
+            "rent": listing.get("price"),
+            "bedrooms": int(bedrooms.group(1)) if bedrooms else 1,
+            "type": listing.get("type"),
+            "area": listing.get("area"),
+        }
+
+
+def load_stored_observations(engine):
+    """Rents from reviews and approved listings already in the database."""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        for row in conn.execute(text(
+            "SELECT city, rent_amount, bedrooms, bathrooms, property_type, area "
+            "FROM rentreview WHERE rent_amount IS NOT NULL"
+        )):
+            yield {"city": row[0], "rent": row[1], "bedrooms": row[2], "bathrooms": row[3], "type": row[4], "area": row[5]}
+        for row in conn.execute(text(
+            "SELECT city, rent, bedrooms, bathrooms, type, area "
+            "FROM propertylisting WHERE rent IS NOT NULL AND status = 'Approved'"
+        )):
+            yield {"city": row[0], "rent": row[1], "bedrooms": row[2], "bathrooms": row[3], "type": row[4], "area": row[5]}
@@ -0,0 +1,111 @@
+"""
+Streaming exports of community data as NDJSON or CSV.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE
+(plain column tuples, no ORM objects) and each batch is encoded, and
+gzip-compressed when the client accepts it, before the next one is read,
+so memory stays flat however many rows match. The export opens its own
+connection because the response body outlives request-scoped sessions.
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+try:
+    from city_data import normalize_city
+    from models import PropertyListing, Question, RentReview, review_city_key
+    from moderation import APPROVED
+    from responses import dumps
+except ImportError:
+    from backend.city_data import normalize_city
+    from backend.models import PropertyListing, Question, RentReview, review_city_key
+    from backend.moderation import APPROVED
+    from backend.responses import dumps
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "1000"))
+GZIP_LEVEL = 6
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _review_city(city):
+    return RentReview.city_key == review_city_key(city)
+
+
+def _listing_city(city):
+    # Listings have no normalized key column; lower/trim covers the usual variants
+    return func.lower(func.trim(PropertyListing.city)) == normalize_city(city)
+
+
+# dataset -> (model, city filter or None, columns left out of exports, rows exported or None for all)
+DATASETS = {
+    "reviews": (RentReview, _review_city, set(), None),
+    "questions": (Question, None, set(), None),
+    # Only what the site already shows: approved listings, without their owners' names and contacts
+    "listings": (PropertyListing, _listing_city, {"owner_name", "contact"}, PropertyListing.status == APPROVED),
+}
+
+
+def export_columns(dataset: str, fields=None) -> list:
+    """The columns to export: `fields` (all by default) less the dataset's private ones."""
+    model, _, excluded, _ = DATASETS[dataset]
+    allowed = [c.name for c in model.__table__.columns if c.name not in excluded]
+    columns = [name for name in fields if name not in excluded] if fields else allowed
+    if not columns:
+        raise ValueError(f"No exportable fields requested; {dataset} has: {', '.join(allowed)}")
+    return columns
+
+
+def export_statement(dataset: str, columns, city: str = None, since: datetime = None, until: datetime = None):
+    """Selects the columns in primary-key order, optionally narrowed to a city and [since, until)."""
+    model, city_filter, _, visible = DATASETS[dataset]
+    table = model.__table__
+    statement = select(*[table.c[name] for name in columns])
+    if visible is not None:
+        statement = statement.where(visible)
+    if city:
+        if city_filter is None:
+            raise ValueError(f"{dataset} can't be filtered by city")
+        statement = statement.where(city_filter(city))
+    if since:
+        statement = statement.where(table.c.timestamp >= since)
+    if until:
+        statement = statement.where(table.c.timestamp < until)
+    return statement.order_by(table.c.id)
+
+
+def encode_ndjson(columns, rows) -> bytes:
+    return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def encode_csv(columns, rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([v.isoformat() if isinstance(v, datetime) else v for v in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_export(engine, statement, columns, fmt: str = "ndjson", compress: bool = False):
+    """Yields encoded (and optionally gzipped) chunks, one per batch of rows."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        # Sync flush so every batch reaches the client now rather than at the end
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    if fmt == "csv":
+        yield emit(encode_csv(columns, [], header=True))
+    async with engine.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions(EXPORT_BATCH_SIZE):
+            yield emit(encode_csv(columns, rows) if fmt == "csv" else encode_ndjson(columns, rows))
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,236 @@
+"""
+Spatial lookups for listings and areas.
+
+GeoIndex buckets points into a fixed grid of GEO_CELL_DEGREES cells (about
+1.1 km at the default 0.01). Nearest-first queries walk rings of cells
+outward from the query point and stop as soon as no unvisited cell can hold
+anything closer than the current k-th result or beyond the radius, so their
+cost follows the number of results asked for rather than the number of
+points indexed. Longitudes don't wrap at the antimeridian.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+CELL_DEGREES = float(os.environ.get("GEO_CELL_DEGREES", "0.01"))
+MAX_RADIUS_KM = 50.0
+SLACK = 1.001  # headroom for the planar lower bounds in nearby()
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_point(lat, lon) -> bool:
+    return lat is not None and lon is not None and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def check_coordinates(lat, lon):
+    """Raises ValueError unless both coordinates are given and in range, or neither is."""
+    if lat is None and lon is None:
+        return
+    if not valid_point(lat, lon):
+        raise ValueError("lat and lon must be given together, with -90 <= lat <= 90 and -180 <= lon <= 180")
+
+
+class GeoIndex:
+    def __init__(self, cell_degrees: float = CELL_DEGREES):
+        self.cell = cell_degrees
+        self.cells = {}  # (row, col) -> {item id: (lat, lon, item)}
+        self._cell_of = {}  # item id -> (row, col)
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _key(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def add(self, item_id, lat: float, lon: float, item):
+        self.remove(item_id)
+        key = self._key(lat, lon)
+        self.cells.setdefault(key, {})[item_id] = (lat, lon, item)
+        self._cell_of[item_id] = key
+
+    def remove(self, item_id):
+        key = self._cell_of.pop(item_id, None)
+        if key is None:
+            return
+        bucket = self.cells[key]
+        del bucket[item_id]
+        if not bucket:
+            del self.cells[key]
+
+    def _ring(self, row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def nearby(self, lat: float, lon: float, radius_km: float, limit: int = 20, predicate=None) -> list:
+        """Up to `limit` (distance_km, item) pairs within radius_km, nearest first."""
+        # Planar distances scaled by the cosine at the band's highest latitude never
+        # exceed the true distance (up to SLACK), so they can rule out cells and points
+        lat_span = radius_km / KM_PER_DEGREE
+        km_lat = KM_PER_DEGREE
+        km_lon = KM_PER_DEGREE * math.cos(math.radians(min(abs(lat) + lat_span, 89.9)))
+        step_km = self.cell * km_lon
+        max_ring = math.ceil(radius_km / step_km) + 1
+        row0, col0 = self._key(lat, lon)
+
+        if (2 * max_ring + 1) ** 2 > len(self.cells):
+            # Sparse index: scanning the occupied cells beats walking mostly empty rings
+            rings = [[key for key in self.cells if max(abs(key[0] - row0), abs(key[1] - col0)) <= max_ring]]
+        else:
+            rings = (self._ring(row0, col0, ring) for ring in range(max_ring + 1))
+
+        best = []  # max-heap on distance: (-distance, -seq, item)
+        seq = 0
+        cutoff = radius_km * SLACK  # shrinks to the k-th best distance once `limit` are found
+        for ring, keys in enumerate(rings):
+            # Every point in ring r is at least r - 1 whole cells from the query point
+            if max(0, ring - 1) * step_km > cutoff:
+                break
+            # Visit the ring's cells nearest edge first so the cutoff tightens early
+            cells = []
+            for key in keys:
+                bucket = self.cells.get(key)
+                if bucket:
+                    south, west = key[0] * self.cell, key[1] * self.cell
+                    dy = max(0.0, south - lat, lat - south - self.cell) * km_lat
+                    dx = max(0.0, west - lon, lon - west - self.cell) * km_lon
+                    cells.append((dx * dx + dy * dy, key, bucket))
+            cells.sort(key=lambda cell: cell[0])
+            for edge_sq, _, bucket in cells:
+                cutoff_sq = cutoff * cutoff
+                if edge_sq > cutoff_sq:
+                    break
+                for plat, plon, item in bucket.values():
+                    dy = (plat - lat) * km_lat
+                    dx = (plon - lon) * km_lon
+                    if dx * dx + dy * dy > cutoff_sq:
+                        continue
+                    distance = haversine_km(lat, lon, plat, plon)
+                    if distance > radius_km or (len(best) == limit and distance >= -best[0][0]):
+                        continue
+                    if predicate is not None and not predicate(item):
+                        continue
+                    seq += 1
+                    if len(best) < limit:
+                        heapq.heappush(best, (-distance, -seq, item))
+                    else:
+                        heapq.heapreplace(best, (-distance, -seq, item))
+                    if len(best) == limit:
+                        cutoff = min(radius_km, -best[0][0]) * SLACK
+                        cutoff_sq = cutoff * cutoff
+        return [(-d, item) for d, _, item in sorted(best, reverse=True)]
+
+    def within(self, south: float, west: float, north: float, east: float, limit: int = None, predicate=None):
+        """Returns (total, items) for points inside the box; items stops at `limit`."""
+        row_min, col_min = self._key(south, west)
+        row_max, col_max = self._key(north, east)
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            keys = [k for k in self.cells if row_min <= k[0] <= row_max and col_min <= k[1] <= col_max]
+        else:
+            keys = ((r, c) for r in range(row_min, row_max + 1) for c in range(col_min, col_max + 1))
+
+        total, items = 0, []
+        for key in keys:
+            bucket = self.cells.get(key)
+            if not bucket:
+                continue
+            if predicate is None and row_min < key[0] < row_max and col_min < key[1] < col_max:
+                # Interior cells lie wholly inside the box: count them without looking at points
+                total += len(bucket)
+                if limit is None or len(items) < limit:
+                    items.extend(item for _, _, item in itertools.islice(
+                        bucket.values(), None if limit is None else limit - len(items)))
+                continue
+            for plat, plon, item in bucket.values():
+                if not (south <= plat <= north and west <= plon <= east):
+                    continue
+                if predicate is not None and not predicate(item):
+                    continue
+                total += 1
+                if limit is None or len(items) < limit:
+                    items.append(item)
+        return total, items
+
+
+class GeoCatalog:
+    """
+    Listings and areas with coordinates: the curated ones from the city data
+    plus approved community listings. Built on first use, then kept current
+    with add_listing() or rebuilt after invalidate().
+    """
+
+    def __init__(self, get_snapshot, get_community=lambda: (), cell_degrees: float = CELL_DEGREES):
+        self._get_snapshot = get_snapshot
+        self._get_community = get_community
+        self.cell_degrees = cell_degrees
+        self._indexes = None  # (listings GeoIndex, areas GeoIndex)
+        self._lock = threading.Lock()
+
+    def _build(self):
+        listings, areas = GeoIndex(self.cell_degrees), GeoIndex(self.cell_degrees)
+        snapshot = self._get_snapshot()
+        for city_key, sections in snapshot.cities.items():
+            city = city_key.title()
+            for listing in sections["listings"]:
+                if valid_point(listing.get("lat"), listing.get("lon")):
+                    listings.add(listing["id"], listing["lat"], listing["lon"], {**listing, "city": city})
+            for area in sections["areas"]:
+                if valid_point(area.get("lat"), area.get("lon")):
+                    areas.add((city_key, area["name"]), area["lat"], area["lon"], {**area, "city": city})
+        for listing in self._get_community():
+            if valid_point(listing.get("lat"), listing.get("lon")):
+                listings.add(listing["id"], listing["lat"], listing["lon"], listing)
+        return listings, areas
+
+    def build(self):
+        indexes = self._indexes
+        if indexes is None:
+            with self._lock:
+                if self._indexes is None:
+                    self._indexes = self._build()
+                indexes = self._indexes
+        return indexes
+
+    @property
+    def listings(self) -> GeoIndex:
+        return self.build()[0]
+
+    @property
+    def areas(self) -> GeoIndex:
+        return self.build()[1]
+
+    def add_listing(self, listing: dict):
+        """Indexes a listing if the index is built; otherwise the build will pick it up."""
+        indexes = self._indexes
+        if indexes is not None and valid_point(listing.get("lat"), listing.get("lon")):
+            indexes[0].add(listing["id"], listing["lat"], listing["lon"], listing)
+
+    def invalidate(self):
+        self._indexes = None
+
+    def stats(self):
+        indexes = self._indexes
+        if indexes is None:
+            return {"built": False}
+        return {"built": True, "listings": len(indexes[0]), "areas": len(indexes[1]),
+                "cells": len(indexes[0].cells), "cell_degrees": self.cell_degrees}
+
+
+def with_distance(results) -> list:
+    return [{**item, "distance_km": round(distance, 3)} for distance, item in results]
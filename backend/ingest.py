@@ -0,0 +1,235 @@
+"""
+Bulk ingestion of property listings and rent reviews.
+
+Records arrive as NDJSON (one object per line) or a JSON array, are validated
+one at a time, and inserted in executemany chunks with one transaction per
+chunk. Invalid records are reported by index without aborting the batch.
+
+CLI:
+    python -m backend.ingest listings feed.ndjson
+    python -m backend.ingest reviews reviews.json --batch-size 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+try:
+    from geo import check_coordinates
+    from log import configure_logging
+    from models import PropertyListing, RentReview, review_city_key
+    from moderation import PENDING
+except ImportError:
+    from backend.geo import check_coordinates
+    from backend.log import configure_logging
+    from backend.models import PropertyListing, RentReview, review_city_key
+    from backend.moderation import PENDING
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+MODELS = {
+    "listings": PropertyListing,
+    "reviews": RentReview,
+}
+
+
+def _prepare_row(model, raw):
+    """Validates one raw record and returns the column dict to insert."""
+    if not isinstance(raw, dict):
+        raise ValueError("record must be a JSON object")
+    row = model.model_validate(raw).model_dump(exclude={"id"})
+    if model is RentReview:
+        # Core inserts skip ORM events, so derive the indexed key here
+        row["city_key"] = review_city_key(row["city"])
+    if model is PropertyListing:
+        check_coordinates(row["lat"], row["lon"])
+        # Like single submissions, imported listings wait for moderation
+        row["status"] = PENDING
+    return row
+
+
+class IngestReport:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, index, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": index, "error": message})
+
+    def as_dict(self):
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "batches": self.batches,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def _flush(session, model, batch, report, on_insert=None):
+    """Inserts one chunk; if the chunk fails as a whole, retries row by row to isolate bad rows."""
+    if not batch:
+        return
+    report.batches += 1
+    rows = [row for _, row in batch]
+    try:
+        await session.exec(insert(model), params=rows)
+        await session.commit()
+        report.inserted += len(rows)
+        if on_insert:
+            for row in rows:
+                on_insert(row)
+        return
+    except SQLAlchemyError:
+        await session.rollback()
+
+    for index, row in batch:
+        try:
+            await session.exec(insert(model), params=[row])
+            await session.commit()
+            report.inserted += 1
+            if on_insert:
+                on_insert(row)
+        except SQLAlchemyError as e:
+            await session.rollback()
+            report.error(index, str(e.orig if getattr(e, "orig", None) else e))
+
+
+async def ingest_records(session, model, records, batch_size: int = BATCH_SIZE, on_insert=None) -> IngestReport:
+    """
+    Ingests an (async or sync) iterable of (index, raw) pairs, where raw is a
+    parsed record or the exception from a line that failed to parse.
+    on_insert(row_dict) is called for each row once its chunk has committed.
+    """
+    report = IngestReport()
+    batch = []
+
+    async def consume(index, raw):
+        report.received += 1
+        if isinstance(raw, Exception):
+            report.error(index, f"invalid JSON: {raw}")
+            return
+        try:
+            batch.append((index, _prepare_row(model, raw)))
+        except ValidationError as e:
+            report.error(index, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'record'}: {err['msg']}" for err in e.errors()
+            ))
+            return
+        except (ValueError, TypeError) as e:
+            report.error(index, str(e))
+            return
+        if len(batch) >= batch_size:
+            await _flush(session, model, batch, report, on_insert)
+            batch.clear()
+
+    if hasattr(records, "__aiter__"):
+        async for index, raw in records:
+            await consume(index, raw)
+    else:
+        for index, raw in records:
+            await consume(index, raw)
+    await _flush(session, model, batch, report, on_insert)
+    return report
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+
+async def ndjson_records(chunks):
+    """Yields (index, parsed) pairs from an async stream of byte chunks, one line at a time."""
+    buffer = b""
+    index = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_line(buffer)
+
+
+def json_array_records(body: bytes):
+    data = json.loads(body)
+    if not isinstance(data, list):
+        raise ValueError("expected a JSON array of records")
+    return enumerate(data)
+
+
+def _file_records(path):
+    with open(path, "rb") as f:
+        head = f.read(1024).lstrip()
+        f.seek(0)
+        if head.startswith(b"["):
+            yield from json_array_records(f.read())
+            return
+        index = 0
+        for line in f:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+
+
+async def _ingest_file(kind, path, batch_size):
+    try:
+        from database import create_db_and_tables, dispose_async_engine, get_async_engine
+    except ImportError:
+        from backend.database import create_db_and_tables, dispose_async_engine, get_async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    # Also sets review city keys as the app does
+    try:
+        from services import record_reviews
+    except ImportError:
+        from backend.services import record_reviews
+
+    create_db_and_tables()
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        inserted = []
+        report = await ingest_records(
+            session, MODELS[kind], _file_records(path), batch_size=batch_size, on_insert=inserted.append,
+        )
+        if kind == "reviews":
+            # Summaries and market stats as for reviews posted to the API; running
+            # workers pick them up on their next refresh. Listings wait for moderation
+            await record_reviews(session, inserted)
+    await dispose_async_engine()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load listings or reviews from NDJSON or a JSON array.")
+    parser.add_argument("kind", choices=sorted(MODELS))
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    configure_logging()
+    report = asyncio.run(_ingest_file(args.kind, args.path, args.batch_size)).as_dict()
+    errors = report.pop("errors")
+    print(json.dumps(report))
+    for error in errors[:20]:
+        print(f"  record {error['index']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
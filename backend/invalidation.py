@@ -0,0 +1,112 @@
+"""
+Cross-worker cache invalidation.
+
+Writes publish (channel, key) messages, e.g. ("city", "pune") after a rent
+review; key None means everything on the channel. Subscribers run at once in
+the publishing worker and, through the shared cache store, on the event loop
+of every other worker: polled from the SQLite file, or pushed by Redis
+PUBLISH/SUBSCRIBE. With the in-process backend messages stay local.
+
+Delivery is best effort; a worker that misses a message (e.g. while its
+store is unreachable) catches up when the affected entries expire. Sending
+to the store blocks, so from the event loop it is left to a sender thread.
+"""
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from cache import shared_store
+    from log import get_logger
+except ImportError:
+    from backend.cache import shared_store
+    from backend.log import get_logger
+
+logger = get_logger("invalidation")
+
+
+class InvalidationBus:
+    def __init__(self, store=None):
+        self.store = store  # SQLiteStore or RedisClient; None for single-process delivery
+        self.origin = uuid.uuid4().hex  # lets a worker skip its own messages
+        self._subscribers = {}  # channel -> [callback(key)]
+        self._loop = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._sender = None  # one thread, so messages leave in the order they were published
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, channel: str, callback):
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def publish(self, channel: str, key=None):
+        self.published += 1
+        self._dispatch(channel, key)
+        if self.store is None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._send(channel, key)
+            return
+        if self._sender is None:
+            self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-invalidation-send")
+        self._sender.submit(self._send, channel, key)
+
+    def _send(self, channel, key):
+        try:
+            self.store.publish(self.origin, channel, key)
+        except Exception as e:
+            logger.warning("could not publish %s/%s to other workers: %r", channel, key, e)
+
+    def _dispatch(self, channel, key):
+        for callback in self._subscribers.get(channel, ()):
+            try:
+                callback(key)
+            except Exception:
+                logger.exception("invalidation subscriber for %s failed", channel)
+
+    def _receive(self, origin, channel, key):
+        # Runs on the listener thread; caches are only touched from the event loop
+        if origin == self.origin:
+            return
+        self.received += 1
+        self._loop.call_soon_threadsafe(self._dispatch, channel, key)
+
+    def start(self):
+        """Starts listening for other workers' messages; call from the event loop."""
+        if self.store is None or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.store.listen, args=(self._receive, self._stop), name="cache-invalidation", daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self.store.wake()
+        self._thread.join(timeout=2.0)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def stats(self):
+        return {
+            "transport": type(self.store).__name__ if self.store is not None else "local",
+            "listening": self.running,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+def make_bus() -> InvalidationBus:
+    """A bus over the store selected by CACHE_BACKEND."""
+    return InvalidationBus(shared_store())
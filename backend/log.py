@@ -0,0 +1,65 @@
+"""
+Logging setup: one "rentchecker" logger tree, level and format from the environment.
+
+    LOG_LEVEL=DEBUG|INFO|WARNING (default INFO)
+    LOG_FORMAT=text|json (default text)
+
+Call sites pass arguments lazily (logger.debug("x %s", y)) so disabled levels
+cost one level check and no formatting.
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = "rentchecker"
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.converter = time.gmtime
+
+    def format(self, record):
+        line = super().format(record)
+        extra = {k: v for k, v in vars(record).items() if k not in _RESERVED}
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    logger = logging.getLogger(ROOT)
+    logger.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+    if not any(getattr(h, "_rentchecker", False) for h in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler._rentchecker = True
+        logger.addHandler(handler)
+    for handler in logger.handlers:
+        if getattr(handler, "_rentchecker", False):
+            json_format = (fmt or os.environ.get("LOG_FORMAT", "text")).lower() == "json"
+            handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
@@ -1,7 +1,12 @@
+import asyncio
+import hmac
 import sys
 import os
+import time
 from pathlib import Path
 
+_import_started = time.perf_counter()
+
 # Force absolute path resolution
 current_dir = Path(__file__).parent.absolute()
 parent_dir = current_dir.parent.absolute()
@@ -12,39 +17,61 @@ if str(current_dir) not in sys.path:
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
 
-print(f"DEBUG: sys.path is {sys.path}")
-print(f"DEBUG: Current dir is {current_dir}")
-print(f"DEBUG: Parent dir is {parent_dir}")
-
 try:
+    import geo
+    import metrics
+    import ratelimit
     import services
+    from log import configure_logging, get_logger
     from services import CityService
+    from city_info import CityInfoCache, etag_matches
+    from static_files import StaticIndex, choose_encoding
 except ImportError:
+    from backend import geo
+    from backend import metrics
+    from backend import ratelimit
     from backend import services
+    from backend.log import configure_logging, get_logger
     from backend.services import CityService
+    from backend.city_info import CityInfoCache, etag_matches
+    from backend.static_files import StaticIndex, choose_encoding
 
-from fastapi import FastAPI
+from datetime import datetime
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
 
+configure_logging()
+logger = get_logger("main")
+logger.debug("import paths", extra={"sys_path": sys.path, "current_dir": str(current_dir)})
+
+# Serverless instances pay for startup on every cold start, so there the HTTP
+# client, estimator, frontend index and background refresh are set up on first use
+SERVERLESS = bool(os.environ.get("VERCEL") or os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+LAZY_STARTUP = os.environ.get("LAZY_STARTUP", "1" if SERVERLESS else "0") == "1"
+
 app = FastAPI()
 
+# Added first so it is innermost: CORS headers and metrics cover its 429/503 responses
+app.add_middleware(ratelimit.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Retry-After"],
 )
+# Added last so it is outermost and times the whole request, CORS included
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Serve frontend static files
+# Built frontend, indexed and precompressed in memory at startup
 # Since we run from backend/, go up one level to find frontend/
 frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
-if frontend_dist.exists():
-    app.mount("/assets", StaticFiles(directory=frontend_dist / "assets"), name="assets")
+static_index = StaticIndex(frontend_dist)
 
 class CityInfoRequest(BaseModel):
     city_name: str
@@ -58,197 +85,590 @@ class CityInfoResponse(BaseModel):
     areas: List[dict]
     listings: List[dict]
 
+@app.on_event("startup")
+def open_http_client():
+    if not LAZY_STARTUP:
+        CityService.open_http_client()
+
+@app.on_event("startup")
+def load_city_data():
+    services.city_data.load()
+
+@app.on_event("startup")
+def index_frontend():
+    if not LAZY_STARTUP:
+        static_index.load()
+
+@app.on_event("startup")
+def start_refresh_scheduler():
+    # Without the scheduler, descriptions are fetched inline and cached on first request
+    if LAZY_STARTUP:
+        return
+    # Curated cities are always kept warm; others once they become popular
+    services.refresh_scheduler.pin(key.title() for key in services.city_data.snapshot.cities)
+    services.refresh_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_refresh_scheduler():
+    await services.refresh_scheduler.stop()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await CityService.close_http_client()
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Rental Guide Platform API is running"}
 
+city_info_cache = CityInfoCache()
+services.city_data.on_reload(lambda snapshot: city_info_cache.invalidate())
+services.refresh_scheduler.on_refresh(lambda source, city_key: city_info_cache.invalidate(city_key))
+
+def serialize_city_info(payload: dict) -> bytes:
+    # Validate once when the body is built; cached hits skip pydantic entirely
+    return CityInfoResponse(**payload).model_dump_json().encode("utf-8")
+
 @app.get("/city-info/{city_name}", response_model=CityInfoResponse)
-async def get_city_info(city_name: str):
-    # Fetch data
-    description = await CityService.get_city_description(city_name)
-    images = CityService.get_mock_images(city_name)
-    rent_est = await CityService.get_rent_stats(city_name) # Used new async method
-    qol = CityService.get_quality_of_life(city_name)
-    areas = CityService.get_areas(city_name)
-    listings = CityService.get_listings(city_name)
-    
+async def get_city_info(city_name: str, if_none_match: Optional[str] = Header(None)):
+    services.refresh_scheduler.touch(city_name)
+    cached = await city_info_cache.get(city_name, serialize_city_info)
+    headers = {"ETag": cached.etag, "Cache-Control": cached.cache_control}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+@app.get("/cache-stats")
+def get_cache_stats():
     return {
-        "city_name": city_name.title(),
-        "description": description,
-        "images": images,
-        "rent_estimate": rent_est,
-        "quality_of_life": qol,
-        "areas": areas,
-        "listings": listings
+        "city_description": services.description_cache.stats(),
+        "city_info": city_info_cache.stats(),
+        "answers": qa.answer_cache.stats(),
+        "refresh": services.refresh_scheduler.stats(),
+        "static": static_index.stats(),
+        "invalidation": services.invalidation.stats(),
+        "geo": services.geo_catalog.stats(),
+        "approved_listings": services.approved_listings.stats(),
     }
 
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/search")
-async def search(q: str, city: Optional[str] = None):
-    return await CityService.search_properties(q, city)
+async def search(
+    response: Response,
+    q: str = "",
+    city: Optional[str] = None,
+    type: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    amenities: List[str] = Query(default=[]),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    result = await CityService.search_properties(
+        q, city, type=type, min_price=min_price, max_price=max_price,
+        amenities=amenities, offset=offset, limit=limit,
+    )
+    # Body stays a plain list for existing clients; the match count rides in a header
+    response.headers["X-Total-Count"] = str(result["total"])
+    return json_response(result["results"], response)
+
+def _type_filter(type: Optional[str]):
+    wanted = type.strip().lower() if type else None
+    return (lambda item: (item.get("type") or "").lower() == wanted) if wanted else None
+
+# Radius queries are in-memory and run inline; a thread hop would cost more than the lookup
+@app.get("/listings/nearby")
+async def listings_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2.0, gt=0, le=geo.MAX_RADIUS_KM, description="km"),
+    type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    results = services.geo_catalog.listings.nearby(lat, lon, radius, limit, _type_filter(type))
+    return json_response(geo.with_distance(results))
+
+@app.get("/listings/within")
+async def listings_within(
+    response: Response,
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    type: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
+):
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="Expected south <= north and west <= east")
+    total, items = services.geo_catalog.listings.within(south, west, north, east, limit, _type_filter(type))
+    response.headers["X-Total-Count"] = str(total)
+    return json_response(items, response)
+
+@app.get("/areas/nearby")
+async def areas_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5.0, gt=0, le=geo.MAX_RADIUS_KM, description="km"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    return json_response(geo.with_distance(services.geo_catalog.areas.nearby(lat, lon, radius, limit)))
+
+# More rooms than this is an input error, not a bigger home
+MAX_ROOMS = 20
 
-# Deprecated/Legacy endpoint kept for backward compatibility if needed, 
-# or repurposed for simple estimate checks.
 class EstimateRequest(BaseModel):
     city: str
-    bedrooms: int
-    bathrooms: int
+    bedrooms: int = Field(ge=0, le=MAX_ROOMS)
+    bathrooms: int = Field(ge=0, le=MAX_ROOMS)
+    type: Optional[str] = None  # Flat, PG, House
+    area: Optional[str] = None
+
+class EstimateBatchRequest(BaseModel):
+    units: List[EstimateRequest]
+
+MAX_ESTIMATE_BATCH = 10000
 
 @app.post("/estimate")
 async def estimate_rent(data: EstimateRequest):
-    # Re-use logic for specific apartment sizing
-    base_data = await CityService.get_rent_stats(data.city)
-    base_avg = base_data["average_rent"]
-    
-    # Adjust for rooms
-    # Base assume 1 bed. Add cost for extra.
-    room_adjustment = ((data.bedrooms - 1) * 400) + ((data.bathrooms - 1) * 200)
-    
-    final_avg = base_avg + room_adjustment
-    
-    return {
-        "estimated_rent": int(final_avg),
-        "range_low": int(final_avg * 0.9),
-        "range_high": int(final_avg * 1.1),
-        "currency": "₹"
-    }
+    return services.get_rent_estimator().estimate(data.model_dump())
+
+@app.post("/estimate/batch")
+async def estimate_rent_batch(data: EstimateBatchRequest):
+    if len(data.units) > MAX_ESTIMATE_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ESTIMATE_BATCH} units per batch")
+    return {"estimates": services.get_rent_estimator().estimate_batch([unit.model_dump() for unit in data.units])}
 
 # --- Community/Review Endpoints ---
 try:
-    from database import get_session, create_db_and_tables
+    import export
+    import ingest
+    import moderation
+    import qa
+    import reviews
+    import saved
+    from database import engine, get_async_engine, get_async_session, create_db_and_tables, dispose_async_engine
+    from migrations import has_fulltext
+    from pagination import keyset_page, parse_fields, NEXT_CURSOR_HEADER
+    from responses import json_response
     from models import RentReview, Question, Answer, PropertyListing, SavedListing
 
 except ImportError:
-    from backend.database import get_session, create_db_and_tables
+    from backend import export
+    from backend import ingest
+    from backend import moderation
+    from backend import qa
+    from backend import reviews
+    from backend import saved
+    from backend.database import engine, get_async_engine, get_async_session, create_db_and_tables, dispose_async_engine
+    from backend.migrations import has_fulltext
+    from backend.pagination import keyset_page, parse_fields, NEXT_CURSOR_HEADER
+    from backend.responses import json_response
     from backend.models import RentReview, Question, Answer, PropertyListing, SavedListing
 
 
-from sqlmodel import Session, select
-from fastapi import Depends, HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import Depends, Request
+
+metrics.cache_stats.register("city_description", services.description_cache)
+metrics.cache_stats.register("city_info", city_info_cache)
+metrics.cache_stats.register("answers", qa.answer_cache)
+
+# Writes publish on these channels; every worker drops its stale entries
+services.invalidation.subscribe("city", lambda city: city_info_cache.invalidate(city))
+services.invalidation.subscribe("answers", qa.invalidate_answers)
+services.invalidation.subscribe("listings", services.sync_approved_listings)
+
+@app.on_event("startup")
+def start_invalidation():
+    services.invalidation.start()
+
+@app.on_event("shutdown")
+def stop_invalidation():
+    services.invalidation.stop()
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    reviews.FULLTEXT_ENABLED = has_fulltext(engine)
+    services.use_stored_rent_observations(engine)
+    services.approved_listings.use_stored_listings(engine)
+    if LAZY_STARTUP:
+        # Loaded in the background rather than by the first request that needs them
+        app.state.approved_listings_load = asyncio.create_task(services.approved_listings.load())
+        return
+    await services.approved_listings.load()
+    services.seed_rent_estimator()
+    services.geo_catalog.build()
+
+# Summary tables read from memory; each worker reloads them periodically to see the others' writes
+SUMMARY_STORES = (services.market_stats, services.review_summaries)
 
-# Reviews - Support both /reviews and /reviews/{city} endpoints
-@app.post("/reviews")
-def create_review(review: RentReview, session: Session = Depends(get_session)):
+@app.on_event("startup")
+async def start_summary_refresh():
+    session_factory = lambda: AsyncSession(get_async_engine(), expire_on_commit=False)
+    async with session_factory() as session:
+        for store in SUMMARY_STORES:
+            await store.refresh(session)
+    app.state.summary_tasks = [asyncio.create_task(store.refresh_forever(session_factory)) for store in SUMMARY_STORES]
+
+@app.on_event("shutdown")
+async def stop_summary_refresh():
+    tasks = getattr(app.state, "summary_tasks", [])
+    for task in tasks:
+        task.cancel()
+    # Let an in-flight refresh release its connection before the engine is disposed
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+@app.on_event("shutdown")
+async def close_database():
+    await dispose_async_engine()
+
+async def store_review(session, review: RentReview):
+    """Inserts a review and updates its city's review summary in the same transaction."""
+    # Table models aren't validated when FastAPI builds them from the body;
+    # store the validated copy, so e.g. "rating": "5" is saved as 5
+    try:
+        review = RentReview.model_validate(review.model_dump(warnings=False))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
     session.add(review)
-    session.commit()
-    session.refresh(review)
+    # Assigns the id the summary's top list refers to; the INSERT also takes
+    # SQLite's write lock, so the summary's read-merge-write can't interleave
+    await session.flush()
+    await services.record_reviews(session, [review.model_dump()])
+    await session.refresh(review)
     return review
 
+# Reviews - Support both /reviews and /reviews/{city} endpoints
+@app.post("/reviews")
+async def create_review(review: RentReview, session: AsyncSession = Depends(get_async_session)):
+    return await store_review(session, review)
+
+async def bulk_records(request: Request):
+    """NDJSON bodies are parsed line by line as they stream in; anything else must be a JSON array."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return ingest.ndjson_records(request.stream())
+    try:
+        return ingest.json_array_records(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bulk body: {e}")
+
+# Registered before /reviews/{city} so "bulk" isn't taken as a city name
+@app.post("/reviews/bulk")
+async def create_reviews_bulk(request: Request, session: AsyncSession = Depends(get_async_session)):
+    inserted = []
+    report = await ingest.ingest_records(session, RentReview, await bulk_records(request), on_insert=inserted.append)
+    await services.record_reviews(session, inserted)
+    return report.as_dict()
+
 @app.post("/reviews/{city}")
-def create_review_for_city(city: str, review: RentReview, session: Session = Depends(get_session)):
+async def create_review_for_city(city: str, review: RentReview, session: AsyncSession = Depends(get_async_session)):
     # Set the city if not already provided in the review object
     if not review.city:
         review.city = city
-    session.add(review)
-    session.commit()
-    session.refresh(review)
-    return review
+    return await store_review(session, review)
+
+# Registered before /reviews/{city} so "search" isn't taken as a city name
+@app.get("/reviews/search")
+async def search_reviews(
+    q: str,
+    city: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_session),
+):
+    city_key = services.community_key(city) if city else None
+    return json_response(await reviews.search_reviews(session, q, city_key=city_key, limit=limit))
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
 @app.get("/reviews/{city}")
-def get_city_reviews(city: str, session: Session = Depends(get_session)):
-    statement = select(RentReview).where(RentReview.city.contains(city)).order_by(RentReview.likes.desc())
-    reviews = session.exec(statement).all()
-    return reviews
+async def get_city_reviews(
+    city: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    page, next_cursor = await keyset_page(
+        session, RentReview, RentReview.likes,
+        filters=[RentReview.city_key == services.community_key(city)],
+        cursor=cursor, limit=limit, fields=fields,
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(page, response)
+
+@app.get("/reviews/{city}/summary")
+def get_city_review_summary(city: str):
+    """Rating histogram, average, sentiment split, most-liked excerpts and keywords, kept up to date on write."""
+    return services.review_summaries.get(city)
 
 @app.post("/reviews/{review_id}/like")
-def like_review(review_id: int, session: Session = Depends(get_session)):
-    review = session.get(RentReview, review_id)
-    if not review:
+async def like_review(review_id: int, session: AsyncSession = Depends(get_async_session)):
+    liked = await reviews.increment_likes(session, review_id)
+    if liked is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    review.likes += 1
-    session.add(review)
-    session.commit()
-    session.refresh(review)
-    return {"likes": review.likes}
+    likes, city = liked
+    await services.review_summaries.record_like(session, review_id, city, likes)
+    return {"likes": likes}
 
 # Q&A
 @app.get("/questions")
-def get_questions(session: Session = Depends(get_session)):
-    # Get recent questions with their answers
-    statement = select(Question).order_by(Question.timestamp.desc())
-    questions = session.exec(statement).all()
-    # SQLModel relationships loading strategy: 
-    # By default, lazy. We might need to explicitely return a model with nested data.
-    return questions
+async def get_questions(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Get recent questions, newest first
+    page, next_cursor = await keyset_page(
+        session, Question, Question.timestamp, cursor=cursor, limit=limit, fields=fields,
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(page, response)
+
+@app.get("/questions/threads")
+async def get_question_threads(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Questions with nested answers and answer counts, without a request per question
+    threads, next_cursor = await qa.get_threads(session, cursor=cursor, limit=limit)
+    set_next_cursor(response, next_cursor)
+    return json_response(threads, response)
 
 @app.get("/questions/{question_id}/answers")
-def get_answers(question_id: int, session: Session = Depends(get_session)):
-    statement = select(Answer).where(Answer.question_id == question_id).order_by(Answer.timestamp.asc())
-    return session.exec(statement).all()
+async def get_answers(question_id: int, session: AsyncSession = Depends(get_async_session)):
+    return json_response((await qa.load_answers(session, [question_id]))[question_id])
 
 @app.post("/questions")
-def create_question(question: Question, session: Session = Depends(get_session)):
+async def create_question(question: Question, session: AsyncSession = Depends(get_async_session)):
     session.add(question)
-    session.commit()
-    session.refresh(question)
+    await session.commit()
+    await session.refresh(question)
     return question
 
 @app.post("/questions/{question_id}/answers")
-def create_answer(question_id: int, answer: Answer, session: Session = Depends(get_session)):
+async def create_answer(question_id: int, answer: Answer, session: AsyncSession = Depends(get_async_session)):
     # Verify question exists
-    q = session.get(Question, question_id)
+    q = await session.get(Question, question_id)
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
     
     answer.question_id = question_id
     session.add(answer)
-    session.commit()
-    session.refresh(answer)
+    await session.commit()
+    await session.refresh(answer)
+    services.invalidation.publish("answers", question_id)
     return answer
 
 # Listings
 @app.post("/listings")
-def create_listing(listing: PropertyListing, session: Session = Depends(get_session)):
+async def create_listing(listing: PropertyListing, session: AsyncSession = Depends(get_async_session)):
+    try:
+        geo.check_coordinates(listing.lat, listing.lon)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Submissions always wait for moderation
+    listing.status = moderation.PENDING
     session.add(listing)
-    session.commit()
-    session.refresh(listing)
+    await session.commit()
+    await session.refresh(listing)
     return {"status": "success", "message": "Listing submitted for approval", "id": listing.id}
 
+@app.post("/listings/bulk")
+async def create_listings_bulk(request: Request, session: AsyncSession = Depends(get_async_session)):
+    # Rows land Pending; caches are invalidated when moderation approves them
+    report = await ingest.ingest_records(session, PropertyListing, await bulk_records(request))
+    return report.as_dict()
+
+# --- Moderation ---
+def moderator(x_moderation_token: Optional[str] = Header(None)):
+    if not moderation.MODERATION_TOKEN:
+        raise HTTPException(status_code=503, detail="Moderation not configured")
+    if not hmac.compare_digest(x_moderation_token or "", moderation.MODERATION_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid moderation token")
+
+class ModerationRequest(BaseModel):
+    approve: List[int] = []
+    reject: List[int] = []
+
+async def publish_approved_listings(session, listings):
+    """Makes approved listings visible everywhere and feeds their rents into the estimator and market stats."""
+    for listing in listings:
+        services.add_approved_listing(listing)
+    rents = [listing for listing in listings if listing.rent]
+    for listing in rents:
+        services.observe_rent(
+            listing.city, listing.rent, bedrooms=listing.bedrooms, bathrooms=listing.bathrooms,
+            type=listing.type, area=listing.area,
+        )
+    if rents:
+        await services.market_stats.record(
+            session, [(listing.city, listing.area, listing.rent, listing.timestamp) for listing in rents]
+        )
+    for city in {listing.city for listing in listings}:
+        services.invalidation.publish("city", city)
+    if listings:
+        services.invalidation.publish("listings", [listing.id for listing in listings])
+
+@app.get("/moderation/listings", dependencies=[Depends(moderator)])
+async def get_moderation_queue(
+    response: Response,
+    city: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Pending listings, oldest first
+    page, next_cursor = await keyset_page(
+        session, PropertyListing, PropertyListing.timestamp, filters=moderation.queue_filters(city),
+        cursor=cursor, limit=limit, descending=False,
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(page, response)
+
+@app.post("/moderation/listings", dependencies=[Depends(moderator)])
+async def moderate_listings(request: ModerationRequest, session: AsyncSession = Depends(get_async_session)):
+    if len(request.approve) + len(request.reject) > moderation.MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {moderation.MAX_BATCH} listings per batch")
+    try:
+        approved, rejected, skipped = await moderation.moderate(session, request.approve, request.reject)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await publish_approved_listings(session, approved)
+    return {"approved": [listing.id for listing in approved], "rejected": rejected, "skipped": skipped}
+
 # --- Saved Properties ---
+def saved_user(x_user_id: Optional[str] = Header(None)) -> str:
+    try:
+        return saved.clean_user_id(x_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class SavedBatchRequest(BaseModel):
+    save: List[SavedListing] = []
+    delete: List[str] = []
+
 @app.get("/saved-properties")
-def get_saved_properties(session: Session = Depends(get_session)):
-    statement = select(SavedListing).order_by(SavedListing.timestamp.desc())
-    return session.exec(statement).all()
+async def get_saved_properties(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    user_id: str = Depends(saved_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    page, next_cursor = await keyset_page(
+        session, SavedListing, SavedListing.timestamp, filters=[SavedListing.user_id == user_id],
+        cursor=cursor, limit=limit, fields=fields,
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(page, response)
 
 @app.post("/saved-properties")
-def save_property(listing: SavedListing, session: Session = Depends(get_session)):
-    # Check if already saved
-    statement = select(SavedListing).where(SavedListing.listing_id == listing.listing_id)
-    existing = session.exec(statement).first()
-    if existing:
-        return existing
-        
-    session.add(listing)
-    session.commit()
-    session.refresh(listing)
-    return listing
+async def save_property(
+    listing: SavedListing,
+    user_id: str = Depends(saved_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return await saved.save_one(session, user_id, listing)
+
+@app.post("/saved-properties/batch")
+async def sync_saved_properties(
+    data: SavedBatchRequest,
+    user_id: str = Depends(saved_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Applies many saves and deletes in one transaction; deletes run first."""
+    if len(data.save) + len(data.delete) > saved.MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {saved.MAX_BATCH} changes per batch")
+    deleted = await saved.delete_many(session, user_id, data.delete)
+    created = await saved.save_many(session, user_id, data.save)
+    await session.commit()
+    return {"created": created, "deleted": deleted}
 
 @app.delete("/saved-properties/{listing_id}")
-def delete_saved_property(listing_id: str, session: Session = Depends(get_session)):
-    statement = select(SavedListing).where(SavedListing.listing_id == listing_id)
-    listing = session.exec(statement).first()
-    if not listing:
+async def delete_saved_property(
+    listing_id: str,
+    user_id: str = Depends(saved_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    deleted = await saved.delete_many(session, user_id, [listing_id])
+    await session.commit()
+    if not deleted:
         raise HTTPException(status_code=404, detail="Listing not found")
-        
-    session.delete(listing)
-    session.commit()
     return {"status": "deleted", "id": listing_id}
 
+# --- Exports ---
+@app.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    city: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Streams every matching row as NDJSON or CSV, gzipped when the client accepts it."""
+    if dataset not in export.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset; expected one of {', '.join(export.DATASETS)}")
+    model = export.DATASETS[dataset][0]
+    try:
+        columns = export.export_columns(dataset, parse_fields(model, fields))
+        statement = export.export_statement(dataset, columns, city=city, since=since, until=until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    compress = choose_encoding(accept_encoding, {"gzip"}) == "gzip"
+    headers = {"Content-Disposition": f'attachment; filename="{dataset}.{format}"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export.stream_export(get_async_engine(), statement, columns, fmt=format, compress=compress),
+        media_type=export.MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+
+_import_finished = time.perf_counter()
+logger.info("app imported in %.0f ms", (_import_finished - _import_started) * 1000)
+
+@app.on_event("startup")
+def report_startup_time():
+    # Registered last, so it runs after every other startup hook
+    logger.info(
+        "startup finished %.0f ms after import (lazy=%s)",
+        (time.perf_counter() - _import_finished) * 1000, LAZY_STARTUP,
+    )
 
 # Catch-all route: Serve index.html for all non-API routes (SPA routing)
-@app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_frontend(
+    request: Request,
+    full_path: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     """Serve the frontend for all routes that aren't API endpoints"""
-    frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
-    index_file = frontend_dist / "index.html"
-    
-    print(f"DEBUG: Looking for index.html at: {index_file.absolute()}")
-    print(f"DEBUG: Frontend dist exists: {frontend_dist.exists()}")
-    
-    if index_file.exists():
-        return FileResponse(index_file)
-    else:
-        return {"error": f"Frontend not built. Looking at {index_file.absolute()}"}
+    if not static_index.loaded:
+        static_index.load()
+    if not static_index.built:
+        return {"error": f"Frontend not built. Looking at {(frontend_dist / 'index.html').absolute()}"}
+
+    static = static_index.get(full_path)
+    if static is None:
+        if full_path.startswith("assets/"):
+            raise HTTPException(status_code=404, detail="Not found")
+        static = static_index.get("index.html")
+    return static_index.respond(static, accept_encoding, if_none_match, head=request.method == "HEAD")
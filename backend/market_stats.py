@@ -0,0 +1,227 @@
+"""
+Per-city and per-area market statistics maintained incrementally.
+
+Every observed rent updates a running aggregate (count, sum, a t-digest for
+quantiles and monthly buckets for growth) in the `marketstats` summary table.
+Each write is a read-merge-write of one or two summary rows, locked first
+(summary_rows.lock_row) so concurrent writers queue instead of losing
+updates. Reads come from an in-memory copy of the table that is updated
+once local writes commit and refreshed periodically, so they are O(1)
+however much data has been collected.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+
+try:
+    from city_data import normalize_city
+    from log import get_logger
+    from models import MarketStats
+    from search import parse_price
+    from summary_rows import commit_with_retry, lock_row
+except ImportError:
+    from backend.city_data import normalize_city
+    from backend.log import get_logger
+    from backend.models import MarketStats
+    from backend.search import parse_price
+    from backend.summary_rows import commit_with_retry, lock_row
+
+logger = get_logger("market_stats")
+
+MIN_OBSERVATIONS = 5  # below this, callers should prefer curated figures
+MAX_MONTHS = 24
+REFRESH_INTERVAL = 60.0
+
+
+class TDigest:
+    """Small merging t-digest for streaming quantiles."""
+
+    def __init__(self, compression: float = 100.0, centroids=None, minimum=None, maximum=None):
+        self.compression = compression
+        self.centroids = [tuple(c) for c in centroids or []]  # sorted (mean, weight)
+        self.buffer = []
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def total(self):
+        return sum(w for _, w in self.centroids) + sum(w for _, w in self.buffer)
+
+    def add(self, value: float, weight: float = 1.0):
+        self.buffer.append((value, weight))
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.buffer) > self.compression * 5:
+            self._compress()
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        total = sum(w for _, w in points)
+        merged = []
+        before = 0.0  # weight of centroids fully before merged[-1]
+        for mean, weight in points:
+            if merged:
+                last_mean, last_weight = merged[-1]
+                q = (before + (last_weight + weight) / 2) / total
+                if last_weight + weight <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                    combined = last_weight + weight
+                    merged[-1] = ((last_mean * last_weight + mean * weight) / combined, combined)
+                    continue
+                before += last_weight
+            merged.append((mean, weight))
+        self.centroids = merged
+        self.buffer = []
+
+    def quantile(self, q: float):
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * sum(w for _, w in self.centroids)
+        cumulative = 0.0
+        prev_mean, prev_center = self.min, 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - prev_center
+                return prev_mean + (mean - prev_mean) * ((target - prev_center) / span if span else 0)
+            prev_mean, prev_center = mean, center
+            cumulative += weight
+        return self.max
+
+    def to_dict(self):
+        self._compress()
+        return {"c": [[round(m, 2), w] for m, w in self.centroids], "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(centroids=data.get("c"), minimum=data.get("min"), maximum=data.get("max"))
+
+
+class MarketAggregate:
+    def __init__(self, count=0, total=0.0, digest=None, monthly=None):
+        self.count = count
+        self.total = total
+        self.digest = digest or TDigest()
+        self.monthly = monthly or {}  # "YYYY-MM" -> [count, sum]
+
+    def add(self, rent: float, when: datetime):
+        self.count += 1
+        self.total += rent
+        self.digest.add(rent)
+        bucket = self.monthly.setdefault(when.strftime("%Y-%m"), [0, 0.0])
+        bucket[0] += 1
+        bucket[1] += rent
+        for month in sorted(self.monthly)[:-MAX_MONTHS]:
+            del self.monthly[month]
+
+    def growth(self):
+        """Month-over-month change in mean rent between the two latest months with data."""
+        months = sorted(self.monthly)
+        if len(months) < 2:
+            return None
+        (prev_count, prev_sum), (count, total) = self.monthly[months[-2]], self.monthly[months[-1]]
+        return (total / count) / (prev_sum / prev_count) - 1
+
+    def summary(self):
+        growth = self.growth()
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count) if self.count else None,
+            "p10": _round(self.digest.quantile(0.10)),
+            "p25": _round(self.digest.quantile(0.25)),
+            "p50": _round(self.digest.quantile(0.50)),
+            "p75": _round(self.digest.quantile(0.75)),
+            "p90": _round(self.digest.quantile(0.90)),
+            "growth_mom": round(growth, 4) if growth is not None else None,
+        }
+
+    @classmethod
+    def from_row(cls, row: MarketStats):
+        return cls(row.count, row.total, TDigest.from_dict(json.loads(row.digest)), json.loads(row.monthly))
+
+    def write_row(self, row: MarketStats):
+        row.count = self.count
+        row.total = self.total
+        row.digest = json.dumps(self.digest.to_dict(), separators=(",", ":"))
+        row.monthly = json.dumps(self.monthly, separators=(",", ":"))
+        row.updated_at = datetime.utcnow()
+
+
+def _round(value):
+    return round(value) if value is not None else None
+
+
+class MarketStatsStore:
+    def __init__(self, city_key=normalize_city):
+        self.city_key = city_key  # maps a city name to the key its stats are filed under
+        self._summaries = {}  # (city_key, area_key) -> summary dict
+
+    def get(self, city: str, area: str = None):
+        """O(1) summary for a city (or one of its areas), or None if nothing observed yet."""
+        return self._summaries.get((self.city_key(city), normalize_city(area) if area else ""))
+
+    async def record(self, session, observations):
+        """
+        Folds (city, area, rent, when) observations into the summary rows and commits.
+        Each affected row is locked, read, merged and written once per call.
+        """
+        grouped = {}
+        for city, area, rent, when in observations:
+            rent = parse_price(rent)
+            if not city or rent <= 0:
+                continue
+            when = when or datetime.utcnow()
+            city_key = self.city_key(city)
+            grouped.setdefault((city_key, ""), []).append((rent, when))
+            if area:
+                grouped.setdefault((city_key, normalize_city(area)), []).append((rent, when))
+        if not grouped:
+            return
+
+        async def write():
+            summaries = {}
+            # A fixed order, so two writers locking several rows can't deadlock
+            for (city_key, area_key), values in sorted(grouped.items()):
+                row = await lock_row(session, MarketStats, city_key=city_key, area_key=area_key)
+                aggregate = MarketAggregate.from_row(row)
+                for rent, when in values:
+                    aggregate.add(rent, when)
+                aggregate.write_row(row)
+                session.add(row)
+                summaries[(city_key, area_key)] = aggregate.summary()
+            return summaries
+
+        try:
+            summaries = await commit_with_retry(session, write)
+        except SQLAlchemyError as e:
+            # Callers have already stored the review or listing; losing its rent
+            # from the stats is better than failing the request
+            logger.error("rents for %s not recorded: %r", ", ".join(sorted({c for c, _ in grouped})), e)
+            return
+        # Only once committed, so memory never runs ahead of the table
+        self._summaries.update(summaries)
+
+    async def refresh(self, session):
+        """Reloads every summary row, picking up writes made by other workers."""
+        rows = (await session.exec(select(MarketStats))).all()
+        self._summaries = {(r.city_key, r.area_key): MarketAggregate.from_row(r).summary() for r in rows}
+
+    async def refresh_forever(self, session_factory, interval: float = REFRESH_INTERVAL):
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.refresh(session)
+            except Exception as e:
+                logger.warning("refresh failed: %r", e)
+            await asyncio.sleep(interval)
+
+
+def format_growth(growth):
+    return f"{growth * 100:+.0f}%"
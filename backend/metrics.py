@@ -0,0 +1,308 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+MetricsMiddleware times every request per route template, counts requests in
+flight, and attributes DB statements (counted by engine event hooks) to the
+request that issued them. Upstream calls are timed with `time_upstream`, and
+caches report through collectors that run only when /metrics is scraped.
+Values are per process; with several workers, scrape each one.
+
+Setting PROFILE_DIR (and optionally PROFILE_SAMPLE_RATE, default 0.01) saves
+a cProfile dump for a sample of requests, one at a time.
+"""
+import bisect
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+try:
+    from log import get_logger
+except ImportError:
+    from backend.log import get_logger
+
+logger = get_logger("metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.01"))
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in self.values.items():
+            yield f"{self.name}{_label_text(self.labels, values)} {total:g}"
+
+
+class Gauge(Counter):
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        self.values[label_values] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for values, current in self.values.items():
+            yield f"{self.name}{_label_text(self.labels, values)} {current:g}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, *label_values, value: float):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labels + ("le",)
+        for values, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_label_text(names, values + (f'{bound:g}',))} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_label_text(names, values + ('+Inf',))} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labels, values)} {series[-1]:.6f}"
+            yield f"{self.name}_count{_label_text(self.labels, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, labels=()):
+        metric = Gauge(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """collect() -> iterable of metrics, built fresh at scrape time."""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                for metric in collect():
+                    lines.extend(metric.render())
+            except Exception:
+                logger.exception("metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route"))
+REQUESTS = registry.counter("http_requests_total", "Requests by route template and status", ("method", "route", "status"))
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being handled")
+REQUEST_DB_QUERIES = registry.histogram(
+    "http_request_db_queries", "DB statements issued per request", ("method", "route"), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Time spent in DB statements per request", ("method", "route"))
+DB_QUERY_SECONDS = registry.histogram("db_query_duration_seconds", "DB statement latency", ("engine", "operation"))
+UPSTREAM_SECONDS = registry.histogram(
+    "upstream_request_duration_seconds", "Upstream call latency", ("upstream", "outcome"))
+
+
+class _RequestStats:
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """Times every statement on a (sync) engine; pass async_engine.sync_engine for async engines."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed = time.perf_counter() - started
+        operation = statement.lstrip()[:6].upper()
+        DB_QUERY_SECONDS.observe(name, operation if operation in SQL_OPERATIONS else "OTHER", value=elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+@contextmanager
+def time_upstream(upstream: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_SECONDS.observe(upstream, outcome, value=time.perf_counter() - started)
+
+
+class CacheStats:
+    """Collector exposing TTLCache-style stats() dicts, labelled by cache name."""
+
+    COUNTERS = {"hits", "misses", "evictions", "coalesced", "errors"}
+
+    def __init__(self):
+        self.caches = {}  # name -> object with stats()
+
+    def register(self, name, cache):
+        self.caches[name] = cache
+
+    def __call__(self):
+        fields = {}
+        for name, cache in self.caches.items():
+            for field, value in cache.stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    fields.setdefault(field, {})[name] = value
+        for field, values in sorted(fields.items()):
+            if field in self.COUNTERS:
+                metric = Counter(f"cache_{field}_total", f"Cache {field}", ("cache",))
+            else:
+                metric = Gauge(f"cache_{field}", f"Cache {field.replace('_', ' ')}", ("cache",))
+            metric.values = {(name,): value for name, value in values.items()}
+            yield metric
+
+
+cache_stats = CacheStats()
+registry.register_collector(cache_stats)
+
+
+class _Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = False
+
+    def maybe_start(self):
+        if not PROFILE_DIR or random.random() >= PROFILE_SAMPLE_RATE:
+            return None
+        with self._lock:
+            if self.active:
+                return None
+            self.active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile, method, route):
+        profile.disable()
+        slug = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{method}-{slug}.prof")
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile.dump_stats(path)
+            logger.debug("saved request profile", extra={"path": path})
+        except OSError:
+            logger.exception("could not save request profile")
+        finally:
+            self.active = False
+
+
+profiler = _Profiler()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no per-request task or body buffering."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        profile = profiler.maybe_start()
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(method, route, value=elapsed)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_DB_QUERIES.observe(method, route, value=stats.db_queries)
+            if stats.db_queries:
+                REQUEST_DB_SECONDS.observe(method, route, value=stats.db_seconds)
+            if profile is not None:
+                profiler.finish(profile, method, route)
@@ -0,0 +1,308 @@
+"""
+Forward-only schema migrations for databases created before a model change.
+
+create_all() only creates missing tables, so columns, indexes and search
+structures added later are applied here. Every step is idempotent and its
+version is recorded in `schema_migrations`, so startup is a single SELECT
+once a database is current.
+
+A fingerprint of the models plus the latest migration version is stored in
+`schema_marker` once everything is applied; while it matches, startup skips
+create_all() and the migration check altogether.
+"""
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+try:
+    from log import get_logger
+except ImportError:
+    from backend.log import get_logger
+
+logger = get_logger("migrations")
+
+
+def _normalize_review_city_keys(conn):
+    # In Python rather than SQL: lower(trim()) would keep doubled inner spaces and
+    # fold case differently, and only the city data knows aliases. Keys match
+    # services.community_key, which the app stores and looks reviews up by
+    try:
+        from city_data import CityDataStore, normalize_city
+    except ImportError:
+        from backend.city_data import CityDataStore, normalize_city
+
+    snapshot = CityDataStore().load()
+    stale = []
+    for review_id, city, key in conn.execute(text("SELECT id, city, city_key FROM rentreview")):
+        community_key = snapshot.canonical_key(city or "") or normalize_city(city or "")
+        if key != community_key:
+            stale.append({"id": review_id, "key": community_key})
+    if stale:
+        conn.execute(text("UPDATE rentreview SET city_key = :key WHERE id = :id"), stale)
+
+
+def _review_city_key(conn, dialect):
+    columns = {c["name"] for c in inspect(conn).get_columns("rentreview")}
+    if "city_key" not in columns:
+        conn.execute(text("ALTER TABLE rentreview ADD COLUMN city_key VARCHAR NOT NULL DEFAULT ''"))
+    _normalize_review_city_keys(conn)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_rentreview_city_key_likes ON rentreview (city_key, likes)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_rentreview_city_key_timestamp ON rentreview (city_key, timestamp)"))
+
+
+def _review_fulltext(conn, dialect):
+    if dialect == "sqlite":
+        # External-content FTS5 index kept in sync by triggers; likes updates don't touch it
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS rentreview_fts USING fts5("
+            "review_text, content='rentreview', content_rowid='id', tokenize='porter unicode61')"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS rentreview_fts_ai AFTER INSERT ON rentreview BEGIN "
+            "INSERT INTO rentreview_fts(rowid, review_text) VALUES (new.id, new.review_text); END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS rentreview_fts_ad AFTER DELETE ON rentreview BEGIN "
+            "INSERT INTO rentreview_fts(rentreview_fts, rowid, review_text) VALUES ('delete', old.id, old.review_text); END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS rentreview_fts_au AFTER UPDATE OF review_text ON rentreview BEGIN "
+            "INSERT INTO rentreview_fts(rentreview_fts, rowid, review_text) VALUES ('delete', old.id, old.review_text); "
+            "INSERT INTO rentreview_fts(rowid, review_text) VALUES (new.id, new.review_text); END"
+        ))
+        conn.execute(text("INSERT INTO rentreview_fts(rentreview_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE rentreview ADD COLUMN IF NOT EXISTS review_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', coalesce(review_text, ''))) STORED"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_rentreview_review_tsv ON rentreview USING GIN (review_tsv)"))
+
+
+def _list_ordering_indexes(conn, dialect):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_question_timestamp ON question (timestamp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_savedlisting_timestamp ON savedlisting (timestamp)"))
+
+
+def _answer_question_index(conn, dialect):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_answer_question_id ON answer (question_id)"))
+
+
+def _add_missing_columns(conn, table, columns):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for name, ddl_type in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+
+def _rent_observation_columns(conn, dialect):
+    _add_missing_columns(conn, "rentreview", [
+        ("rent_amount", "INTEGER"), ("property_type", "VARCHAR"), ("area", "VARCHAR"),
+        ("bedrooms", "INTEGER"), ("bathrooms", "INTEGER"),
+    ])
+    _add_missing_columns(conn, "propertylisting", [
+        ("rent", "INTEGER"), ("bedrooms", "INTEGER"), ("bathrooms", "INTEGER"),
+    ])
+
+
+def _market_stats_backfill(conn, dialect):
+    # One-time build of the summary table from rents collected before it existed
+    try:
+        from city_data import CityDataStore, normalize_city
+        from market_stats import MarketAggregate
+        from models import MarketStats
+    except ImportError:
+        from backend.city_data import CityDataStore, normalize_city
+        from backend.market_stats import MarketAggregate
+        from backend.models import MarketStats
+
+    snapshot = CityDataStore().load()
+    aggregates = {}
+    rows = list(conn.execute(text(
+        "SELECT city, area, rent_amount, timestamp FROM rentreview WHERE rent_amount IS NOT NULL"
+    ))) + list(conn.execute(text(
+        "SELECT city, area, rent, timestamp FROM propertylisting WHERE rent IS NOT NULL AND status = 'Approved'"
+    )))
+    for city, area, rent, when in rows:
+        if isinstance(when, str):
+            when = datetime.fromisoformat(when)
+        city_key = snapshot.canonical_key(city) or normalize_city(city)
+        keys = [(city_key, "")] + ([(city_key, normalize_city(area))] if area else [])
+        for key in keys:
+            aggregates.setdefault(key, MarketAggregate()).add(rent, when)
+
+    for (city_key, area_key), aggregate in aggregates.items():
+        exists = conn.execute(
+            text("SELECT 1 FROM marketstats WHERE city_key = :c AND area_key = :a"), {"c": city_key, "a": area_key}
+        ).first()
+        if exists:
+            continue
+        row = MarketStats(city_key=city_key, area_key=area_key)
+        aggregate.write_row(row)
+        conn.execute(MarketStats.__table__.insert().values(**row.model_dump(exclude={"id"})))
+
+
+def _saved_listing_user(conn, dialect):
+    _add_missing_columns(conn, "savedlisting", [("user_id", "VARCHAR NOT NULL DEFAULT ''")])
+    # Keep the oldest copy of each duplicate save so the unique index can be built
+    conn.execute(text(
+        "DELETE FROM savedlisting WHERE id NOT IN ("
+        "SELECT MIN(id) FROM savedlisting GROUP BY user_id, listing_id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_savedlisting_user_listing ON savedlisting (user_id, listing_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_savedlisting_user_timestamp ON savedlisting (user_id, timestamp)"
+    ))
+    # Both are covered by the indexes above
+    conn.execute(text("DROP INDEX IF EXISTS ix_savedlisting_listing_id"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_savedlisting_timestamp"))
+
+
+def _listing_coordinates(conn, dialect):
+    _add_missing_columns(conn, "propertylisting", [("lat", "FLOAT"), ("lon", "FLOAT")])
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_propertylisting_lat_lon ON propertylisting (lat, lon)"))
+
+
+def _listing_status_index(conn, dialect):
+    # Serves the moderation queue (status, oldest first) and loading approved listings
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_propertylisting_status_timestamp ON propertylisting (status, timestamp)"
+    ))
+
+
+def _review_summary_backfill(conn, dialect):
+    # One-time build of the summary table from reviews stored before it existed
+    try:
+        from city_data import CityDataStore, normalize_city
+        from models import ReviewSummary
+        from review_summary import ReviewAggregate
+    except ImportError:
+        from backend.city_data import CityDataStore, normalize_city
+        from backend.models import ReviewSummary
+        from backend.review_summary import ReviewAggregate
+
+    snapshot = CityDataStore().load()
+    aggregates = {}
+    rows = conn.execute(text("SELECT id, city, review_text, rating, likes FROM rentreview ORDER BY id"))
+    for review in rows.mappings():
+        # Keyed like market stats (services.community_key), so aliases share a summary
+        city_key = snapshot.canonical_key(review["city"]) or normalize_city(review["city"])
+        if city_key:
+            aggregates.setdefault(city_key, ReviewAggregate()).add(dict(review))
+
+    for city_key, aggregate in aggregates.items():
+        exists = conn.execute(text("SELECT 1 FROM reviewsummary WHERE city_key = :c"), {"c": city_key}).first()
+        if exists:
+            continue
+        row = ReviewSummary(city_key=city_key)
+        aggregate.write_row(row)
+        conn.execute(ReviewSummary.__table__.insert().values(**row.model_dump(exclude={"id"})))
+
+
+def _review_city_key_whitespace(conn, dialect):
+    # Databases migrated while step 1 still used lower(trim(city))
+    _normalize_review_city_keys(conn)
+
+
+def _review_city_key_community(conn, dialect):
+    # Steps 1 and 11 first stored the normalized name, so aliases had keys of their own
+    _normalize_review_city_keys(conn)
+
+
+def _review_summary_community_keys(conn, dialect):
+    # Step 10 first filed summaries under the normalized name, splitting a
+    # city's aliases; rebuild them under the community key
+    conn.execute(text("DELETE FROM reviewsummary"))
+    _review_summary_backfill(conn, dialect)
+
+
+# (version, name, step) - append only, never renumber
+MIGRATIONS = [
+    (1, "review_city_key", _review_city_key),
+    (2, "review_fulltext", _review_fulltext),
+    (3, "list_ordering_indexes", _list_ordering_indexes),
+    (4, "answer_question_index", _answer_question_index),
+    (5, "rent_observation_columns", _rent_observation_columns),
+    (6, "market_stats_backfill", _market_stats_backfill),
+    (7, "saved_listing_user", _saved_listing_user),
+    (8, "listing_coordinates", _listing_coordinates),
+    (9, "listing_status_index", _listing_status_index),
+    (10, "review_summary_backfill", _review_summary_backfill),
+    (11, "review_city_key_whitespace", _review_city_key_whitespace),
+    (12, "review_summary_community_keys", _review_summary_community_keys),
+    (13, "review_city_key_community", _review_city_key_community),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(engine) -> list:
+    """Applies pending migrations in order and returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                step(conn, engine.dialect.name)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.utcnow()},
+                )
+        except IntegrityError:
+            # Another worker applied it concurrently
+            continue
+        except (OperationalError, ProgrammingError) as e:
+            # e.g. SQLite built without FTS5; leave it pending and keep the app up
+            logger.error("%s (%s) failed: %s", version, name, e)
+            continue
+        logger.info("applied %s (%s)", version, name)
+        applied.append(version)
+    return applied
+
+
+def pending_versions(engine) -> set:
+    return {version for version, _, _ in MIGRATIONS} - applied_versions(engine)
+
+
+def schema_fingerprint(metadata) -> str:
+    """Changes whenever a table, column or index is added, or a migration is appended."""
+    parts = [f"migrations:{LATEST_VERSION}"]
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"{table.name}({','.join(sorted(c.name for c in table.columns))})")
+        parts.extend(sorted(f"index:{index.name}" for index in table.indexes))
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def schema_is_current(engine, fingerprint: str) -> bool:
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT fingerprint FROM schema_marker")).first()
+    except (OperationalError, ProgrammingError):
+        return False  # no marker table yet
+    return row is not None and row[0] == fingerprint
+
+
+def mark_schema(engine, fingerprint: str):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_marker (fingerprint VARCHAR NOT NULL)"))
+        conn.execute(text("DELETE FROM schema_marker"))
+        conn.execute(text("INSERT INTO schema_marker (fingerprint) VALUES (:f)"), {"f": fingerprint})
+
+
+def has_fulltext(engine) -> bool:
+    return 2 in applied_versions(engine)
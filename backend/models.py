@@ -1,27 +1,63 @@
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index, UniqueConstraint, event
 from datetime import datetime
 
+try:
+    from city_data import normalize_city
+except ImportError:
+    from backend.city_data import normalize_city
+
 class RentReview(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_rentreview_city_key_likes", "city_key", "likes"),
+        Index("ix_rentreview_city_key_timestamp", "city_key", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     city: str
+    city_key: str = ""  # review_city_key(city), maintained on write; what lookups filter on
     review_text: str
-    rating: int  # 1-5
+    rating: int = Field(ge=1, le=5)
     likes: int = 0
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Optional rent details, used by the rent estimator
+    rent_amount: Optional[int] = None  # monthly, ₹
+    property_type: Optional[str] = None  # Flat, PG, House
+    area: Optional[str] = None
+    bedrooms: Optional[int] = None
+    bathrooms: Optional[int] = None
+
+_city_key = normalize_city
+
+
+def use_review_city_key(city_key):
+    """Sets what reviews' city_key holds; services uses its community_key, so aliases share a key."""
+    global _city_key
+    _city_key = city_key
+
+
+def review_city_key(city: str) -> str:
+    return _city_key(city or "")
+
+
+@event.listens_for(RentReview, "before_insert")
+@event.listens_for(RentReview, "before_update")
+def _set_review_city_key(mapper, connection, review):
+    review.city_key = review_city_key(review.city)
 
 class Question(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     text: str
     user_name: str = "Anonymous"
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
     upvotes: int = 0
     
     answers: List["Answer"] = Relationship(back_populates="question")
 
 class Answer(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    question_id: int = Field(foreign_key="question.id")
+    question_id: int = Field(foreign_key="question.id", index=True)
     text: str
     user_name: str = "Community Member"
     is_verified: bool = False
@@ -30,6 +66,11 @@ class Answer(SQLModel, table=True):
     question: Optional[Question] = Relationship(back_populates="answers")
 
 class PropertyListing(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_propertylisting_lat_lon", "lat", "lon"),
+        Index("ix_propertylisting_status_timestamp", "status", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_name: str
     contact: str
@@ -37,12 +78,23 @@ class PropertyListing(SQLModel, table=True):
     city: str
     area: str
     description: Optional[str] = None
-    status: str = "Pending"  # Pending, Approved
+    rent: Optional[int] = None  # monthly, ₹
+    bedrooms: Optional[int] = None
+    bathrooms: Optional[int] = None
+    lat: Optional[float] = None  # WGS84 degrees; both or neither
+    lon: Optional[float] = None
+    status: str = "Pending"  # Pending, Approved, Rejected
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class SavedListing(SQLModel, table=True):
+    __table_args__ = (
+        Index("uq_savedlisting_user_listing", "user_id", "listing_id", unique=True),
+        Index("ix_savedlisting_user_timestamp", "user_id", "timestamp"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    listing_id: str = Field(index=True)
+    user_id: str = ""  # anonymous client id from X-User-Id; "" for requests without one
+    listing_id: str
     name: str = Field(default="Unknown Property") # Default to handle legacy data if any
     price: int = Field(default=0)
     area: str = Field(default="Unknown Area")
@@ -50,3 +102,28 @@ class SavedListing(SQLModel, table=True):
     image: str = Field(default="")
     type: str = Field(default="Flat")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class MarketStats(SQLModel, table=True):
+    """Running rent aggregate for a city (area_key "") or one of its areas."""
+    __table_args__ = (UniqueConstraint("city_key", "area_key", name="uq_marketstats_city_area"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    city_key: str
+    area_key: str = ""
+    count: int = 0
+    total: float = 0.0
+    digest: str = "{}"  # serialized t-digest
+    monthly: str = "{}"  # {"YYYY-MM": [count, sum]}
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ReviewSummary(SQLModel, table=True):
+    """Running review aggregate for a city: ratings, most-liked reviews and keywords."""
+    __table_args__ = (UniqueConstraint("city_key", name="uq_reviewsummary_city"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    city_key: str
+    count: int = 0
+    histogram: str = "[0,0,0,0,0]"  # reviews rated 1..5
+    top: str = "[]"  # most-liked reviews, [{"id", "excerpt", "rating", "likes"}]
+    keywords: str = "{}"  # word -> number of reviews mentioning it
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
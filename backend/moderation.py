@@ -0,0 +1,202 @@
+"""
+Moderation of submitted property listings.
+
+Listings arrive as Pending. Moderators page through the queue oldest first
+and approve or reject them in batches, one transaction per batch. Approved
+listings are kept in memory by ApprovedListings so /search, /city-info and
+the geo index can serve them without touching the database per request.
+"""
+import asyncio
+import os
+import threading
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+try:
+    from models import PropertyListing
+except ImportError:
+    from backend.models import PropertyListing
+
+PENDING, APPROVED, REJECTED = "Pending", "Approved", "Rejected"
+MAX_BATCH = 500
+# Required in X-Moderation-Token; unset, the moderation endpoints refuse every request
+MODERATION_TOKEN = os.environ.get("MODERATION_TOKEN")
+
+
+def community_listing(listing) -> dict:
+    """An approved PropertyListing in the shape of the curated listings."""
+    return {
+        "id": f"listing-{listing.id}",
+        "type": listing.type,
+        "name": f"{listing.type} in {listing.area}",
+        "area": listing.area,
+        "city": listing.city,
+        "price": f"₹{listing.rent:,}/mo" if listing.rent else "",
+        "image": "",
+        "specs": f"{listing.bedrooms} Bedroom" if listing.bedrooms else "",
+        "amenities": [],
+        "description": listing.description,
+        "lat": listing.lat,
+        "lon": listing.lon,
+        "timestamp": listing.timestamp.isoformat() if listing.timestamp else None,
+    }
+
+
+class ApprovedListings:
+    """
+    Approved community listings by city key, kept up to date as listings are
+    approved. The database is read in a worker thread: load() at startup,
+    reload() and fetch() when another worker publishes approvals. Readers
+    that get here before load() has finished load inline instead.
+    """
+
+    def __init__(self, city_key):
+        self._city_key = city_key  # city name -> the key its curated data and indexes use
+        self._engine = None
+        self._by_city = None  # city key -> {listing id: community_listing()}
+        self._lock = threading.Lock()
+
+    def use_stored_listings(self, engine):
+        self._engine = engine
+
+    def _load(self):
+        by_city = {}
+        if self._engine is not None:
+            statement = select(PropertyListing).where(PropertyListing.status == APPROVED).order_by(PropertyListing.id)
+            with Session(self._engine) as session:
+                for listing in session.exec(statement):
+                    entry = community_listing(listing)
+                    by_city.setdefault(self._city_key(listing.city), {})[entry["id"]] = entry
+        return by_city
+
+    def _get(self):
+        by_city = self._by_city
+        if by_city is None:
+            with self._lock:
+                if self._by_city is None:
+                    self._by_city = self._load()
+                by_city = self._by_city
+        return by_city
+
+    async def load(self):
+        if self._by_city is None:
+            by_city = await asyncio.to_thread(self._load)
+            with self._lock:
+                if self._by_city is None:
+                    self._by_city = by_city
+
+    async def reload(self):
+        """Replaces the loaded listings with the database's, e.g. after another worker's bulk change."""
+        self._by_city = await asyncio.to_thread(self._load)
+
+    def rekey(self):
+        """Regroups the loaded listings after city keys changed (a city data reload)."""
+        by_city = self._by_city
+        if by_city is None:
+            return
+        entries = sorted(
+            (entry for listings in by_city.values() for entry in listings.values()),
+            key=lambda entry: int(entry["id"].split("-", 1)[1]),
+        )
+        regrouped = {}
+        for entry in entries:
+            regrouped.setdefault(self._city_key(entry["city"]), {})[entry["id"]] = entry
+        self._by_city = regrouped
+
+    @property
+    def loaded(self) -> bool:
+        return self._by_city is not None
+
+    def __contains__(self, city_key):
+        return city_key in self._get()
+
+    def for_city(self, city_key: str) -> list:
+        return list(self._get().get(city_key, {}).values())
+
+    def latest(self, city_key: str, limit: int) -> list:
+        return self.for_city(city_key)[-limit:][::-1]
+
+    def all(self):
+        for listings in self._get().values():
+            yield from listings.values()
+
+    def add(self, listing):
+        """Adds an approved PropertyListing; returns (city key, entry)."""
+        entry = community_listing(listing)
+        city_key = self._city_key(listing.city)
+        self._get().setdefault(city_key, {})[entry["id"]] = entry
+        return city_key, entry
+
+    def missing(self, listing_ids) -> list:
+        """The ids among listing_ids that aren't loaded yet."""
+        known = set()
+        for listings in self._get().values():
+            known.update(listings)
+        return [i for i in listing_ids if f"listing-{i}" not in known]
+
+    def _fetch(self, listing_ids) -> list:
+        statement = select(PropertyListing).where(
+            PropertyListing.id.in_(list(listing_ids)), PropertyListing.status == APPROVED,
+        )
+        with Session(self._engine) as session:
+            return list(session.exec(statement))
+
+    async def fetch(self, listing_ids) -> list:
+        """Reads approved listings by id, e.g. ones another worker just approved."""
+        if self._engine is None or not listing_ids:
+            return []
+        return await asyncio.to_thread(self._fetch, listing_ids)
+
+    def stats(self):
+        by_city = self._by_city
+        if by_city is None:
+            return {"loaded": False}
+        return {"loaded": True, "listings": sum(len(l) for l in by_city.values()), "cities": len(by_city)}
+
+
+def _listing_city(city):
+    # Listings have no normalized key column; lower/trim covers the usual variants
+    return func.lower(func.trim(PropertyListing.city)) == city.strip().lower()
+
+
+def queue_filters(city: str = None):
+    filters = [PropertyListing.status == PENDING]
+    if city:
+        filters.append(_listing_city(city))
+    return filters
+
+
+async def moderate(session, approve=(), reject=()):
+    """
+    Approves and rejects pending listings in one transaction. Ids that are
+    unknown or no longer pending (e.g. handled by another moderator) are
+    skipped. Returns (approved PropertyListings, rejected ids, skipped ids).
+    """
+    approve, reject = list(dict.fromkeys(approve)), list(dict.fromkeys(reject))
+    if set(approve) & set(reject):
+        raise ValueError("a listing can't be both approved and rejected")
+    wanted = approve + reject
+    # Row locks (on PostgreSQL) stop two moderators from handling the same listing twice
+    rows = (await session.exec(
+        select(PropertyListing)
+        .where(PropertyListing.id.in_(wanted), PropertyListing.status == PENDING)
+        .with_for_update()
+    )).all() if wanted else []
+    pending = {row.id: row for row in rows}
+
+    approved = [pending[i] for i in approve if i in pending]
+    rejected = [i for i in reject if i in pending]
+    for status, ids in ((APPROVED, [row.id for row in approved]), (REJECTED, rejected)):
+        if ids:
+            await session.exec(
+                update(PropertyListing)
+                .where(PropertyListing.id.in_(ids), PropertyListing.status == PENDING)
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+    await session.commit()
+    for row in approved:
+        row.status = APPROVED
+    return approved, rejected, [i for i in wanted if i not in pending]
+
@@ -0,0 +1,118 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select as sa_select
+from sqlalchemy.types import DateTime
+from sqlmodel import select
+
+DEFAULT_PAGE_LIMIT = int(os.environ.get("PAGE_LIMIT_DEFAULT", "50"))
+MAX_PAGE_LIMIT = int(os.environ.get("PAGE_LIMIT_MAX", "200"))
+
+# Response headers carrying pagination state; list bodies stay plain arrays
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def clamp_limit(limit: int = None) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_LIMIT
+    return min(limit, MAX_PAGE_LIMIT)
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _matches_type(value, python_type) -> bool:
+    # bool is an int subclass; a JSON true is no more a valid count than "1"
+    if isinstance(value, bool):
+        return python_type is bool
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def decode_cursor(cursor: str, sort_column):
+    """(sort value, id) from a cursor, checked against the sort column's type so a
+    tampered cursor is a 400 rather than a wrong page or a database error."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        elif not _matches_type(sort_value, sort_column.type.python_type):
+            raise ValueError("sort value doesn't match the sort column")
+        if not _matches_type(row_id, int):
+            raise ValueError("id must be an integer")
+        return sort_value, row_id
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(model, fields: str = None):
+    """Parses a comma-separated sparse field list, rejecting unknown columns."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    columns = model.__table__.columns
+    unknown = [f for f in requested if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+async def keyset_page(session, model, sort_column, filters=(), cursor: str = None, limit: int = None,
+                      fields: str = None, descending: bool = True):
+    """
+    Returns (items, next_cursor) for rows ordered by (sort_column DESC, id DESC),
+    or ascending with descending=False.
+    With `fields`, only those columns are selected and items are plain dicts.
+    """
+    limit = clamp_limit(limit)
+    requested = parse_fields(model, fields)
+    id_column = model.id
+
+    if requested:
+        # Sort key and id are always read so the next cursor can be built
+        names = list(dict.fromkeys([*requested, sort_column.key, "id"]))
+        statement = sa_select(*[getattr(model, name) for name in names])
+    else:
+        statement = select(model)
+
+    for condition in filters:
+        statement = statement.where(condition)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_column)
+        if descending:
+            after = or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < last_id))
+        else:
+            after = or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > last_id))
+        statement = statement.where(after)
+    if descending:
+        statement = statement.order_by(sort_column.desc(), id_column.desc())
+    else:
+        statement = statement.order_by(sort_column.asc(), id_column.asc())
+    statement = statement.limit(limit + 1)
+
+    if requested:
+        rows = [row._mapping for row in (await session.exec(statement)).all()]
+    else:
+        rows = (await session.exec(statement)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if requested:
+            next_cursor = encode_cursor(last[sort_column.key], last["id"])
+        else:
+            next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    if requested:
+        rows = [{name: row[name] for name in requested} for row in rows]
+    return rows, next_cursor
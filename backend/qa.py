@@ -0,0 +1,47 @@
+from sqlmodel import select
+
+try:
+    from cache import make_cache
+    from models import Answer, Question
+    from pagination import keyset_page
+except ImportError:
+    from backend.cache import make_cache
+    from backend.models import Answer, Question
+    from backend.pagination import keyset_page
+
+# question id -> serialized answers (oldest first); dropped whenever an answer is added
+answer_cache = make_cache("answers", maxsize=2048, ttl=600)
+
+
+async def load_answers(session, question_ids) -> dict:
+    """Returns {question_id: [answer dicts]} using one cache read plus one IN query for the misses."""
+    answers = await answer_cache.aget_many(question_ids)
+    missing = [question_id for question_id in question_ids if question_id not in answers]
+
+    if missing:
+        fetched = {question_id: [] for question_id in missing}
+        statement = (
+            select(Answer)
+            .where(Answer.question_id.in_(missing))
+            .order_by(Answer.question_id, Answer.timestamp.asc(), Answer.id.asc())
+        )
+        for answer in (await session.exec(statement)).all():
+            fetched[answer.question_id].append(answer.model_dump())
+        answer_cache.set_many(fetched)
+        answers.update(fetched)
+    return answers
+
+
+async def get_threads(session, cursor: str = None, limit: int = None):
+    """A page of questions (newest first) with their answers: two queries at most."""
+    questions, next_cursor = await keyset_page(session, Question, Question.timestamp, cursor=cursor, limit=limit)
+    answers = await load_answers(session, [q.id for q in questions])
+    threads = []
+    for question in questions:
+        thread_answers = answers.get(question.id, [])
+        threads.append({**question.model_dump(), "answer_count": len(thread_answers), "answers": thread_answers})
+    return threads, next_cursor
+
+
+def invalidate_answers(question_id: int):
+    answer_cache.delete(question_id)
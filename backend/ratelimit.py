@@ -0,0 +1,344 @@
+"""
+Per-client rate limits and admission control, as pure ASGI middleware.
+
+Rate limits give each client a budget per route in RATE_LIMITS: `rate`
+requests per second on average with bursts of up to `burst`. Clients are
+told apart by IP address, or by their X-API-Key when it is one of
+RATE_LIMIT_API_KEYS (those get API_KEY_FACTOR times the budget). Behind a
+proxy, set RATE_LIMIT_PROXY_HOPS so the address comes from X-Forwarded-For.
+
+Budgets are token buckets in this process (RATE_LIMIT_BACKEND=memory), so
+each worker counts separately. With "shared" they are counted in the cache
+store picked by CACHE_BACKEND, as fixed windows of burst/rate seconds; that
+keeps the long-run rate but can let two bursts through across a window
+edge. A store that fails lets requests through.
+
+Admission control caps the requests handled at once per worker
+(ADMISSION_MAX_CONCURRENT). Requests over the cap wait in a FIFO queue;
+when ADMISSION_MAX_QUEUE are already waiting, or the wait passes
+ADMISSION_QUEUE_TIMEOUT, they get a 503 at once rather than timing out
+behind the backlog.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import deque, namedtuple
+
+try:
+    from cache import shared_store
+    from log import get_logger
+    from metrics import Gauge, registry
+except ImportError:
+    from backend.cache import shared_store
+    from backend.log import get_logger
+    from backend.metrics import Gauge, registry
+
+logger = get_logger("ratelimit")
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")  # memory | shared
+# Proxies in front of the app that append to X-Forwarded-For (Railway and Vercel have one)
+BEHIND_PROXY = bool(os.environ.get("RAILWAY_ENVIRONMENT") or os.environ.get("VERCEL"))
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "1" if BEHIND_PROXY else "0"))
+RATE_LIMIT_API_KEYS = [k.strip() for k in os.environ.get("RATE_LIMIT_API_KEYS", "").split(",") if k.strip()]
+API_KEY_FACTOR = float(os.environ.get("API_KEY_FACTOR", "10"))
+
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "100"))  # 0 disables the cap
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "200"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "2.0"))  # seconds
+
+# Health checks and scrapes must get through when the app is saturated
+EXEMPT_PATHS = {"/", "/metrics"}
+
+# "METHOD /route/{param}" -> (requests per second, burst); writes and upstream-heavy reads
+DEFAULT_RATE_LIMITS = {
+    "GET /city-info/{city_name}": (2.0, 30),
+    "GET /export/{dataset}": (1 / 60, 3),
+    "POST /estimate/batch": (1.0, 10),
+    "POST /reviews": (0.1, 10),
+    "POST /reviews/{city}": (0.1, 10),
+    "POST /reviews/bulk": (1 / 60, 3),
+    "POST /reviews/{review_id}/like": (0.5, 20),
+    "POST /questions": (0.1, 10),
+    "POST /questions/{question_id}/answers": (0.2, 20),
+    "POST /listings": (0.05, 5),
+    "POST /listings/bulk": (1 / 60, 3),
+    "POST /saved-properties": (2.0, 60),
+    "POST /saved-properties/batch": (1.0, 20),
+    "DELETE /saved-properties/{listing_id}": (2.0, 60),
+}
+
+RATE_LIMITED = registry.counter("http_rate_limited_total", "Requests refused by a rate limit", ("rule",))
+SHED = registry.counter("http_requests_shed_total", "Requests refused by admission control", ("reason",))
+
+Rule = namedtuple("Rule", "name rate burst")
+
+
+def load_rules() -> dict:
+    """DEFAULT_RATE_LIMITS with RATE_LIMITS (JSON, e.g. {"POST /reviews": [0.5, 20]}) applied; null removes one."""
+    rules = dict(DEFAULT_RATE_LIMITS)
+    overrides = os.environ.get("RATE_LIMITS")
+    if overrides:
+        for name, budget in json.loads(overrides).items():
+            if budget is None:
+                rules.pop(name, None)
+            else:
+                rules[name] = tuple(budget)
+    return rules
+
+
+class MemoryBuckets:
+    """Token buckets in this process."""
+
+    shared = False
+    SWEEP_EVERY = 4096  # takes between sweeps of refilled buckets
+
+    def __init__(self):
+        self._buckets = {}  # key -> [tokens, updated, rate, burst]
+        self._takes = 0
+
+    def take(self, key, rate: float, burst: float) -> float:
+        """Spends a token; returns 0 if one was there, else seconds until there will be."""
+        now = time.monotonic()
+        self._takes += 1
+        if self._takes % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [burst - 1, now, rate, burst]
+            return 0.0
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def _sweep(self, now):
+        # A bucket that has refilled is the same as no bucket
+        full = [k for k, (tokens, updated, rate, burst) in self._buckets.items()
+                if tokens + (now - updated) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+    def stats(self):
+        return {"backend": "memory", "buckets": len(self._buckets)}
+
+
+class StoreWindows:
+    """Fixed-window counters in a shared store (SQLiteStore or RedisClient), so all workers share budgets."""
+
+    shared = True  # takes block on the store, so they run in a worker thread
+    KEY_PREFIX = "rentchecker:ratelimit:"
+
+    def __init__(self, store):
+        self.store = store
+        self.errors = 0
+
+    def take(self, key, rate: float, burst: float) -> float:
+        now = time.time()
+        window = burst / rate
+        index = int(now // window)
+        try:
+            count = self.store.incr(f"{self.KEY_PREFIX}{key}:{index}", window)
+        except Exception:
+            # The store logs and backs off; meanwhile requests go unlimited rather than failing
+            self.errors += 1
+            return 0.0
+        return 0.0 if count <= burst else (index + 1) * window - now
+
+    def stats(self):
+        return {"backend": type(self.store).__name__, "errors": self.errors}
+
+
+def _route_pattern(template: str):
+    return re.compile(re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(template)))
+
+
+class RateLimiter:
+    def __init__(self, rules: dict, backend, proxy_hops: int = 0, api_keys=(), api_key_factor: float = 1.0):
+        self.backend = backend
+        self.proxy_hops = proxy_hops
+        # Keys go into store keys, so only a digest of each is kept
+        self.api_keys = {key.encode(): "key:" + hashlib.sha256(key.encode()).hexdigest()[:16] for key in api_keys}
+        self.api_key_factor = api_key_factor
+        self._exact = {}  # (method, path) -> Rule
+        self._patterns = {}  # method -> [(regex, Rule)]
+        for name, (rate, burst) in rules.items():
+            method, template = name.split(" ", 1)
+            rule = Rule(name, float(rate), float(burst))
+            if "{" in template:
+                self._patterns.setdefault(method, []).append((_route_pattern(template), rule))
+            else:
+                self._exact[(method, template)] = rule
+
+    def match(self, method: str, path: str):
+        rule = self._exact.get((method, path))
+        if rule is None:
+            for pattern, candidate in self._patterns.get(method, ()):
+                if pattern.fullmatch(path):
+                    return candidate
+        return rule
+
+    def client(self, scope):
+        """Returns (client id, budget factor)."""
+        if self.api_keys or self.proxy_hops:
+            api_key = forwarded = None
+            for name, value in scope["headers"]:
+                if name == b"x-api-key":
+                    api_key = value
+                elif name == b"x-forwarded-for":
+                    forwarded = value
+            if api_key in self.api_keys:
+                return self.api_keys[api_key], self.api_key_factor
+            if forwarded and self.proxy_hops:
+                hops = forwarded.decode("latin-1").split(",")
+                if len(hops) >= self.proxy_hops:
+                    return "ip:" + hops[-self.proxy_hops].strip(), 1.0
+        peer = scope.get("client")
+        return "ip:" + (peer[0] if peer else "unknown"), 1.0
+
+    async def check(self, rule: Rule, scope) -> float:
+        """0 if the request is within budget, else seconds until it would be."""
+        client, factor = self.client(scope)
+        args = (f"{rule.name}|{client}", rule.rate * factor, rule.burst * factor)
+        if self.backend.shared:
+            return await asyncio.to_thread(self.backend.take, *args)
+        return self.backend.take(*args)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+class ConcurrencyGate:
+    """At most `limit` requests at once; up to `max_queue` more wait their turn in order."""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._waiters = deque()  # futures; done or cancelled ones are skipped
+
+    async def enter(self):
+        """Returns None once admitted, or why the request was refused."""
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return None
+        if self.waiting >= self.max_queue:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.waiting += 1
+        try:
+            # A slot handed over by leave() arrives as the future's result
+            await asyncio.wait_for(future, self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self.leave()  # admitted just as the wait ran out; pass the slot on
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.leave()  # cancelled after the slot was handed over; don't leak it
+            raise
+        finally:
+            self.waiting -= 1
+
+    def leave(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting}
+
+
+def make_limiter():
+    if not RATE_LIMIT_ENABLED:
+        return None
+    backend = MemoryBuckets()
+    if RATE_LIMIT_BACKEND == "shared":
+        store = shared_store()
+        if store is None:
+            logger.warning("RATE_LIMIT_BACKEND=shared needs CACHE_BACKEND=sqlite or redis; counting per worker")
+        else:
+            backend = StoreWindows(store)
+    return RateLimiter(load_rules(), backend, RATE_LIMIT_PROXY_HOPS, RATE_LIMIT_API_KEYS, API_KEY_FACTOR)
+
+
+def make_gate():
+    if ADMISSION_MAX_CONCURRENT <= 0:
+        return None
+    return ConcurrencyGate(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+
+limiter = make_limiter()
+gate = make_gate()
+
+
+def _admission_metrics():
+    if gate is not None:
+        for name, help, value in (("active", "Requests admitted and running", gate.active),
+                                  ("waiting", "Requests queued for admission", gate.waiting)):
+            metric = Gauge(f"admission_{name}", help)
+            metric.values = {(): value}
+            yield metric
+
+
+registry.register_collector(_admission_metrics)
+
+
+async def _refuse(send, status: int, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Refuses over-budget clients with 429 and sheds load with 503 once the queue is full or too slow."""
+
+    def __init__(self, app, limiter=limiter, gate=gate):
+        self.app = app
+        self.limiter = limiter
+        self.gate = gate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        if self.limiter is not None:
+            rule = self.limiter.match(scope["method"], scope["path"])
+            if rule is not None:
+                retry_after = await self.limiter.check(rule, scope)
+                if retry_after:
+                    RATE_LIMITED.inc(rule.name)
+                    return await _refuse(send, 429, retry_after, "Too many requests, slow down")
+
+        if self.gate is None:
+            return await self.app(scope, receive, send)
+        refused = await self.gate.enter()
+        if refused:
+            SHED.inc(refused)
+            return await _refuse(send, 503, 1, "Server busy, try again shortly")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.leave()
@@ -0,0 +1,253 @@
+"""
+Background refresh of upstream city data.
+
+Requests read upstream-backed values (e.g. Wikipedia intros) from a local
+store; this scheduler keeps that store warm for the most requested cities.
+Each (source, city) job is re-run on a jittered interval, failures back off
+exponentially, every upstream has its own circuit breaker, and at most
+CONCURRENCY fetches are in flight at once.
+"""
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+
+try:
+    from city_data import normalize_city
+    from log import get_logger
+except ImportError:
+    from backend.city_data import normalize_city
+    from backend.log import get_logger
+
+logger = get_logger("refresh")
+
+TOP_N = int(os.environ.get("CITY_REFRESH_TOP_N", "50"))
+INTERVAL = float(os.environ.get("CITY_REFRESH_INTERVAL", str(6 * 3600)))
+JITTER = float(os.environ.get("CITY_REFRESH_JITTER", "0.1"))  # +/- fraction of the interval
+CONCURRENCY = int(os.environ.get("CITY_REFRESH_CONCURRENCY", "4"))
+FETCH_TIMEOUT = float(os.environ.get("CITY_REFRESH_FETCH_TIMEOUT", "10.0"))
+BACKOFF_BASE = float(os.environ.get("CITY_REFRESH_BACKOFF_BASE", "5.0"))
+BACKOFF_MAX = float(os.environ.get("CITY_REFRESH_BACKOFF_MAX", "1800.0"))
+BREAKER_THRESHOLD = int(os.environ.get("CITY_REFRESH_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.environ.get("CITY_REFRESH_BREAKER_RESET", "60.0"))
+TICK_INTERVAL = 1.0
+MAX_TRACKED = TOP_N * 20  # request counters kept between ticks
+DECAY_EVERY = 600.0  # request counts halve this often, so popularity follows recent traffic
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; half-open (one trial call) after `reset_timeout`."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def retry_at(self) -> float:
+        return (self.opened_at or 0.0) + self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+@dataclass
+class RefreshSource:
+    """An upstream-backed value per city: fetch(city_name) -> value, written to store[normalized city]."""
+    name: str
+    upstream: str
+    fetch: object
+    store: object
+    interval: float = INTERVAL
+
+
+class RefreshScheduler:
+    def __init__(self, top_n: int = TOP_N, concurrency: int = CONCURRENCY):
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self.sources = {}
+        self.breakers = {}
+        self._names = {}  # city key -> name as last requested, passed to fetch()
+        self._counts = {}  # city key -> decayed request count
+        self._pinned = set()  # always refreshed, e.g. curated cities
+        self._requested = set()  # missed the store; fetched on the next tick even if not popular
+        self._due = {}  # (source, city key) -> monotonic time of next run
+        self._failures = {}  # (source, city key) -> consecutive failures
+        self._in_flight = set()
+        self._listeners = []
+        self._wake = None
+        self._semaphore = None
+        self._task = None
+        self._jobs = set()
+        self._next_decay = 0.0
+        self.refreshed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def register(self, source: RefreshSource):
+        self.sources[source.name] = source
+        self.breakers.setdefault(source.upstream, CircuitBreaker())
+
+    def on_refresh(self, callback):
+        """Registers callback(source_name, city_key), run when a refresh changes a stored value."""
+        self._listeners.append(callback)
+
+    def pin(self, city_names):
+        for name in city_names:
+            key = normalize_city(name)
+            self._pinned.add(key)
+            self._names.setdefault(key, name)
+
+    def touch(self, city_name: str):
+        """Counts a request for the city; popular cities are kept warm."""
+        key = normalize_city(city_name)
+        if not key:
+            return
+        self._counts[key] = self._counts.get(key, 0.0) + 1.0
+        self._names.setdefault(key, city_name)
+
+    def request(self, city_name: str):
+        """Asks for an immediate fetch of a city that missed the store."""
+        self.touch(city_name)
+        key = normalize_city(city_name)
+        self._requested.add(key)
+        now = time.monotonic()
+        for name in self.sources:
+            if self._failures.get((name, key)) is None:
+                self._due[(name, key)] = min(self._due.get((name, key), now), now)
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._next_decay = time.monotonic() + DECAY_EVERY
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            for job in list(self._jobs):
+                job.cancel()
+            await asyncio.gather(self._task, *self._jobs, return_exceptions=True)
+            self._task = None
+
+    def _wanted(self):
+        popular = sorted(self._counts, key=self._counts.get, reverse=True)[:self.top_n]
+        return self._pinned.union(popular)
+
+    def _decay(self, now):
+        if now >= self._next_decay:
+            self._next_decay = now + DECAY_EVERY
+            self._counts = {k: c / 2 for k, c in self._counts.items() if c >= 0.5}
+        elif len(self._counts) > MAX_TRACKED:
+            keep = sorted(self._counts, key=self._counts.get, reverse=True)[:MAX_TRACKED]
+            self._counts = {k: self._counts[k] for k in keep}
+        else:
+            return
+        # Forget scheduling state for cities that are no longer tracked
+        live = self._pinned.union(self._counts, self._requested)
+        self._names = {k: v for k, v in self._names.items() if k in live}
+        self._due = {job: t for job, t in self._due.items() if job[1] in live}
+        self._failures = {job: n for job, n in self._failures.items() if job[1] in live}
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            self._decay(now)
+            wanted = self._wanted().union(self._requested)
+            self._requested.clear()
+            for key in wanted:
+                for name, source in self.sources.items():
+                    job = (name, key)
+                    if job in self._in_flight or self._due.get(job, now) > now:
+                        continue
+                    breaker = self.breakers[source.upstream]
+                    if not breaker.allow():
+                        self._due[job] = breaker.retry_at()
+                        continue
+                    self._in_flight.add(job)
+                    task = asyncio.create_task(self._refresh(source, key, breaker))
+                    self._jobs.add(task)
+                    task.add_done_callback(self._jobs.discard)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), TICK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _refresh(self, source, key, breaker):
+        job = (source.name, key)
+        try:
+            async with self._semaphore:
+                value = await asyncio.wait_for(source.fetch(self._names.get(key, key)), FETCH_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failures = self._failures.get(job, 0) + 1
+            self._failures[job] = failures
+            breaker.record_failure()
+            self.failed += 1
+            delay = min(BACKOFF_BASE * 2 ** (failures - 1), BACKOFF_MAX)
+            self._due[job] = time.monotonic() + delay * random.uniform(0.5, 1.0)
+            logger.warning("%s for %s failed (%dx), retrying in ~%.1fs: %s", source.name, key, failures, delay, type(e).__name__)
+            return
+        finally:
+            self._in_flight.discard(job)
+
+        breaker.record_success()
+        self._failures.pop(job, None)
+        self.refreshed += 1
+        self._due[job] = time.monotonic() + source.interval * random.uniform(1 - JITTER, 1 + JITTER)
+        # Keep the value past the next scheduled run so a failed refresh serves the old one
+        previous = await source.store.apeek(key)
+        source.store.set(key, value, ttl=source.interval * 4)
+        if value != previous:
+            for callback in self._listeners:
+                callback(source.name, key)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "tracked_cities": len(self._wanted()),
+            "in_flight": len(self._in_flight),
+            "backing_off": len(self._failures),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "breakers": {name: b.stats() for name, b in self.breakers.items()},
+        }
@@ -0,0 +1,61 @@
+"""
+Fast JSON responses for list endpoints.
+
+Routes that return json_response(...) skip FastAPI's jsonable_encoder and
+response-model validation: rows (SQLModel objects, dicts, cached answer
+lists) go straight to bytes, with orjson when it is installed
+(ORJSON_AVAILABLE). The JSON has the same values FastAPI would send:
+datetimes as ISO 8601, non-ASCII text such as ₹ as plain UTF-8; only model
+keys come out in field declaration order. FAST_JSON=0 sends them through
+the default encoder instead, e.g. to compare the two.
+"""
+import importlib.util
+import json
+import os
+from datetime import date, datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+FAST_JSON = os.environ.get("FAST_JSON", "1") == "1"
+
+_fields = {}  # model class -> field names, as model_dump() would include them
+
+
+def _default(value):
+    """Serializes what the JSON encoders don't handle natively: models and, for json.dumps, datetimes."""
+    if isinstance(value, BaseModel):
+        cls = type(value)
+        names = _fields.get(cls)
+        if names is None:
+            names = _fields[cls] = tuple(cls.model_fields)
+        return {name: getattr(value, name) for name in names}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+    def dumps(content) -> bytes:
+        # Naive datetimes stay naive (no "+00:00"), matching pydantic's output
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(content, response: Response = None, status_code: int = 200) -> Response:
+    """
+    The response for content; headers set on the route's injected `response`
+    (e.g. X-Next-Cursor) are carried over, since a returned Response replaces it.
+    """
+    headers = dict(response.headers) if response is not None else None
+    if not FAST_JSON:
+        return JSONResponse(jsonable_encoder(content), status_code=status_code, headers=headers)
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type="application/json")
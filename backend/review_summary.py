@@ -0,0 +1,234 @@
+"""
+Per-city review summaries maintained incrementally.
+
+Every stored review and every like updates a running aggregate in the
+`reviewsummary` table: the rating histogram (from which the average and a
+rating-based sentiment split follow), the most-liked reviews as short
+excerpts, and how many reviews mention each keyword. Cities are keyed like
+market stats (services.community_key), so aliases share one summary. As
+with market stats, each write is a read-merge-write of one summary row,
+locked first (summary_rows.lock_row), and reads come from an in-memory copy
+that is updated once local writes commit and refreshed periodically, so
+serving a city's summary is O(1) however many reviews it has.
+"""
+import asyncio
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+
+try:
+    from city_data import normalize_city
+    from log import get_logger
+    from models import RentReview, ReviewSummary
+    from search import tokenize
+    from summary_rows import commit_with_retry, lock_row
+except ImportError:
+    from backend.city_data import normalize_city
+    from backend.log import get_logger
+    from backend.models import RentReview, ReviewSummary
+    from backend.search import tokenize
+    from backend.summary_rows import commit_with_retry, lock_row
+
+logger = get_logger("review_summary")
+
+TOP_REVIEWS = 5
+EXCERPT_CHARS = 160
+KEYWORDS_SHOWN = 20
+# Keyword counts kept per city. Past twice this many the rarest are dropped,
+# so a word that returns after being dropped is undercounted
+KEYWORDS_KEPT = 200
+REFRESH_INTERVAL = 60.0
+
+STOPWORDS = frozenset("""
+    a about above after again all also am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her
+    here hers him his how i if in into is it its just me more most my no nor not now of off on once only or
+    other our ours out over own same she should so some such than that the their theirs them then there these
+    they this those through to too under until up very was we were what when where which while who whom why
+    will with would you your yours yet get got one very really much many even still lot
+""".split())
+
+_whitespace = re.compile(r"\s+")
+
+
+def keywords(text) -> set:
+    """The distinct words in a review worth counting: no stopwords, numbers or very short words."""
+    return {w for w in tokenize(text) if len(w) > 2 and not w.isdigit() and w not in STOPWORDS}
+
+
+def excerpt(text) -> str:
+    text = _whitespace.sub(" ", text or "").strip()
+    if len(text) <= EXCERPT_CHARS:
+        return text
+    return text[:EXCERPT_CHARS].rsplit(" ", 1)[0].rstrip(",.;:") + "…"
+
+
+class ReviewAggregate:
+    def __init__(self, count=0, histogram=None, top=None, keyword_counts=None):
+        self.count = count
+        self.histogram = histogram or [0] * 5
+        self.top = top or []  # sorted most-liked first, then oldest
+        self.keyword_counts = keyword_counts or {}
+
+    def add(self, review: dict):
+        self.count += 1
+        rating = review.get("rating")
+        if isinstance(rating, int) and 1 <= rating <= 5:
+            self.histogram[rating - 1] += 1
+        for word in keywords(review.get("review_text")):
+            self.keyword_counts[word] = self.keyword_counts.get(word, 0) + 1
+        if len(self.keyword_counts) > 2 * KEYWORDS_KEPT:
+            kept = sorted(self.keyword_counts.items(), key=lambda item: -item[1])[:KEYWORDS_KEPT]
+            self.keyword_counts = dict(kept)
+        # Bulk-ingested rows carry no id; they enter the top list once liked
+        if review.get("id") is not None:
+            self.offer(review["id"], review.get("likes") or 0, review)
+
+    def floor(self) -> int:
+        """Likes a review needs to enter the top list (more than this)."""
+        return self.top[-1]["likes"] if len(self.top) >= TOP_REVIEWS else 0
+
+    def offer(self, review_id: int, likes: int, review: dict = None):
+        """Places a review with `likes` in the top list if it belongs there. `review`
+        (its text and rating) is only needed for one not already listed."""
+        if likes <= 0:
+            return
+        listed = next((entry for entry in self.top if entry["id"] == review_id), None)
+        if listed is not None:
+            listed["likes"] = max(listed["likes"], likes)
+        elif likes > self.floor() and review is not None:
+            self.top.append({
+                "id": review_id, "excerpt": excerpt(review.get("review_text")),
+                "rating": review.get("rating"), "likes": likes,
+            })
+        else:
+            return
+        self.top.sort(key=lambda entry: (-entry["likes"], entry["id"]))
+        del self.top[TOP_REVIEWS:]
+
+    def summary(self, city_key: str):
+        rated = sum(self.histogram)
+        negative, neutral, positive = sum(self.histogram[:2]), self.histogram[2], sum(self.histogram[3:])
+        top_keywords = sorted(self.keyword_counts.items(), key=lambda item: (-item[1], item[0]))[:KEYWORDS_SHOWN]
+        return {
+            "city_key": city_key,
+            "review_count": self.count,
+            "average_rating": round(sum((i + 1) * n for i, n in enumerate(self.histogram)) / rated, 2) if rated else None,
+            "rating_histogram": {str(i + 1): n for i, n in enumerate(self.histogram)},
+            # From ratings: 4-5 positive, 3 neutral, 1-2 negative
+            "sentiment": {
+                "positive": round(positive / rated, 3),
+                "neutral": round(neutral / rated, 3),
+                "negative": round(negative / rated, 3),
+            } if rated else None,
+            "top_reviews": [dict(entry) for entry in self.top],
+            "keywords": [{"word": word, "count": count} for word, count in top_keywords],
+        }
+
+    @classmethod
+    def from_row(cls, row: ReviewSummary):
+        return cls(row.count, json.loads(row.histogram), json.loads(row.top), json.loads(row.keywords))
+
+    def write_row(self, row: ReviewSummary):
+        row.count = self.count
+        row.histogram = json.dumps(self.histogram, separators=(",", ":"))
+        row.top = json.dumps(self.top, ensure_ascii=False, separators=(",", ":"))
+        row.keywords = json.dumps(self.keyword_counts, separators=(",", ":"))
+        row.updated_at = datetime.utcnow()
+
+
+def empty_summary(city_key: str):
+    return ReviewAggregate().summary(city_key)
+
+
+class ReviewSummaryStore:
+    def __init__(self, city_key=normalize_city):
+        self.city_key = city_key  # maps a city name to the key its summary is filed under
+        self._summaries = {}  # city_key -> summary dict
+        self._floors = {}  # city_key -> likes needed to enter its top list
+
+    def get(self, city: str):
+        """O(1) summary for a city; an empty one if it has no reviews yet."""
+        city_key = self.city_key(city)
+        return self._summaries.get(city_key) or empty_summary(city_key)
+
+    def remember(self, aggregates: dict):
+        """Takes {city_key: ReviewAggregate} into memory; call once the write has committed."""
+        for city_key, aggregate in aggregates.items():
+            self._summaries[city_key] = aggregate.summary(city_key)
+            self._floors[city_key] = aggregate.floor()
+
+    async def record(self, session, reviews) -> dict:
+        """
+        Folds newly stored reviews (dicts with city, review_text, rating, likes
+        and, once inserted, id) into their cities' summary rows. The caller
+        commits, so a review and its summary update share a transaction, then
+        passes the returned aggregates to remember().
+        """
+        grouped = {}
+        for review in reviews:
+            city_key = self.city_key(review.get("city") or "")
+            if city_key:
+                grouped.setdefault(city_key, []).append(review)
+
+        aggregates = {}
+        # A fixed order, so two writers locking several rows can't deadlock
+        for city_key, city_reviews in sorted(grouped.items()):
+            row = await lock_row(session, ReviewSummary, city_key=city_key)
+            aggregate = ReviewAggregate.from_row(row)
+            for review in city_reviews:
+                aggregate.add(review)
+            aggregate.write_row(row)
+            session.add(row)
+            aggregates[city_key] = aggregate
+        await session.flush()
+        return aggregates
+
+    async def record_like(self, session, review_id: int, city: str, likes: int):
+        """
+        Moves a liked review into, or up, its city's top list. Likes only grow
+        and reviews are never deleted, so the top list's floor only rises: a
+        review at or below the last floor seen here can't enter it, and most
+        likes return without touching the database.
+        """
+        city_key = self.city_key(city)
+        if likes <= self._floors.get(city_key, 0):
+            return
+
+        async def write():
+            row = await lock_row(session, ReviewSummary, city_key=city_key)
+            aggregate = ReviewAggregate.from_row(row)
+            review = None
+            if all(entry["id"] != review_id for entry in aggregate.top):
+                review = await session.get(RentReview, review_id)
+                review = review.model_dump() if review is not None else None
+            aggregate.offer(review_id, likes, review)
+            aggregate.write_row(row)
+            session.add(row)
+            return aggregate
+
+        try:
+            aggregate = await commit_with_retry(session, write)
+        except SQLAlchemyError as e:
+            # The like itself is already stored; the next refresh or like catches the summary up
+            logger.error("like of review %s not summarized: %r", review_id, e)
+            return
+        self.remember({city_key: aggregate})
+
+    async def refresh(self, session):
+        """Reloads every summary row, picking up writes made by other workers."""
+        rows = (await session.exec(select(ReviewSummary))).all()
+        self._summaries, self._floors = {}, {}
+        self.remember({row.city_key: ReviewAggregate.from_row(row) for row in rows})
+
+    async def refresh_forever(self, session_factory, interval: float = REFRESH_INTERVAL):
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.refresh(session)
+            except Exception as e:
+                logger.warning("refresh failed: %r", e)
+            await asyncio.sleep(interval)
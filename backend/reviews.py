@@ -0,0 +1,79 @@
+from sqlalchemy import text, update
+from sqlmodel import select
+
+try:
+    from models import RentReview
+    from search import tokenize
+except ImportError:
+    from backend.models import RentReview
+    from backend.search import tokenize
+
+# Set on startup once migrations report whether the full-text index exists
+FULLTEXT_ENABLED = False
+
+
+def _ranked_ids_sql(dialect: str, city_key: str = None):
+    city_clause = "AND r.city_key = :city_key " if city_key else ""
+    if dialect == "sqlite":
+        return (
+            "SELECT r.id FROM rentreview_fts JOIN rentreview r ON r.id = rentreview_fts.rowid "
+            f"WHERE rentreview_fts MATCH :query {city_clause}"
+            "ORDER BY bm25(rentreview_fts), r.likes DESC LIMIT :limit"
+        )
+    return (
+        "SELECT r.id FROM rentreview r "
+        f"WHERE r.review_tsv @@ plainto_tsquery('english', :query) {city_clause}"
+        "ORDER BY ts_rank(r.review_tsv, plainto_tsquery('english', :query)) DESC, r.likes DESC LIMIT :limit"
+    )
+
+
+async def search_reviews(session, query: str, city_key: str = None, limit: int = 20):
+    """Full-text search over review_text, best matches first."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    dialect = session.bind.dialect.name
+    if not FULLTEXT_ENABLED or dialect not in ("sqlite", "postgresql"):
+        # Unindexed fallback for databases without the full-text migration
+        statement = select(RentReview)
+        for term in terms:
+            statement = statement.where(RentReview.review_text.ilike(f"%{term}%"))
+        if city_key:
+            statement = statement.where(RentReview.city_key == city_key)
+        statement = statement.order_by(RentReview.likes.desc()).limit(limit)
+        return (await session.exec(statement)).all()
+
+    if dialect == "sqlite":
+        # Quote each token so user input can't inject FTS5 syntax; last one matches as a prefix
+        fts_query = " ".join(f'"{t}"' for t in terms) + "*"
+    else:
+        fts_query = " ".join(terms)
+    params = {"query": fts_query, "limit": limit}
+    if city_key:
+        params["city_key"] = city_key
+
+    ids = [row[0] for row in await session.exec(text(_ranked_ids_sql(dialect, city_key)), params=params)]
+    if not ids:
+        return []
+    rows = (await session.exec(select(RentReview).where(RentReview.id.in_(ids)))).all()
+    by_id = {review.id: review for review in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def increment_likes(session, review_id: int):
+    """
+    Adds one like in a single atomic UPDATE ... RETURNING, so concurrent clicks
+    never overwrite each other. Returns (likes, city) with the new count,
+    or None if the review doesn't exist.
+    """
+    statement = (
+        update(RentReview)
+        .where(RentReview.id == review_id)
+        .values(likes=RentReview.likes + 1)
+        .returning(RentReview.likes, RentReview.city)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await session.exec(statement)).one_or_none()
+    await session.commit()
+    return tuple(row) if row is not None else None
@@ -0,0 +1,109 @@
+"""
+Saved properties, kept per user.
+
+Rows are unique on (user_id, listing_id), so a save is a single
+INSERT ... ON CONFLICT DO NOTHING RETURNING and concurrent saves can't
+create duplicates. Users are identified by the X-User-Id header, an
+anonymous id the frontend keeps in localStorage; requests without one share
+the "" bucket, which also holds rows saved before per-user storage existed.
+"""
+import re
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+try:
+    from models import SavedListing
+except ImportError:
+    from backend.models import SavedListing
+
+USER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+MAX_BATCH = 500
+
+# Client-supplied columns; id, user_id and timestamp are set by the server
+SAVED_FIELDS = {"listing_id", "name", "price", "area", "city", "image", "type"}
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def clean_user_id(raw: str = None) -> str:
+    """Returns the user bucket for an X-User-Id value; raises ValueError if it's malformed."""
+    if not raw:
+        return ""
+    if not USER_ID_RE.fullmatch(raw):
+        raise ValueError("X-User-Id must be 1-64 letters, digits, '-' or '_'")
+    return raw
+
+
+def _rows(user_id, listings):
+    now = datetime.utcnow()
+    rows = {}
+    for listing in listings:
+        # Last one wins when a batch names the same listing twice
+        rows[listing.listing_id] = {**listing.model_dump(include=SAVED_FIELDS), "user_id": user_id, "timestamp": now}
+    return list(rows.values())
+
+
+async def save_many(session, user_id: str, listings) -> list:
+    """
+    Saves listings for a user without committing. Returns the rows created;
+    listings the user had already saved are left as they were.
+    """
+    rows = _rows(user_id, listings)
+    if not rows:
+        return []
+    insert = _UPSERT_INSERTS.get(session.bind.dialect.name)
+    if insert is None:
+        return await _save_each(session, rows)
+    table = SavedListing.__table__
+    statement = (
+        insert(table)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "listing_id"])
+        .returning(*table.c)
+    )
+    return [SavedListing.model_validate(row._mapping) for row in (await session.exec(statement)).all()]
+
+
+async def _save_each(session, rows):
+    # Dialects without ON CONFLICT: a savepoint per row, relying on the unique index
+    created = []
+    for row in rows:
+        listing = SavedListing(**row)
+        try:
+            async with session.begin_nested():
+                session.add(listing)
+        except IntegrityError:
+            continue
+        created.append(listing)
+    return created
+
+
+async def get_saved(session, user_id: str, listing_id: str):
+    statement = select(SavedListing).where(SavedListing.user_id == user_id, SavedListing.listing_id == listing_id)
+    return (await session.exec(statement)).first()
+
+
+async def save_one(session, user_id: str, listing):
+    """Returns the saved row, whether it was created now or earlier."""
+    created = await save_many(session, user_id, [listing])
+    await session.commit()
+    if created:
+        return created[0]
+    return await get_saved(session, user_id, listing.listing_id)
+
+
+async def delete_many(session, user_id: str, listing_ids) -> int:
+    """Deletes a user's saved listings in one statement, without committing. Returns the number removed."""
+    listing_ids = list(dict.fromkeys(listing_ids))
+    if not listing_ids:
+        return 0
+    statement = (
+        delete(SavedListing)
+        .where(SavedListing.user_id == user_id, SavedListing.listing_id.in_(listing_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.exec(statement)).rowcount
@@ -0,0 +1,202 @@
+import bisect
+import heapq
+import re
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Relative importance of each listing field when ranking matches
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "area": 2.5,
+    "type": 2.0,
+    "amenities": 1.5,
+    "specs": 1.0,
+}
+
+EXACT_FACTOR = 1.0
+PREFIX_FACTOR = 0.6
+FUZZY_FACTOR = 0.4
+MIN_PREFIX_LEN = 2
+MIN_FUZZY_LEN = 4
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(t) for t in text)
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def parse_price(price) -> int:
+    """Parses display prices such as "₹14,000/mo" into an integer amount."""
+    if isinstance(price, (int, float)):
+        return int(price)
+    digits = re.match(r"[^\d]*([\d,]+)", str(price or ""))
+    return int(digits.group(1).replace(",", "")) if digits else 0
+
+
+def _deletes(token: str) -> set:
+    """All strings one deletion away from token (SymSpell-style fuzzy keys)."""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class ListingIndex:
+    """
+    In-memory inverted index over property listings.
+    Listings are added/removed individually so the index never needs a full rebuild.
+    """
+
+    def __init__(self, listings=None):
+        self.docs = {}  # listing id -> listing dict
+        self.prices = {}  # listing id -> parsed monthly price
+        self.types = {}  # listing id -> lowercase type
+        self.amenities = {}  # listing id -> set of lowercase amenities
+        self.postings = defaultdict(dict)  # term -> {listing id: weight}
+        self.vocabulary = []  # sorted terms, for prefix lookups
+        self.fuzzy_keys = defaultdict(set)  # deletion key -> terms
+        self._doc_terms = {}  # listing id -> terms, for removal
+        for listing in listings or []:
+            self.add(listing)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, listing: dict):
+        doc_id = listing["id"]
+        if doc_id in self.docs:
+            self.remove(doc_id)
+
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in set(tokenize(listing.get(field))):
+                weights[term] += weight
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+                for key in _deletes(term):
+                    self.fuzzy_keys[key].add(term)
+            self.postings[term][doc_id] = weight
+
+        self.docs[doc_id] = listing
+        self.prices[doc_id] = parse_price(listing.get("price"))
+        self.types[doc_id] = str(listing.get("type", "")).lower()
+        self.amenities[doc_id] = {a.lower() for a in listing.get("amenities", [])}
+        self._doc_terms[doc_id] = list(weights)
+
+    def remove(self, doc_id):
+        if doc_id not in self.docs:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+                self.vocabulary.pop(bisect.bisect_left(self.vocabulary, term))
+                for key in _deletes(term):
+                    self.fuzzy_keys[key].discard(term)
+                    if not self.fuzzy_keys[key]:
+                        del self.fuzzy_keys[key]
+        del self.docs[doc_id]
+        del self.prices[doc_id]
+        del self.types[doc_id]
+        del self.amenities[doc_id]
+
+    def _expand(self, token: str) -> dict:
+        """Maps a query token to the index terms it matches, with a match factor."""
+        matches = {}
+        if len(token) >= MIN_PREFIX_LEN:
+            i = bisect.bisect_left(self.vocabulary, token)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+                matches[self.vocabulary[i]] = PREFIX_FACTOR
+                i += 1
+        if len(token) >= MIN_FUZZY_LEN:
+            candidates = set(self.fuzzy_keys.get(token, ()))
+            for key in _deletes(token):
+                candidates |= self.fuzzy_keys.get(key, set())
+                if key in self.postings:
+                    candidates.add(key)
+            for term in candidates:
+                matches.setdefault(term, FUZZY_FACTOR)
+        if token in self.postings:
+            matches[token] = EXACT_FACTOR
+        return matches
+
+    def _score(self, query: str):
+        tokens = tokenize(query)
+        if not tokens:
+            return {doc_id: 0.0 for doc_id in self.docs}
+
+        scores = None
+        for token in dict.fromkeys(tokens):
+            token_scores = {}
+            for term, factor in self._expand(token).items():
+                for doc_id, weight in self.postings[term].items():
+                    score = weight * factor
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                # Every query token must match (AND semantics)
+                scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query: str = "", type: str = None, min_price: int = None, max_price: int = None,
+               amenities=None, offset: int = 0, limit: int = 20):
+        """Returns (total_matches, page_of_listings) ranked by score then id."""
+        scores = self._score(query)
+        wanted_type = type.lower() if type else None
+        wanted_amenities = {a.lower() for a in amenities or []}
+
+        hits = []
+        for doc_id, score in scores.items():
+            if wanted_type and self.types[doc_id] != wanted_type:
+                continue
+            price = self.prices[doc_id]
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            if wanted_amenities and not wanted_amenities <= self.amenities[doc_id]:
+                continue
+            # Curated ids are ints, community ones strings; rank ints first so ties never compare the two
+            hits.append((-score, isinstance(doc_id, str), doc_id))
+
+        # Only the requested page needs ordering, not every hit
+        ranked = heapq.nsmallest(offset + limit, hits) if limit is not None else sorted(hits)
+        return len(hits), [self.docs[doc_id] for _, _, doc_id in ranked[offset:]]
+
+
+class SearchIndex:
+    """Per-city listing indexes, built lazily on first search and then kept up to date."""
+
+    def __init__(self, load_listings):
+        self._load_listings = load_listings
+        self._indexes = {}
+
+    def for_city(self, city_key: str) -> ListingIndex:
+        index = self._indexes.get(city_key)
+        if index is None:
+            index = ListingIndex(self._load_listings(city_key))
+            self._indexes[city_key] = index
+        return index
+
+    def add_listing(self, city_key: str, listing: dict):
+        # An index that isn't built yet will load the listing along with the rest
+        if city_key in self._indexes:
+            self._indexes[city_key].add(listing)
+
+    def remove_listing(self, city_key: str, listing_id):
+        if city_key in self._indexes:
+            self._indexes[city_key].remove(listing_id)
+
+    def invalidate(self, city_key: str = None):
+        if city_key is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(city_key, None)
@@ -1,164 +1,358 @@
-import httpx
+import asyncio
+import importlib.util
+import os
 import random
+import threading
+
+try:
+    from cache import make_cache
+    from city_data import CityDataStore, normalize_city
+    from geo import GeoCatalog
+    from invalidation import make_bus
+    from log import get_logger
+    from market_stats import MIN_OBSERVATIONS, MarketStatsStore, format_growth
+    from metrics import time_upstream
+    from models import use_review_city_key
+    from moderation import ApprovedListings
+    from refresh import RefreshScheduler, RefreshSource
+    from review_summary import ReviewSummaryStore
+    from search import SearchIndex
+except ImportError:
+    from backend.cache import make_cache
+    from backend.city_data import CityDataStore, normalize_city
+    from backend.geo import GeoCatalog
+    from backend.invalidation import make_bus
+    from backend.log import get_logger
+    from backend.market_stats import MIN_OBSERVATIONS, MarketStatsStore, format_growth
+    from backend.metrics import time_upstream
+    from backend.models import use_review_city_key
+    from backend.moderation import ApprovedListings
+    from backend.refresh import RefreshScheduler, RefreshSource
+    from backend.review_summary import ReviewSummaryStore
+    from backend.search import SearchIndex
+
+logger = get_logger("services")
+
+# h2 enables HTTP/2 on the shared client; looked up without importing it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Overridable so tests and benchmarks can point at benchmarks/stub_upstream.py
+WIKIPEDIA_API_URL = os.environ.get("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIPEDIA_HEADERS = {
+    "User-Agent": "RentChecker/1.0 (contact@rentchecker.com)"
+}
+
+DESCRIPTION_UNAVAILABLE = "Could not fetch city insights at this moment."
+
+# Approved community listings shown alongside the curated ones in /city-info
+COMMUNITY_LISTINGS_SHOWN = int(os.environ.get("COMMUNITY_LISTINGS_SHOWN", "20"))
+
+
+def community_key(city_name: str) -> str:
+    """What community data (rents, listings) is grouped by: the curated key, else the normalized name."""
+    return city_data.canonical_key(city_name) or normalize_city(city_name)
+
+
+# Reviews are stored and looked up under the same key as their summaries
+use_review_city_key(community_key)
+
+# Running rent aggregates per city/area, backed by the marketstats table
+market_stats = MarketStatsStore(community_key)
+
+# Rating histogram, most-liked reviews and keywords per city, backed by the reviewsummary table
+review_summaries = ReviewSummaryStore(community_key)
+
+# Application-lifetime HTTP client, opened on startup and closed on shutdown
+_http_client = None
+
+# Normalized city name -> Wikipedia intro extract
+description_cache = make_cache("city_description", maxsize=512, ttl=24 * 3600)
+
+# Tells every worker which cached entries a write made stale; started on app startup
+invalidation = make_bus()
+
+# Listings, areas, market stats, images and QoL, loaded from data/cities.json
+city_data = CityDataStore()
+
+# Keeps description_cache warm for curated and popular cities; started on app startup
+refresh_scheduler = RefreshScheduler()
+
 
 class CityService:
+    @staticmethod
+    def open_http_client():
+        """Creates the shared pooled client (keep-alive, bounded connections)."""
+        global _http_client
+        if _http_client is None or _http_client.is_closed:
+            import httpx  # deferred: only upstream fetches need it
+
+            _http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+                headers=WIKIPEDIA_HEADERS,
+                http2=HTTP2_AVAILABLE,
+            )
+        return _http_client
+
+    @staticmethod
+    async def close_http_client():
+        global _http_client
+        if _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
+
     @staticmethod
     async def get_city_description(city_name: str):
-        """Fetches a high-quality description from Wikipedia API."""
+        """
+        Returns the Wikipedia intro for a city from the warmed store. On a miss
+        the refresh scheduler fetches it in the background; without a running
+        scheduler (e.g. serverless) it is fetched inline, cached and coalesced.
+        """
+        key = normalize_city(city_name)
+        if refresh_scheduler.running:
+            description = await description_cache.aget(key)
+            if description is None:
+                refresh_scheduler.request(city_name)
+                return DESCRIPTION_UNAVAILABLE
+            return description
         try:
-            url = "https://en.wikipedia.org/w/api.php"
-            params = {
-                "action": "query",
-                "format": "json",
-                "prop": "extracts",
-                "exintro": True,
-                "explaintext": True,
-                "titles": city_name,
-                "redirects": 1
-            }
-            headers = {
-                "User-Agent": "RentChecker/1.0 (contact@rentchecker.com)"
-            }
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, params=params, headers=headers)
-                data = response.json()
-                
-                pages = data.get("query", {}).get("pages", {})
-                for page_id, page_data in pages.items():
-                    if page_id != "-1":
-                        extract = page_data.get("extract", "No description available.")
-                        return extract[:2500] + "..." if len(extract) > 2500 else extract
-                        
-                return f"{city_name.title()} is a major city known for its vibrant culture and growing economy."
+            return await description_cache.get_or_fetch(
+                key,
+                lambda: CityService._fetch_city_description(city_name),
+            )
         except Exception as e:
-            print(f"Error fetching Wikipedia data: {e}")
-            return "Could not fetch city insights at this moment."
+            logger.warning("error fetching Wikipedia data: %s", e)
+            return DESCRIPTION_UNAVAILABLE
+
+    @staticmethod
+    async def _fetch_city_description(city_name: str):
+        """Fetches a high-quality description from Wikipedia API."""
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "extracts",
+            "exintro": True,
+            "explaintext": True,
+            "titles": city_name,
+            "redirects": 1
+        }
+        # Falls back to a lazily created client when startup hooks didn't run (e.g. serverless)
+        client = CityService.open_http_client()
+        with time_upstream("wikipedia"):
+            response = await client.get(WIKIPEDIA_API_URL, params=params)
+            response.raise_for_status()
+            data = response.json()
+
+        pages = data.get("query", {}).get("pages", {})
+        for page_id, page_data in pages.items():
+            if page_id != "-1":
+                extract = page_data.get("extract", "No description available.")
+                return extract[:2500] + "..." if len(extract) > 2500 else extract
+
+        return f"{city_name.title()} is a major city known for its vibrant culture and growing economy."
 
     @staticmethod
     async def get_rent_stats(city_name: str):
         """
         Integration with RentCast or similar logic.
-        Currently performs a sophisticated estimation based on market trends.
+        Serves curated market figures from the city data store, overridden by
+        observed rents once enough have been collected for the city.
         """
-        city_lower = city_name.lower().strip()
-        
-        # Base values for Indian Tier-1/Tier-2 cities (2024 Market)
-        market_data = {
-            "bengaluru": {"avg": 24500, "growth": "+12%", "yield": "3.5%"},
-            "bangalore": {"avg": 24500, "growth": "+12%", "yield": "3.5%"},
-            "hyderabad": {"avg": 19000, "growth": "+15%", "yield": "4.2%"},
-            "chennai":   {"avg": 17500, "growth": "+8%", "yield": "3.8%"},
-            "mumbai":    {"avg": 42000, "growth": "+10%", "yield": "2.5%"},
-            "pune":      {"avg": 18500, "growth": "+9%", "yield": "3.2%"},
-            "delhi":     {"avg": 22000, "growth": "+7%", "yield": "3.0%"}
-        }
-
-        stats = market_data.get(city_lower, {"avg": 15000, "growth": "Stable", "yield": "3.4%"})
-        
-        return {
-            "average_rent": stats["avg"],
-            "market_growth": stats["growth"],
-            "rental_yield": stats["yield"],
-            "range_low": int(stats["avg"] * 0.8),
-            "range_high": int(stats["avg"] * 1.3),
-            "currency": "₹"
-        }
+        curated = city_data.get(city_name)["rent_stats"]
+        observed = market_stats.get(city_name)
+        if not observed or observed["count"] < MIN_OBSERVATIONS:
+            return curated
+        stats = dict(curated)
+        stats.update({
+            "average_rent": observed["mean"],
+            "range_low": observed["p10"],
+            "range_high": observed["p90"],
+            "median_rent": observed["p50"],
+            "sample_size": observed["count"],
+        })
+        if observed["growth_mom"] is not None:
+            stats["market_growth"] = format_growth(observed["growth_mom"])
+        return stats
 
     @staticmethod
-    async def search_properties(query: str, city: str = None):
-        """Search service for properties."""
-        all_listings = CityService.get_listings(city or "Bengaluru")
-        if not query: return all_listings
-        return [l for l in all_listings if query.lower() in str(l).lower()]
+    async def search_properties(query: str, city: str = None, type: str = None, min_price: int = None,
+                                max_price: int = None, amenities: list = None, offset: int = 0, limit: int = 20):
+        """Search service for properties, backed by the per-city inverted index."""
+        index = search_index.for_city(search_key(city or "Bengaluru"))
+        total, results = index.search(query or "", type=type, min_price=min_price, max_price=max_price,
+                                      amenities=amenities, offset=offset, limit=limit)
+        return {"total": total, "results": results}
 
     @staticmethod
     def get_mock_images(city_name: str):
         """Returns reliable high-quality image URLs."""
-        city_lower = city_name.lower().strip()
-        
-        predefined = {
-            "bengaluru": [
-                "https://images.unsplash.com/photo-1596422846543-75c6fc197f07?w=1200",
-                "https://images.unsplash.com/photo-1551135041-09855364893a?w=1200",
-                "https://images.unsplash.com/photo-1626245229239-b9d9c288f6b8?w=1200"
-            ],
-            "hyderabad": [
-                "https://images.unsplash.com/photo-1572455027382-706593b4fe7e?w=1200",
-                "https://images.unsplash.com/photo-1624716181745-f0ea9f478a63?w=1200",
-                "https://images.unsplash.com/photo-1605537964076-3cb0ea2e356d?w=1200"
-            ],
-            "chennai": [
-                "https://images.unsplash.com/photo-1582510003544-bea4db981a33?w=1200",
-                "https://images.unsplash.com/photo-1625292415516-56f874983226?w=1200",
-                "https://images.unsplash.com/photo-1517549641777-62624a047d7a?w=1200"
-            ]
-        }
-        
-        if city_lower in predefined:
-            return predefined[city_lower]
-        
-        # Fallback to random cityscapes
-        return [
-            f"https://images.unsplash.com/photo-1449824913929-4bd6d5a88adc?w=1200&q=80",
-            f"https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=1200&q=80"
-        ]
+        return city_data.get(city_name)["images"]
 
     @staticmethod
     def get_areas(city_name: str):
         """Returns localized areas for major Indian cities."""
-        city_lower = city_name.lower().strip()
-        
-        if "bengaluru" in city_lower or "bangalore" in city_lower:
-            return [
-                {"name": "Koramangala", "rent": "₹28,000", "vibe": "Posh & Active", "image": "https://images.unsplash.com/photo-1596422846543-75c6fc197f07?w=400"},
-                {"name": "Indiranagar", "rent": "₹32,000", "vibe": "Elite & Green", "image": "https://images.unsplash.com/photo-1626245229239-b9d9c288f6b8?w=400"},
-                {"name": "HSR Layout", "rent": "₹24,000", "vibe": "Startup Hub", "image": "https://images.unsplash.com/photo-1551135041-09855364893a?w=400"}
-            ]
-        elif "hyderabad" in city_lower:
-            return [
-                {"name": "Gachibowli", "rent": "₹26,000", "vibe": "Tech Focused", "image": "https://images.unsplash.com/photo-1624716181745-f0ea9f478a63?w=400"},
-                {"name": "Banjara Hills", "rent": "₹45,000", "vibe": "Premium Living", "image": "https://images.unsplash.com/photo-1572455027382-706593b4fe7e?w=400"}
-            ]
-        
-        return [{"name": "City Center", "rent": "₹20,000", "vibe": "Central", "image": "https://images.unsplash.com/photo-1449824913929-4bd6d5a88adc?w=400"}]
+        return city_data.get(city_name)["areas"]
 
     @staticmethod
     def get_listings(city_name: str):
         """Returns detailed property listings."""
-        city_lower = city_name.lower().strip()
-        
-        # Generic high-quality property images
-        pg_imgs = [
-            "https://images.unsplash.com/photo-1522771753062-5887739e663e?w=600",
-            "https://images.unsplash.com/photo-1595526114035-0d45ed16cfbf?w=600",
-            "https://images.unsplash.com/photo-1628932630248-0d4ddee66412?w=600"
-        ]
-        flat_imgs = [
-            "https://images.unsplash.com/photo-1502672260266-1c1ef2d93688?w=600",
-            "https://images.unsplash.com/photo-1493663284031-b7e3aefcae8e?w=600",
-            "https://images.unsplash.com/photo-1484154218962-a1c002085d2f?w=600"
-        ]
-
-        if "bengaluru" in city_lower or "bangalore" in city_lower:
-            return [
-                {"id": 101, "type": "PG", "name": "Zolo Tech Park", "area": "Koramangala", "price": "₹14,000/mo", "image": pg_imgs[0], "specs": "Twin Sharing • Meals", "amenities": ["WiFi", "AC", "Power Backup"]},
-                {"id": 102, "type": "Flat", "name": "Modern 1BHK", "area": "Indiranagar", "price": "₹28,000/mo", "image": flat_imgs[0], "specs": "1 Bedroom • 650 sqft", "amenities": ["Balcony", "Security", "Parking"]},
-                {"id": 103, "type": "PG", "name": "Stanza Living Elite", "area": "HSR Layout", "price": "₹16,500/mo", "image": pg_imgs[1], "specs": "Single • Luxury", "amenities": ["Gym", "Laundry", "Mess"]}
-            ]
-        
-        return [
-            {"id": 901, "type": "Flat", "name": "Central Residency", "area": "Downtown", "price": "₹22,000/mo", "image": flat_imgs[1], "specs": "1BHK Studio", "amenities": ["WiFi", "Elevator"]}
-        ]
+        return city_data.get(city_name)["listings"]
+
+    @staticmethod
+    def get_community_listings(city_name: str, limit: int = COMMUNITY_LISTINGS_SHOWN):
+        """Returns the most recently approved community listings."""
+        return approved_listings.latest(community_key(city_name), limit)
 
     @staticmethod
     def get_quality_of_life(city_name: str):
         """Returns quality of life metrics."""
-        city_lower = city_name.lower().strip()
-        data = {
-            "bengaluru": {"score": 8.5, "safety": "High", "transport": "Moderate", "nightlife": "Excellent"},
-            "hyderabad": {"score": 9.2, "safety": "High", "transport": "Excellent", "nightlife": "Great"},
-            "chennai":   {"score": 8.8, "safety": "High", "transport": "Good", "nightlife": "Moderate"}
-        }
-        return data.get(city_lower, {"score": 7.5, "safety": "Moderate", "transport": "Good", "nightlife": "Moderate"})
+        return city_data.get(city_name)["quality_of_life"]
+
+
+# Approved community listings, loaded from the database on first use
+approved_listings = ApprovedListings(community_key)
+city_data.on_reload(lambda snapshot: approved_listings.rekey())
+
+
+def search_key(city_name: str) -> str:
+    """
+    Unknown cities share the default listings, so they share one index ("")
+    unless they have approved community listings of their own.
+    """
+    key = city_data.canonical_key(city_name)
+    if key:
+        return key
+    key = normalize_city(city_name)
+    return key if key in approved_listings else ""
+
+
+def _searchable_listings(city_key: str):
+    return CityService.get_listings(city_key) + approved_listings.for_city(city_key)
+
+
+# Per-city listing indexes for /search, built on first use
+search_index = SearchIndex(_searchable_listings)
+city_data.on_reload(lambda snapshot: search_index.invalidate())
+
+# Listings and areas with coordinates for /listings/nearby and map viewports
+geo_catalog = GeoCatalog(lambda: city_data.snapshot, approved_listings.all)
+city_data.on_reload(lambda snapshot: geo_catalog.invalidate())
+
+
+def add_approved_listing(listing):
+    """Makes a newly approved PropertyListing searchable without rebuilding any index."""
+    city_key, entry = approved_listings.add(listing)
+    search_index.add_listing(city_key, entry)
+    geo_catalog.add_listing(entry)
+
+
+async def _sync_approved_listings(listing_ids):
+    if listing_ids is None:
+        await approved_listings.reload()
+        search_index.invalidate()
+        geo_catalog.invalidate()
+        return
+    if not approved_listings.loaded:
+        return  # the first load will include them
+    missing = approved_listings.missing(listing_ids)
+    if missing:
+        for listing in await approved_listings.fetch(missing):
+            add_approved_listing(listing)
+
+
+_sync_tasks = set()
+
+
+def sync_approved_listings(listing_ids=None):
+    """
+    Catches up on approvals published by any worker; None (e.g. after a bulk
+    change) reloads everything. Listings this worker already holds are skipped.
+    Invalidation subscribers run on the event loop, so any database read is
+    left to a background task.
+    """
+    task = asyncio.ensure_future(_sync_approved_listings(listing_ids))
+    _sync_tasks.add(task)
+    task.add_done_callback(_sync_tasks.discard)
+
+refresh_scheduler.register(RefreshSource(
+    name="description",
+    upstream="wikipedia",
+    fetch=CityService._fetch_city_description,
+    store=description_cache,
+))
+
+# Per-city rent models fitted from observed rents. Built by seed_rent_estimator()
+# at startup, or on first use in lazy startup mode, since fitting imports numpy
+# and reads every stored rent
+_rent_estimator = None
+_rent_estimator_lock = threading.Lock()
+_observation_engine = None
+
+
+def _estimator_module():
+    try:
+        import estimator
+    except ImportError:
+        from backend import estimator
+    return estimator
+
+
+def use_stored_rent_observations(engine):
+    """Makes the estimator learn from rents already stored in this database."""
+    global _observation_engine
+    _observation_engine = engine
+
+
+def seed_rent_estimator():
+    """Loads curated city listings plus stored rents into a fresh estimator."""
+    global _rent_estimator
+    module = _estimator_module()
+    estimator = module.RentEstimator(city_data)
+    snapshot = city_data.snapshot
+    for city_key, sections in snapshot.cities.items():
+        estimator.load(module.listing_observations(city_key, sections["listings"]))
+    if _observation_engine is not None:
+        estimator.load(module.load_stored_observations(_observation_engine))
+    _rent_estimator = estimator
+    return estimator
+
+
+def get_rent_estimator():
+    if _rent_estimator is None:
+        with _rent_estimator_lock:
+            if _rent_estimator is None:
+                seed_rent_estimator()
+    return _rent_estimator
+
+
+def observe_rent(city, rent, **details):
+    """Feeds one new rent to the estimator. Before it is built there is nothing
+    to update: the stored row is read when it is."""
+    if _rent_estimator is not None:
+        _rent_estimator.observe(city, rent, **details)
+
 
+async def record_reviews(session, rows):
+    """
+    Bookkeeping for newly stored reviews (dicts with city, rating, text, rent
+    details and, once inserted, id), shared by the API and the ingest CLI:
+    their cities' review summaries, committed with whatever the caller's
+    transaction holds, then their rents in the estimator and market stats.
+    """
+    summaries = await review_summaries.record(session, rows)
+    await session.commit()
+    review_summaries.remember(summaries)
 
+    rows = [row for row in rows if row.get("rent_amount")]
+    for row in rows:
+        observe_rent(
+            row["city"], row["rent_amount"], bedrooms=row.get("bedrooms"),
+            bathrooms=row.get("bathrooms"), type=row.get("property_type"), area=row.get("area"),
+        )
+    if rows:
+        await market_stats.record(
+            session, [(row["city"], row.get("area"), row["rent_amount"], row.get("timestamp")) for row in rows]
+        )
+    # Cached /city-info bodies carry the rent stats these rents just changed
+    for city in {row["city"] for row in rows}:
+        invalidation.publish("city", city)
@@ -0,0 +1,161 @@
+"""
+Serving of the built frontend (frontend/dist) from memory.
+
+The dist directory is indexed once, at startup or (with LAZY_STARTUP) on the
+first frontend request: every file is read, given a strong ETag, and
+compressed ahead of time (gzip, plus brotli when the `brotli` package is
+installed). Requests pick the best variant for their
+Accept-Encoding. Vite's content-hashed assets are cached as immutable;
+everything else, notably index.html, is revalidated with its ETag.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import Response
+
+try:
+    from city_info import etag_matches
+except ImportError:
+    from backend.city_info import etag_matches
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Vite output names look like assets/index-BtZ3c9aQ.js
+HASHED_NAME_RE = re.compile(r"[-.][A-Za-z0-9_-]{8,}\.[a-z0-9]+$")
+
+# Preference order when a client accepts several encodings equally
+ENCODINGS = ("br", "gzip")
+
+
+@dataclass
+class StaticFile:
+    media_type: str
+    etag: str
+    cache_control: str
+    variants: dict = field(default_factory=dict)  # encoding ("identity", "gzip", "br") -> bytes
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _variants(path: Path, body: bytes, media_type: str) -> dict:
+    variants = {"identity": body}
+    if not _compressible(media_type) or len(body) < MIN_COMPRESS_SIZE:
+        return variants
+    # Prefer variants the build already produced (e.g. vite-plugin-compression)
+    prebuilt = {"gzip": path.with_name(path.name + ".gz"), "br": path.with_name(path.name + ".br")}
+    if prebuilt["gzip"].exists():
+        variants["gzip"] = prebuilt["gzip"].read_bytes()
+    else:
+        variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    if prebuilt["br"].exists():
+        variants["br"] = prebuilt["br"].read_bytes()
+    elif BROTLI_AVAILABLE:
+        variants["br"] = brotli.compress(body, quality=11)
+    # Drop variants that don't pay for themselves
+    return {enc: data for enc, data in variants.items() if enc == "identity" or len(data) < len(body)}
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Returns {coding: qvalue} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, available) -> str:
+    accepted = parse_accept_encoding(header)
+    best, best_q = "identity", 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class StaticIndex:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.files = {}  # "assets/index-x.js" -> StaticFile
+        self.loaded = False
+
+    @property
+    def built(self) -> bool:
+        return "index.html" in self.files
+
+    def load(self):
+        files = {}
+        if self.root.is_dir():
+            for path in sorted(self.root.rglob("*")):
+                if not path.is_file() or path.suffix in (".gz", ".br"):
+                    continue
+                rel = path.relative_to(self.root).as_posix()
+                body = path.read_bytes()
+                media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+                hashed = rel.startswith("assets/") and HASHED_NAME_RE.search(path.name)
+                files[rel] = StaticFile(
+                    media_type=media_type,
+                    etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+                    cache_control=IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL,
+                    variants=_variants(path, body, media_type),
+                )
+        self.files = files
+        self.loaded = True
+        return len(files)
+
+    def get(self, rel_path: str):
+        return self.files.get(rel_path.lstrip("/"))
+
+    def respond(self, static: StaticFile, accept_encoding: str = None, if_none_match: str = None,
+                head: bool = False) -> Response:
+        encoding = choose_encoding(accept_encoding, static.variants)
+        body = static.variants[encoding]
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = static.etag if encoding == "identity" else f'{static.etag[:-1]}-{encoding}"'
+        headers = {"ETag": etag, "Cache-Control": static.cache_control}
+        if len(static.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if head:
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=static.media_type)
+        return Response(content=body, headers=headers, media_type=static.media_type)
+
+    def stats(self):
+        return {
+            "files": len(self.files),
+            "bytes": sum(len(f.variants["identity"]) for f in self.files.values()),
+            "precompressed": sum(len(f.variants) > 1 for f in self.files.values()),
+            "brotli": BROTLI_AVAILABLE,
+        }
@@ -0,0 +1,61 @@
+"""
+Read-merge-write updates of per-key summary rows (market stats, review summaries).
+
+A summary row holds an aggregate that SQL can't merge (a t-digest, a top
+list), so an update reads the row, merges in Python and writes it back. To
+keep concurrent writers from overwriting each other, the row is first
+ensured with INSERT ... ON CONFLICT DO NOTHING: on SQLite that write takes
+the database write lock before anything is read, so writers queue up
+instead of racing, and on PostgreSQL the SELECT ... FOR UPDATE that follows
+locks the row. Creating a missing row can't hit the unique constraint.
+"""
+import asyncio
+import random
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import select
+
+try:
+    from log import get_logger
+except ImportError:
+    from backend.log import get_logger
+
+logger = get_logger("summary_rows")
+
+WRITE_ATTEMPTS = 3
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+async def lock_row(session, model, **key):
+    """The `model` row for `key`, created with its defaults if missing and locked until commit."""
+    insert = _UPSERT_INSERTS.get(session.bind.dialect.name)
+    if insert is not None:
+        values = model(**key).model_dump(exclude={"id"})
+        await session.exec(insert(model.__table__).values(**values).on_conflict_do_nothing(index_elements=list(key)))
+    statement = select(model).filter_by(**key).with_for_update().execution_options(populate_existing=True)
+    row = (await session.exec(statement)).first()
+    if row is None:
+        # Dialects without ON CONFLICT: a concurrent insert fails the commit and is retried
+        row = model(**key)
+    return row
+
+
+async def commit_with_retry(session, write, attempts: int = WRITE_ATTEMPTS):
+    """
+    Runs `await write()` and commits, returning what write returned. A commit
+    that loses a race (a concurrent insert, a lock wait that timed out) is
+    rolled back and the whole write is run again.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            result = await write()
+            await session.commit()
+            return result
+        except (IntegrityError, OperationalError) as e:
+            await session.rollback()
+            if attempt == attempts:
+                raise
+            logger.info("summary write conflicted (attempt %s), retrying: %s", attempt, e.__class__.__name__)
+            await asyncio.sleep(random.uniform(0.01, 0.05) * attempt)
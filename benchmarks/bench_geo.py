@@ -0,0 +1,92 @@
+"""
+Compares GeoIndex radius and bounding-box queries against a full haversine scan.
+
+    python benchmarks/bench_geo.py [--sizes 1000 10000 100000 1000000] [--queries 2000]
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from geo import GeoIndex, haversine_km  # noqa: E402
+
+# Listings scattered over greater Bengaluru, denser towards the centre
+CENTRE = (12.97, 77.60)
+SPREAD = 0.15  # degrees, about 16 km
+
+
+def make_points(n, seed=42):
+    rng = random.Random(seed)
+    return [
+        (i, CENTRE[0] + rng.gauss(0, SPREAD / 2), CENTRE[1] + rng.gauss(0, SPREAD / 2))
+        for i in range(n)
+    ]
+
+
+def make_queries(n, seed=7):
+    rng = random.Random(seed)
+    return [(CENTRE[0] + rng.uniform(-SPREAD, SPREAD), CENTRE[1] + rng.uniform(-SPREAD, SPREAD)) for _ in range(n)]
+
+
+def scan_nearby(points, lat, lon, radius_km, limit):
+    hits = ((haversine_km(lat, lon, plat, plon), i) for i, plat, plon in points)
+    return heapq.nsmallest(limit, (h for h in hits if h[0] <= radius_km))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2] * 1000, ordered[int(len(ordered) * 0.99)] * 1000
+
+
+def timed_each(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(*query)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--radius", type=float, default=2.0, help="km")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    queries = make_queries(args.queries)
+
+    print(f"{'points':>8} {'build (s)':>10} {'scan p50 (ms)':>14} "
+          f"{'nearby p50/p99 (ms)':>20} {'bbox p50/p99 (ms)':>18}")
+    for size in args.sizes:
+        points = make_points(size)
+        started = time.perf_counter()
+        index = GeoIndex()
+        for i, lat, lon in points:
+            index.add(i, lat, lon, {"id": i})
+        build = time.perf_counter() - started
+
+        # The exhaustive scan is slow; a sample is enough for its median
+        sample = queries[:max(10, min(len(queries), 2_000_000 // size))]
+        scan_p50, _ = timed_each(lambda lat, lon: scan_nearby(points, lat, lon, args.radius, args.limit), sample)
+        for lat, lon in sample[:50]:
+            expected = [i for _, i in scan_nearby(points, lat, lon, args.radius, args.limit)]
+            got = [item["id"] for _, item in index.nearby(lat, lon, args.radius, args.limit)]
+            assert got == expected, f"nearby({lat}, {lon}) differs from the scan"
+            box = (lat - 0.015, lon - 0.025, lat + 0.015, lon + 0.025)
+            inside = sum(box[0] <= plat <= box[2] and box[1] <= plon <= box[3] for _, plat, plon in points)
+            assert index.within(*box)[0] == inside, f"within{box} miscounts"
+
+        nearby = timed_each(lambda lat, lon: index.nearby(lat, lon, args.radius, args.limit), queries)
+        # A phone-sized map viewport, about 3 x 5 km
+        bbox = timed_each(lambda lat, lon: index.within(lat - 0.015, lon - 0.025, lat + 0.015, lon + 0.025, 200), queries)
+        print(f"{size:>8} {build:>10.2f} {scan_p50:>14.2f} "
+              f"{nearby[0]:>11.3f}/{nearby[1]:<8.3f} {bbox[0]:>9.3f}/{bbox[1]:<8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares response encoding on the big list endpoints: FastAPI's default
+(jsonable_encoder + json.dumps) against responses.json_response.
+
+    python benchmarks/bench_json.py [--rows 1000 10000] [--repeat 20]
+
+For each page size it times the serialization step alone (the rows a
+handler returns, to bytes) and the whole request through the app, for
+/reviews/{city} and /questions, and checks both encodings decode to the
+same JSON.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+
+
+def timed_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # The app opens database.db in the working directory; keep it out of the tree
+    os.chdir(tempfile.mkdtemp(prefix="bench_json_"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ["PAGE_LIMIT_MAX"] = str(max(args.rows))
+    sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+    sys.path.insert(0, str(BENCH_DIR))
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session, select
+
+    import httpx
+
+    import main as app_main
+    import responses
+    import services
+    from database import engine
+    from load_suite import seed_database
+    from models import Question, RentReview
+    from stub_upstream import StubState, make_app
+
+    largest = max(args.rows)
+    seed_database(random.Random(7), reviews=largest, questions=largest, saved=1)
+    # Every seeded review in one city, so a single page can hold all of them
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE rentreview SET city = 'Pune', city_key = 'pune'")
+
+    # Stubbed Wikipedia; the shared client is kept by the startup hook
+    services._http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app(StubState())))
+    services.WIKIPEDIA_API_URL = "http://stub/w/api.php"
+
+    print(f"orjson available: {responses.ORJSON_AVAILABLE}")
+    print(f"{'case':<34} {'rows':>6} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    ok = True
+    with TestClient(app_main.app) as client:
+        for rows in args.rows:
+            with Session(engine) as session:
+                reviews = session.exec(select(RentReview).limit(rows)).all()
+                questions = session.exec(select(Question).limit(rows)).all()
+            for name, items in (("serialize reviews", reviews), ("serialize questions", questions)):
+                default = timed_ms(lambda: responses.JSONResponse(jsonable_encoder(items)), args.repeat)
+                fast = timed_ms(lambda: responses.dumps(items), args.repeat)
+                print(f"{name:<34} {rows:>6} {default:>11.2f} {fast:>9.2f} {default / fast:>7.1f}x")
+
+            for url in (f"/reviews/pune?limit={rows}", f"/questions?limit={rows}"):
+                timings, bodies = {}, {}
+                for fast_json in (False, True):
+                    responses.FAST_JSON = fast_json
+                    bodies[fast_json] = client.get(url)
+                    timings[fast_json] = timed_ms(lambda: client.get(url), args.repeat)
+                same = bodies[True].json() == bodies[False].json() and len(bodies[True].json()) == rows
+                ok = ok and same
+                name = f"GET {url.split('?')[0]}" + ("" if same else " MISMATCH")
+                print(f"{name:<34} {rows:>6} {timings[False]:>11.2f} {timings[True]:>9.2f} "
+                      f"{timings[False] / timings[True]:>7.1f}x")
+    responses.FAST_JSON = True
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Measures what AdmissionMiddleware adds per request, and checks that it sheds
+load quickly instead of letting a backlog build.
+
+    python benchmarks/bench_ratelimit.py [--requests 100000]
+
+Overhead is timed by calling the middleware directly around a no-op ASGI
+app, so only the limiter and the concurrency gate are measured.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cache_backends  # noqa: E402
+import ratelimit  # noqa: E402
+from fake_redis import ServerThread  # noqa: E402
+
+# A budget no benchmark client runs out of, so every call takes the allow path
+RULES = {"POST /reviews": (1e9, 1e9), "POST /reviews/{review_id}/like": (1e9, 1e9)}
+
+
+def scope(method, path, client="10.0.0.1"):
+    return {"type": "http", "method": method, "path": path, "headers": [(b"host", b"test")], "client": (client, 1234)}
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def per_request_us(app, request_scope, requests):
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(request_scope, receive, send)
+    elapsed = time.perf_counter() - started
+    assert set(statuses) == {200}, f"unexpected statuses {set(statuses)}"
+    return elapsed / requests * 1e6
+
+
+async def overhead(requests):
+    gate = ratelimit.ConcurrencyGate(100, 200, 2.0)
+    memory = ratelimit.RateLimiter(RULES, ratelimit.MemoryBuckets())
+    sqlite_store = cache_backends.SQLiteStore(os.path.join(tempfile.mkdtemp(prefix="bench_ratelimit_"), "cache.db"))
+    server = ServerThread()
+    redis_store = cache_backends.RedisClient(f"redis://127.0.0.1:{server.port}/0")
+
+    baseline = await per_request_us(noop_app, scope("POST", "/reviews"), requests)
+    cases = [
+        ("unlimited route, gate only", ratelimit.AdmissionMiddleware(noop_app, memory, gate),
+         scope("GET", "/search"), requests),
+        ("limited route, memory", ratelimit.AdmissionMiddleware(noop_app, memory, gate),
+         scope("POST", "/reviews/42/like"), requests),
+        ("limited route, memory, no gate", ratelimit.AdmissionMiddleware(noop_app, memory, None),
+         scope("POST", "/reviews"), requests),
+        ("limited route, shared sqlite", ratelimit.AdmissionMiddleware(
+            noop_app, ratelimit.RateLimiter(RULES, ratelimit.StoreWindows(sqlite_store)), gate),
+         scope("POST", "/reviews"), requests // 20),
+        ("limited route, shared redis (local fake)", ratelimit.AdmissionMiddleware(
+            noop_app, ratelimit.RateLimiter(RULES, ratelimit.StoreWindows(redis_store)), gate),
+         scope("POST", "/reviews"), requests // 100),
+    ]
+    print(f"{'case':<42} {'us/request':>10} {'added':>8}")
+    print(f"{'no middleware':<42} {baseline:>10.2f}")
+    for name, app, request_scope, n in cases:
+        us = await per_request_us(app, request_scope, n)
+        print(f"{name:<42} {us:>10.2f} {us - baseline:>8.2f}")
+    redis_store._close()
+    server.stop()
+
+
+async def budgets():
+    """A client over budget is refused with a Retry-After; other clients are unaffected."""
+    limiter = ratelimit.RateLimiter({"POST /reviews": (1.0, 5)}, ratelimit.MemoryBuckets())
+    rule = limiter.match("POST", "/reviews")
+    results = [await limiter.check(rule, scope("POST", "/reviews")) for _ in range(7)]
+    other = await limiter.check(rule, scope("POST", "/reviews", client="10.0.0.2"))
+    ok = results[:5] == [0.0] * 5 and all(0 < r <= 1 for r in results[5:]) and other == 0.0
+    print(f"[{'ok' if ok else 'FAIL'}] burst of 5 allowed, then refused with retry-after "
+          f"{results[5]:.2f}s; other client allowed")
+
+    server = ServerThread()
+    stores = [cache_backends.RedisClient(f"redis://127.0.0.1:{server.port}/0") for _ in range(2)]
+    workers = [ratelimit.RateLimiter({"POST /reviews": (1.0, 5)}, ratelimit.StoreWindows(s)) for s in stores]
+    # Wait for a fresh window so all eight land in the same one
+    time.sleep(5 - time.time() % 5 + 0.01)
+    allowed = sum([not await workers[i % 2].check(rule, scope("POST", "/reviews")) for i in range(8)])
+    for store in stores:
+        store._close()
+    server.stop()
+    shared_ok = allowed == 5
+    print(f"[{'ok' if shared_ok else 'FAIL'}] two workers sharing redis allow {allowed} of 8 against a burst of 5")
+    return ok and shared_ok
+
+
+async def shedding(clients, limit, max_queue, timeout, work):
+    """Sends `clients` concurrent requests; returns (count by status, slowest ms by status, gate)."""
+    gate = ratelimit.ConcurrencyGate(limit, max_queue, timeout)
+
+    async def slow_app(scope, receive, send):
+        await asyncio.sleep(work)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    app = ratelimit.AdmissionMiddleware(slow_app, None, gate)
+
+    async def one():
+        status = None
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        started = time.perf_counter()
+        await app(scope("GET", "/search"), receive, send)
+        return status, (time.perf_counter() - started) * 1000
+
+    results = await asyncio.gather(*(one() for _ in range(clients)))
+    counts = {}
+    for status, _ in results:
+        counts[status] = counts.get(status, 0) + 1
+    slowest = {status: max(ms for s, ms in results if s == status) for status in counts}
+    return counts, slowest, gate
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    await overhead(args.requests)
+    print()
+    ok = await budgets()
+
+    # 500 clients against 20 slots and a queue of 40, each request taking 50 ms
+    counts, slowest, gate = await shedding(500, 20, 40, 0.5, 0.05)
+    shed_ok = counts.get(200) == 60 and counts.get(503) == 440 and slowest[503] < 5 and gate.active == 0
+    print(f"[{'ok' if shed_ok else 'FAIL'}] overload: {counts.get(200)} served (slowest {slowest[200]:.0f} ms), "
+          f"{counts.get(503)} shed (slowest refusal {slowest[503]:.1f} ms); gate drained to {gate.active}")
+    # The queue wait times out before a slot frees up
+    counts, slowest, gate = await shedding(30, 10, 40, 0.05, 0.2)
+    timeout_ok = counts.get(200) == 10 and counts.get(503) == 20 and gate.active == 0 and gate.waiting == 0
+    print(f"[{'ok' if timeout_ok else 'FAIL'}] queue timeout: {counts.get(200)} served, {counts.get(503)} "
+          f"refused after ~{slowest[503]:.0f} ms")
+    return 0 if ok and shed_ok and timeout_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,116 @@
+"""
+Benchmarks the /reviews/{city} query before and after the city_key indexes,
+on a SQLite database seeded with the pre-migration schema.
+
+    python benchmarks/bench_reviews.py [--rows 1000000] [--db /tmp/bench_reviews.db]
+
+The same file is then migrated in place, which also checks that migrating an
+existing database keeps every row.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+import models  # noqa: E402,F401  (registers the tables)
+from migrations import run_migrations  # noqa: E402
+
+CITIES = ["Bengaluru", "Hyderabad", "Chennai", "Mumbai", "Pune", "Delhi", "Kolkata", "Jaipur", "Kochi", "Indore"]
+WORDS = ["landlord", "deposit", "water", "metro", "noisy", "clean", "broker", "maintenance", "parking", "friendly",
+         "rent", "hike", "society", "power", "cuts", "traffic", "safe", "quiet", "owner", "responsive"]
+
+# The original schema, before city_key and its indexes existed
+LEGACY_SCHEMA = """
+CREATE TABLE rentreview (
+    id INTEGER NOT NULL PRIMARY KEY,
+    city VARCHAR NOT NULL,
+    review_text VARCHAR NOT NULL,
+    rating INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL
+)
+"""
+
+
+def seed(path, rows, seed=7):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    batch = []
+    for i in range(rows):
+        text = " ".join(rng.choices(WORDS, k=12))
+        batch.append((rng.choice(CITIES), text, rng.randint(1, 5), rng.randint(0, 500), "2024-01-01 00:00:00"))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO rentreview (city, review_text, rating, likes, timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO rentreview (city, review_text, rating, likes, timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def timed(conn, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", default="/tmp/bench_reviews.db")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    start = time.perf_counter()
+    seed(args.db, args.rows)
+    print(f"seeded {args.rows} reviews in {time.perf_counter() - start:.1f}s")
+
+    before_queries = {
+        "all rows for city": ("SELECT * FROM rentreview WHERE city LIKE ? ORDER BY likes DESC", ("%Bengaluru%",)),
+        "top 50 for city": ("SELECT * FROM rentreview WHERE city LIKE ? ORDER BY likes DESC LIMIT 50", ("%Bengaluru%",)),
+    }
+    after_queries = {
+        "all rows for city": ("SELECT * FROM rentreview WHERE city_key = ? ORDER BY likes DESC", ("bengaluru",)),
+        "top 50 for city": ("SELECT * FROM rentreview WHERE city_key = ? ORDER BY likes DESC LIMIT 50", ("bengaluru",)),
+        "full-text top 20": (
+            "SELECT r.* FROM rentreview_fts JOIN rentreview r ON r.id = rentreview_fts.rowid "
+            "WHERE rentreview_fts MATCH ? ORDER BY bm25(rentreview_fts) LIMIT 20", ('"landlord" "deposit"',)),
+    }
+
+    conn = sqlite3.connect(args.db)
+    before = {name: timed(conn, sql, params, args.repeat) for name, (sql, params) in before_queries.items()}
+    conn.close()
+
+    start = time.perf_counter()
+    # As at startup: tables added since are created, then existing ones migrated
+    engine = create_engine(f"sqlite:///{args.db}")
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    print(f"migrated in {time.perf_counter() - start:.1f}s")
+
+    conn = sqlite3.connect(args.db)
+    count = conn.execute("SELECT count(*) FROM rentreview").fetchone()[0]
+    assert count == args.rows, f"migration lost rows: {count} != {args.rows}"
+    after = {name: timed(conn, sql, params, args.repeat) for name, (sql, params) in after_queries.items()}
+    conn.close()
+
+    print(f"{'query':<20} {'before (ms)':>12} {'after (ms)':>11} {'rows':>8}")
+    for name, (ms, rows) in after.items():
+        prior = f"{before[name][0]:.1f}" if name in before else "-"
+        print(f"{name:<20} {prior:>12} {ms:>11.1f} {rows:>8}")
+
+
+if __name__ == "__main__":
+    main()
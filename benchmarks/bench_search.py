@@ -0,0 +1,72 @@
+"""
+Compares the indexed /search engine against the old str(listing) linear scan.
+
+    python benchmarks/bench_search.py [--sizes 1000 10000 100000] [--repeat 20]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from search import ListingIndex  # noqa: E402
+
+AREAS = ["Koramangala", "Indiranagar", "HSR Layout", "Whitefield", "Jayanagar", "Marathahalli",
+         "Gachibowli", "Banjara Hills", "Madhapur", "Kondapur", "Velachery", "Adyar"]
+BRANDS = ["Zolo", "Stanza", "Nestaway", "Colive", "Housr", "Olive", "Sunrise", "Green", "Lake", "Metro"]
+SUFFIXES = ["Residency", "Living", "Homes", "Enclave", "Towers", "Nest", "Suites", "Elite"]
+AMENITIES = ["WiFi", "AC", "Power Backup", "Balcony", "Security", "Parking", "Gym", "Laundry", "Mess", "Elevator"]
+QUERIES = ["koramangala", "zolo", "stanz", "gym", "lake homes", "whitefeld", "pg wifi", "residency"]
+
+
+def make_listings(n, seed=42):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(n):
+        kind = rng.choice(["PG", "Flat", "House"])
+        listings.append({
+            "id": i,
+            "type": kind,
+            "name": f"{rng.choice(BRANDS)} {rng.choice(SUFFIXES)} {i}",
+            "area": rng.choice(AREAS),
+            "price": f"₹{rng.randrange(6000, 60000, 500):,}/mo",
+            "image": f"https://images.unsplash.com/photo-{rng.randrange(10**12)}?w=600",
+            "specs": rng.choice(["Twin Sharing • Meals", "1 Bedroom • 650 sqft", "Single • Luxury", "2BHK • 1100 sqft"]),
+            "amenities": rng.sample(AMENITIES, 3),
+        })
+    return listings
+
+
+def linear_scan(listings, query):
+    return [l for l in listings if query.lower() in str(l).lower()]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'listings':>9} {'build (s)':>10} {'scan (ms/q)':>12} {'index (ms/q)':>13} {'speedup':>8}")
+    for size in args.sizes:
+        listings = make_listings(size)
+        start = time.perf_counter()
+        index = ListingIndex(listings)
+        build = time.perf_counter() - start
+
+        scan = sum(timed(lambda: linear_scan(listings, q), args.repeat) for q in QUERIES) / len(QUERIES)
+        indexed = sum(timed(lambda: index.search(q, limit=20), args.repeat) for q in QUERIES) / len(QUERIES)
+        print(f"{size:>9} {build:>10.2f} {scan * 1000:>12.3f} {indexed * 1000:>13.3f} {scan / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
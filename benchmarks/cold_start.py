@@ -0,0 +1,152 @@
+"""
+Cold-start measurement: time to first response in fresh processes, plus an
+import-time breakdown from `python -X importtime`.
+
+    python benchmarks/cold_start.py [--runs 5] [--lazy | --eager] [--target-ms 1500]
+
+Each run starts a new interpreter against an existing (already migrated)
+SQLite database, as a serverless instance would, imports the app, runs the
+startup hooks and sends one request per route group. The reported figure is
+the median over runs; the exit status is 1 when time to the first
+response exceeds --target-ms.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).parent.parent / "backend"
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, BACKEND)
+import main
+imported = time.perf_counter()
+
+REQUESTS = [
+    ("search", "GET", "/search?q=flat&city=Pune", None),
+    ("city_info", "GET", "/city-info/Pune", None),
+    ("reviews", "GET", "/reviews/Pune?limit=20", None),
+    ("estimate", "POST", "/estimate", {"city": "Pune", "bedrooms": 2, "bathrooms": 1}),
+]
+
+async def request(method, target, body):
+    # Bare ASGI call, so no HTTP client library is imported on the app's behalf
+    path, _, query = target.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "headers": [(b"host", b"cold"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("cold", 80), "root_path": "",
+    }
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await main.app(scope, receive, send)
+    status = sent[0]["status"]
+    assert status == 200, (target, status, b"".join(m.get("body", b"") for m in sent[1:])[:200])
+
+async def run():
+    timings = {"import_ms": (imported - started) * 1000}
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        timings["startup_ms"] = (ready - imported) * 1000
+        for name, method, path, body in REQUESTS:
+            t = time.perf_counter()
+            await request(method, path, body)
+            timings[f"{name}_ms"] = (time.perf_counter() - t) * 1000
+            if "first_response_ms" not in timings:
+                timings["first_response_ms"] = (time.perf_counter() - started) * 1000
+    print("TIMINGS " + json.dumps(timings))
+
+asyncio.run(run())
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(lazy):
+    env = dict(os.environ, LOG_LEVEL="WARNING", WIKIPEDIA_API_URL="http://127.0.0.1:9/w/api.php")
+    if lazy is not None:
+        env["LAZY_STARTUP"] = "1" if lazy else "0"
+    return env
+
+
+def run_child(workdir, lazy, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + \
+        ["-c", f"BACKEND = {str(BACKEND)!r}\n" + CHILD]
+    result = subprocess.run(command, cwd=workdir, env=child_env(lazy), capture_output=True, text=True, timeout=300)
+    line = next((l for l in result.stdout.splitlines() if l.startswith("TIMINGS ")), None)
+    if result.returncode or line is None:
+        raise SystemExit(f"cold-start child failed:\n{result.stdout}\n{result.stderr[-3000:]}")
+    return json.loads(line[len("TIMINGS "):]), result.stderr
+
+
+def import_breakdown(stderr, top):
+    """Cumulative import time of main's direct imports and of the slowest top-level packages."""
+    direct, pending, packages = [], [], {}
+    # -X importtime prints children before their parent, one indent level deeper
+    for match in IMPORT_LINE.finditer(stderr):
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            pending.append((cumulative, name))
+        elif depth == 0:
+            if name == "main":
+                direct = pending
+            pending = []
+        root = name.split(".")[0]
+        if root != "main":
+            packages[root] = max(packages.get(root, 0), cumulative)
+    return sorted(direct, reverse=True)[:top], sorted(((v, k) for k, v in packages.items()), reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time to first response.")
+    parser.add_argument("--runs", type=int, default=5)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--lazy", dest="lazy", action="store_true", default=None, help="force LAZY_STARTUP=1")
+    mode.add_argument("--eager", dest="lazy", action="store_false", help="force LAZY_STARTUP=0")
+    parser.add_argument("--target-ms", type=float, default=1500.0, help="budget for time to first response")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cold_start_")
+    run_child(workdir, args.lazy)  # creates and migrates the database, as a deploy would
+
+    runs = [run_child(workdir, args.lazy)[0] for _ in range(args.runs)]
+    print(f"{'phase':<20} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for key in runs[0]:
+        values = [r[key] for r in runs]
+        print(f"{key:<20} {statistics.median(values):>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+    _, stderr = run_child(workdir, args.lazy, importtime=True)
+    direct, packages = import_breakdown(stderr, args.top)
+    print("\nimports made by main (cumulative ms):")
+    for micros, name in direct:
+        print(f"  {name:<32} {micros / 1000:>8.1f}")
+    print("\nslowest packages (cumulative ms):")
+    for micros, name in packages:
+        print(f"  {name:<32} {micros / 1000:>8.1f}")
+
+    first = statistics.median(r["first_response_ms"] for r in runs)
+    verdict = "within" if first <= args.target_ms else "OVER"
+    print(f"\ntime to first response {first:.0f} ms: {verdict} the {args.target_ms:.0f} ms target")
+    sys.exit(0 if first <= args.target_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Local stand-in for a Redis server, speaking enough RESP2 for the shared cache
+backend and rate limiter (GET/MGET/SET/DEL/SCAN/INCR with expiry, PUBLISH/SUBSCRIBE).
+
+Serve it and point the app's workers at it:
+
+    python benchmarks/fake_redis.py serve --port 6390
+    CACHE_BACKEND=redis CACHE_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+
+or run the check, which exercises each cache backend as two workers would
+(two independent stores on the same file or server) and exits 1 on failure:
+
+    python benchmarks/fake_redis.py check
+"""
+import argparse
+import asyncio
+import fnmatch
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at or None)
+        self.channels = {}  # channel -> set of subscriber writers
+        self.connections = set()  # every open writer, closed on shutdown
+        self.commands = 0
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                self.commands += 1
+                name, args = command[0].upper(), command[1:]
+                if name == b"SUBSCRIBE":
+                    for i, channel in enumerate(args, 1):
+                        self.channels.setdefault(channel, set()).add(writer)
+                        writer.write(encode([b"subscribe", channel, i]))
+                    await writer.drain()
+                    await reader.read()  # subscribed connections only receive from here on
+                    break
+                writer.write(encode(self.execute(name, args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.channels.values():
+                subscribers.discard(writer)
+            self.connections.discard(writer)
+            writer.close()
+
+    def execute(self, name, args):
+        if name == b"PING":
+            return Status("PONG")
+        if name in (b"AUTH", b"SELECT", b"FLUSHDB"):
+            if name == b"FLUSHDB":
+                self.data.clear()
+            return Status("OK")
+        if name == b"GET":
+            return self._get(args[0])
+        if name == b"MGET":
+            return [self._get(key) for key in args]
+        if name == b"SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires_at = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            if b"NX" in options and self._get(key) is not None:
+                return None
+            self.data[key] = (value, expires_at)
+            return Status("OK")
+        if name == b"INCR":
+            entry = self.data.get(args[0]) if self._get(args[0]) is not None else None
+            count = int(entry[0]) + 1 if entry else 1
+            self.data[args[0]] = (str(count).encode(), entry[1] if entry else None)
+            return count
+        if name == b"PEXPIRE":
+            if self._get(args[0]) is None:
+                return 0
+            self.data[args[0]] = (self.data[args[0]][0], time.monotonic() + int(args[1]) / 1000)
+            return 1
+        if name == b"DEL":
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if name == b"DBSIZE":
+            return len(self.data)
+        if name == b"SCAN":
+            # Everything in one pass; cursor "0" ends the scan
+            options = [a.upper() for a in args[1:]]
+            pattern = args[1 + options.index(b"MATCH") + 1].decode() if b"MATCH" in options else "*"
+            keys = [k for k in list(self.data) if self._get(k) is not None and fnmatch.fnmatchcase(k.decode(), pattern)]
+            return [b"0", keys]
+        if name == b"PUBLISH":
+            subscribers = self.channels.get(args[0], set())
+            for subscriber in subscribers:
+                subscriber.write(encode([b"message", args[0], args[1]]))
+            return len(subscribers)
+        return Error(f"ERR unknown command '{name.decode()}'")
+
+
+class Status(str):
+    pass
+
+
+class Error(str):
+    pass
+
+
+def encode(value) -> bytes:
+    if isinstance(value, Status):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, Error):
+        return b"-" + value.encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command, e.g. from redis-cli or telnet
+    args = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def start_server(port: int = 0):
+    fake = FakeRedis()
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", port)
+    return fake, server, server.sockets[0].getsockname()[1]
+
+
+class ServerThread:
+    """Runs the fake server on its own loop, since the cache client blocks the caller's."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.fake, self.server, self.port = asyncio.run_coroutine_threadsafe(start_server(), self.loop).result()
+
+    def stop(self):
+        async def shutdown():
+            self.server.close()
+            for writer in list(self.fake.connections):
+                writer.close()
+            await self.server.wait_closed()
+            await asyncio.sleep(0.05)  # let the handlers see EOF and return
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def _import_backend():
+    sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+    os.environ.setdefault("CACHE_RETRY_AFTER", "0.5")
+    os.environ.setdefault("CACHE_POLL_INTERVAL", "0.1")
+    import cache
+    import cache_backends
+    import invalidation
+    return cache, cache_backends, invalidation
+
+
+async def check_store(name, make_store, cache, invalidation):
+    """Two stores stand in for two workers sharing one file or server."""
+    failures = []
+
+    def expect(condition, message):
+        print(f"  [{'ok' if condition else 'FAIL'}] {message}")
+        if not condition:
+            failures.append(message)
+
+    print(f"{name}:")
+    worker_a, worker_b = make_store(), make_store()
+    cache_a = cache.TTLCache(maxsize=100, ttl=60, backend=worker_a.backend("check", 100))
+    cache_b = cache.TTLCache(maxsize=100, ttl=60, backend=worker_b.backend("check", 100))
+    other_b = cache.TTLCache(maxsize=100, ttl=60, backend=worker_b.backend("other", 100))
+    cache_a.clear()
+    other_b.clear()
+
+    cache_a.set("pune", {"description": "Pune", "areas": ["Baner"]})
+    await cache_a.flush()
+    expect(await cache_b.aget("pune") == {"description": "Pune", "areas": ["Baner"]}, "value written by A is read by B")
+    expect(await other_b.aget("pune") is None, "namespaces are separate")
+    cache_a.set_many({"delhi": 1, "goa": 2})
+    await cache_a.flush()
+    expect(await cache_b.aget_many(["pune", "delhi", "goa", "agra"]) == {"pune": {"description": "Pune", "areas": ["Baner"]}, "delhi": 1, "goa": 2},
+           "many keys read in one call")
+    cache_b.delete("pune")
+    await cache_b.flush()
+    expect(await cache_a.aget("pune") is None, "delete by B is seen by A")
+
+    cache_a.set("short", 1, ttl=0.2)
+    await asyncio.sleep(0.3)
+    expect(await cache_b.aget("short") is None, "entries expire")
+
+    fetches = 0
+
+    async def fetch():
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(0.05)
+        return "fetched"
+
+    results = await asyncio.gather(*(cache_a.get_or_fetch("k", fetch) for _ in range(10)))
+    expect(results == ["fetched"] * 10 and fetches == 1, "concurrent misses share one fetch")
+    await cache_a.flush()
+    expect(await cache_b.get_or_fetch("k", fetch) == "fetched" and fetches == 1, "other worker hits the shared entry")
+
+    bus_a, bus_b = invalidation.InvalidationBus(worker_a), invalidation.InvalidationBus(worker_b)
+    seen_a, seen_b = [], []
+    bus_a.subscribe("city", seen_a.append)
+    bus_b.subscribe("city", seen_b.append)
+    bus_a.start()
+    bus_b.start()
+    await asyncio.sleep(0.3)  # let the listeners subscribe
+    bus_a.publish("city", "pune")
+    bus_b.publish("city", None)
+    deadline = time.monotonic() + 3
+    while (len(seen_a) < 2 or len(seen_b) < 2) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    # Local subscribers run at once, the other worker's message arrives later
+    expect(seen_a == ["pune", None] and seen_b == [None, "pune"],
+           f"invalidations reach both workers once (A {seen_a}, B {seen_b})")
+    bus_a.stop()
+    bus_b.stop()
+    expect(not bus_a.running and not bus_b.running, "listeners stop")
+    return failures, worker_a
+
+
+async def check():
+    cache, cache_backends, invalidation = _import_backend()
+    failures = []
+
+    path = os.path.join(tempfile.mkdtemp(prefix="cache_check_"), "cache.db")
+    sqlite_failures, _ = await check_store(
+        "sqlite", lambda: cache_backends.SQLiteStore(path), cache, invalidation)
+    failures += sqlite_failures
+
+    store = cache_backends.SQLiteStore(path)
+    small = cache.TTLCache(maxsize=10, ttl=60, backend=store.backend("small", 10))
+    for i in range(cache_backends.PRUNE_EVERY):
+        small.set(i, i)
+    await small.flush()
+    size = small.stats()["size"]
+    print(f"  [{'ok' if size <= 10 else 'FAIL'}] sweep trims to maxsize ({size} entries)")
+    if size > 10:
+        failures.append("sqlite maxsize")
+
+    server = ServerThread()
+    url = f"redis://127.0.0.1:{server.port}/0"
+    redis_failures, client = await check_store(
+        "redis (fake server)", lambda: cache_backends.RedisClient(url), cache, invalidation)
+    failures += redis_failures
+
+    server.stop()
+    down = cache.TTLCache(backend=client.backend("check", 10))
+    client._close()  # drop the pooled connection so the next call has to reconnect
+    started = time.perf_counter()
+    missed = down.get("k") is None and down.get("k") is None
+    elapsed = (time.perf_counter() - started) * 1000
+    ok = missed and elapsed < 500
+    print(f"  [{'ok' if ok else 'FAIL'}] server down: reads miss without raising ({elapsed:.0f} ms for two reads)")
+    if not ok:
+        failures.append("redis outage")
+
+    print(f"\n{'all checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--port", type=int, default=6390)
+    sub.add_parser("check")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        async def serve_forever():
+            _, server, port = await start_server(args.port)
+            print(f"fake redis listening on 127.0.0.1:{port}")
+            async with server:
+                await server.serve_forever()
+
+        asyncio.run(serve_forever())
+    else:
+        sys.exit(asyncio.run(check()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Load test for POST /reviews/{id}/like: N concurrent likes on one review,
+run in-process against a fresh SQLite database.
+
+    python benchmarks/load_likes.py [--likes 1000] [--concurrency 1000]
+
+Checks that the final count equals the number of likes sent, and compares
+with the old read-modify-write handler, which loses updates under contention.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# The app opens database.db in the working directory; keep it out of the tree
+os.chdir(tempfile.mkdtemp(prefix="bench_likes_"))
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")  # one client liking as fast as it can
+os.environ.setdefault("ADMISSION_MAX_CONCURRENT", "0")  # every like contends; none are shed
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+from database import get_async_engine  # noqa: E402
+from models import RentReview  # noqa: E402
+
+
+async def legacy_like(review_id: int):
+    """The original handler: read, increment in Python, write back."""
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        review = await session.get(RentReview, review_id)
+        await asyncio.sleep(0)  # let other requests interleave, as they would across workers
+        review.likes += 1
+        session.add(review)
+        await session.commit()
+        return review.likes
+
+
+async def run(likes: int, concurrency: int):
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        review_id = (await client.post("/reviews", json={"city": "Pune", "review_text": "bench", "rating": 5})).json()["id"]
+        legacy_id = (await client.post("/reviews", json={"city": "Pune", "review_text": "legacy", "rating": 5})).json()["id"]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def like(send):
+            async with semaphore:
+                await send()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[like(lambda: client.post(f"/reviews/{review_id}/like")) for _ in range(likes)])
+        elapsed = time.perf_counter() - start
+
+        legacy_start = time.perf_counter()
+        await asyncio.gather(*[like(lambda: legacy_like(legacy_id)) for _ in range(likes)])
+        legacy_elapsed = time.perf_counter() - legacy_start
+
+        async with AsyncSession(get_async_engine()) as session:
+            final = (await session.get(RentReview, review_id)).likes
+            legacy_final = (await session.get(RentReview, legacy_id)).likes
+
+    print(f"{'handler':<18} {'final likes':>11} {'lost':>6} {'likes/s':>9}")
+    print(f"{'atomic UPDATE':<18} {final:>11} {likes - final:>6} {likes / elapsed:>9.0f}")
+    print(f"{'read-modify-write':<18} {legacy_final:>11} {likes - legacy_final:>6} {likes / legacy_elapsed:>9.0f}")
+    assert final == likes, f"atomic path lost {likes - final} likes"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--likes", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.likes, args.concurrency))
+
+
+if __name__ == "__main__":
+    main_cli()
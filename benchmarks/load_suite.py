@@ -0,0 +1,414 @@
+"""
+End-to-end load suite: drives every API endpoint in-process against a seeded
+SQLite database and the stub Wikipedia upstream, and records throughput and
+p50/p95/p99 latency per scenario.
+
+    python benchmarks/load_suite.py [--requests 500] [--concurrency 16]
+                                    [--scenarios city_info search ...]
+                                    [--output benchmarks/results/latest.json]
+                                    [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+                                    [--save-baseline]
+
+Each scenario also checks its responses (status and shape), so the suite
+doubles as the smoke test the old verify_*.py scripts were: any failed
+request, warm-up included, fails the run. Scenarios whose p95 grew or whose
+throughput fell by more than the tolerance against the baseline fail it too.
+
+Timings from different machines aren't comparable, so no baseline is
+committed: record one on this machine with --save-baseline (it refuses to
+save a run that had errors; benchmarks/baseline.json is git-ignored). Without
+a baseline the comparison is skipped with a warning.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+CITIES = ["Bengaluru", "Mumbai", "Delhi", "Hyderabad", "Chennai", "Pune"]
+AREAS = ["Koramangala", "Indiranagar", "Andheri", "Bandra", "Gachibowli", "Baner", "Adyar", "Saket"]
+TYPES = ["Flat", "PG", "House"]
+WORDS = ["water", "landlord", "deposit", "traffic", "metro", "noise", "maintenance", "broker",
+         "parking", "power", "quiet", "friendly", "security", "market", "school", "lease"]
+SEARCH_QUERIES = ["koramangala", "pg wifi", "flat", "gym", "residency", "indiranagr", ""]
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def expect(condition, message):
+    if not condition:
+        raise ScenarioError(message)
+
+
+def seed_database(rng, reviews: int, questions: int, saved: int):
+    """Bulk-inserts fixture rows through the sync engine before the app starts."""
+    from sqlalchemy import insert
+
+    from city_data import normalize_city
+    from database import create_db_and_tables, engine
+    from models import Answer, PropertyListing, Question, RentReview, SavedListing
+
+    create_db_and_tables()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(RentReview), [
+            {
+                "city": city, "city_key": normalize_city(city),
+                "review_text": " ".join(rng.choices(WORDS, k=12)), "rating": rng.randint(1, 5),
+                "likes": rng.randint(0, 500), "timestamp": now - timedelta(minutes=i),
+                "rent_amount": rng.randrange(8000, 80000, 500), "property_type": rng.choice(TYPES),
+                "area": rng.choice(AREAS), "bedrooms": rng.randint(1, 4), "bathrooms": rng.randint(1, 3),
+            }
+            for i, city in enumerate(rng.choices(CITIES, k=reviews))
+        ])
+        conn.execute(insert(Question), [
+            {"text": f"Question {i} about {rng.choice(WORDS)}?", "user_name": f"user{i}",
+             "timestamp": now - timedelta(minutes=i), "upvotes": rng.randint(0, 50)}
+            for i in range(questions)
+        ])
+        conn.execute(insert(Answer), [
+            {"question_id": q, "text": f"Answer about {rng.choice(WORDS)}", "user_name": "member",
+             "timestamp": now - timedelta(minutes=q)}
+            for q in range(1, questions + 1) for _ in range(rng.randint(0, 4))
+        ])
+        conn.execute(insert(SavedListing), [
+            {"listing_id": f"seed-{i}", "name": f"Listing {i}", "price": rng.randrange(8000, 80000, 500),
+             "area": rng.choice(AREAS), "city": rng.choice(CITIES), "image": "", "type": rng.choice(TYPES),
+             "timestamp": now - timedelta(minutes=i)}
+            for i in range(saved)
+        ])
+        conn.execute(insert(PropertyListing), [
+            {"owner_name": f"owner{i}", "contact": "000", "type": rng.choice(TYPES), "city": rng.choice(CITIES),
+             "area": rng.choice(AREAS), "rent": rng.randrange(8000, 80000, 500), "bedrooms": rng.randint(1, 4),
+             "bathrooms": rng.randint(1, 3), "status": "Approved", "timestamp": now}
+            for i in range(200)
+        ])
+
+
+def build_scenarios(counts):
+    """name -> async fn(client, rng) performing and checking one request."""
+
+    async def city_info(client, rng):
+        r = await client.get(f"/city-info/{rng.choice(CITIES)}")
+        expect(r.status_code == 200, f"status {r.status_code}")
+        body = r.json()
+        expect(body["rent_estimate"].get("currency") == "₹", "rent_estimate without currency")
+        expect(body["listings"] and body["areas"], "empty listings or areas")
+
+    async def city_info_conditional(client, rng):
+        city = rng.choice(CITIES)
+        first = await client.get(f"/city-info/{city}")
+        r = await client.get(f"/city-info/{city}", headers={"If-None-Match": first.headers["ETag"]})
+        expect(r.status_code in (200, 304), f"status {r.status_code}")
+
+    async def search(client, rng):
+        r = await client.get("/search", params={"q": rng.choice(SEARCH_QUERIES), "city": rng.choice(CITIES)})
+        expect(r.status_code == 200, f"status {r.status_code}")
+        expect(isinstance(r.json(), list) and "X-Total-Count" in r.headers, "bad search response")
+
+    async def listings_nearby(client, rng):
+        lat, lon = 12.97 + rng.uniform(-0.08, 0.08), 77.62 + rng.uniform(-0.08, 0.08)
+        r = await client.get("/listings/nearby", params={"lat": lat, "lon": lon, "radius": 5})
+        expect(r.status_code == 200, f"status {r.status_code}")
+        distances = [item["distance_km"] for item in r.json()]
+        expect(distances == sorted(distances) and all(d <= 5 for d in distances), "results not nearest first")
+
+    async def listing_moderation(client, rng):
+        r = await client.post("/listings", json={
+            "owner_name": "bench", "contact": "bench@example.com", "type": rng.choice(TYPES),
+            "city": rng.choice(CITIES), "area": rng.choice(AREAS), "rent": rng.randrange(8000, 80000, 500),
+        })
+        expect(r.status_code == 200, f"submit status {r.status_code}")
+        r = await client.post("/moderation/listings", json={"approve": [r.json()["id"]]},
+                              headers={"X-Moderation-Token": os.environ["MODERATION_TOKEN"]})
+        expect(r.status_code == 200 and len(r.json()["approved"]) == 1, f"approve status {r.status_code}")
+
+    async def estimate(client, rng):
+        r = await client.post("/estimate", json={
+            "city": rng.choice(CITIES), "bedrooms": rng.randint(1, 4), "bathrooms": rng.randint(1, 3),
+            "type": rng.choice(TYPES), "area": rng.choice(AREAS),
+        })
+        expect(r.status_code == 200, f"status {r.status_code}")
+        body = r.json()
+        expect(body["range_low"] <= body["estimated_rent"] <= body["range_high"], "estimate outside its range")
+
+    async def estimate_batch(client, rng):
+        units = [{"city": rng.choice(CITIES), "bedrooms": rng.randint(1, 4), "bathrooms": 1} for _ in range(100)]
+        r = await client.post("/estimate/batch", json={"units": units})
+        expect(r.status_code == 200 and len(r.json()["estimates"]) == 100, f"status {r.status_code}")
+
+    async def reviews_list(client, rng):
+        r = await client.get(f"/reviews/{rng.choice(CITIES)}", params={"limit": 50})
+        expect(r.status_code == 200, f"status {r.status_code}")
+        page = r.json()
+        expect(all(a["likes"] >= b["likes"] for a, b in zip(page, page[1:])), "reviews not ordered by likes")
+
+    async def review_summary(client, rng):
+        r = await client.get(f"/reviews/{rng.choice(CITIES)}/summary")
+        expect(r.status_code == 200, f"status {r.status_code}")
+        body = r.json()
+        expect(sum(body["rating_histogram"].values()) <= body["review_count"], "more ratings than reviews")
+        likes = [review["likes"] for review in body["top_reviews"]]
+        expect(likes == sorted(likes, reverse=True), "top reviews not ordered by likes")
+
+    async def reviews_search(client, rng):
+        r = await client.get("/reviews/search", params={"q": rng.choice(WORDS), "city": rng.choice(CITIES)})
+        expect(r.status_code == 200, f"status {r.status_code}")
+
+    async def review_create(client, rng):
+        r = await client.post("/reviews", json={
+            "city": rng.choice(CITIES), "review_text": " ".join(rng.choices(WORDS, k=10)),
+            "rating": rng.randint(1, 5), "rent_amount": rng.randrange(8000, 80000, 500), "area": rng.choice(AREAS),
+        })
+        expect(r.status_code == 200 and r.json()["id"], f"status {r.status_code}")
+
+    async def review_like(client, rng):
+        r = await client.post(f"/reviews/{rng.randint(1, counts['reviews'])}/like")
+        expect(r.status_code == 200 and r.json()["likes"] >= 1, f"status {r.status_code}")
+
+    async def questions_list(client, rng):
+        r = await client.get("/questions", params={"limit": 50})
+        expect(r.status_code == 200 and len(r.json()) == min(50, counts["questions"]), f"status {r.status_code}")
+
+    async def question_threads(client, rng):
+        r = await client.get("/questions/threads", params={"limit": 20})
+        expect(r.status_code == 200 and all("answers" in t for t in r.json()), f"status {r.status_code}")
+
+    async def answers(client, rng):
+        r = await client.get(f"/questions/{rng.randint(1, counts['questions'])}/answers")
+        expect(r.status_code == 200 and isinstance(r.json(), list), f"status {r.status_code}")
+
+    async def question_create(client, rng):
+        r = await client.post("/questions", json={"text": f"Is {rng.choice(AREAS)} safe?", "user_name": "bench"})
+        expect(r.status_code == 200, f"status {r.status_code}")
+        r = await client.post(f"/questions/{r.json()['id']}/answers", json={"text": "Yes", "user_name": "bench"})
+        expect(r.status_code == 200, f"answer status {r.status_code}")
+
+    async def saved_list(client, rng):
+        r = await client.get("/saved-properties", params={"limit": 50})
+        expect(r.status_code == 200, f"status {r.status_code}")
+
+    async def saved_toggle(client, rng):
+        listing_id = f"bench-{rng.randrange(10 ** 9)}"
+        r = await client.post("/saved-properties", json={
+            "listing_id": listing_id, "name": "Bench Flat", "price": 20000, "area": rng.choice(AREAS),
+            "city": rng.choice(CITIES), "type": "Flat",
+        })
+        expect(r.status_code == 200, f"save status {r.status_code}")
+        r = await client.delete(f"/saved-properties/{listing_id}")
+        expect(r.status_code == 200, f"delete status {r.status_code}")
+
+    async def saved_sync(client, rng):
+        headers = {"X-User-Id": f"bench-{rng.randrange(50)}"}
+        listing_ids = [f"bench-{rng.randrange(200)}" for _ in range(10)]
+        r = await client.post("/saved-properties/batch", headers=headers, json={
+            "save": [{"listing_id": i, "name": "Bench Flat", "price": 20000, "area": rng.choice(AREAS),
+                      "city": rng.choice(CITIES), "type": "Flat"} for i in listing_ids[:5]],
+            "delete": listing_ids[5:],
+        })
+        expect(r.status_code == 200, f"status {r.status_code}")
+
+    return {fn.__name__: fn for fn in (
+        city_info, city_info_conditional, search, listings_nearby, estimate, estimate_batch,
+        reviews_list, review_summary, reviews_search, review_create, review_like,
+        questions_list, question_threads, answers, question_create,
+        saved_list, saved_toggle, saved_sync, listing_moderation,
+    )}
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(client, fn, requests: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    latencies, error_samples = [], []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await fn(client, rng)
+            except Exception as e:
+                errors += 1
+                if len(error_samples) < 5:
+                    error_samples.append(repr(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    warmup = max(1, requests // 10)
+    warm_rng = random.Random(seed + 1)
+    for _ in range(warmup):
+        try:
+            await fn(client, warm_rng)
+        except Exception as e:
+            # Not timed, but a failure is still a failure
+            errors += 1
+            if len(error_samples) < 5:
+                error_samples.append(f"warm-up: {e!r}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_samples": error_samples,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3) if ordered else None,
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3) if ordered else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regression messages."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and current["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms")
+        if base.get("throughput_rps") and current["throughput_rps"] and \
+                current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['throughput_rps']:.0f} req/s vs baseline {base['throughput_rps']:.0f} req/s")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run(args):
+    # The app opens database.db in the working directory; keep it out of the tree
+    os.chdir(tempfile.mkdtemp(prefix="load_suite_"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Every scenario comes from one client; measure the handlers, not the limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("MODERATION_TOKEN", "load-suite")
+    sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+    sys.path.insert(0, str(BENCH_DIR))
+
+    import httpx
+
+    import main
+    import services
+    from stub_upstream import StubState, make_app
+
+    rng = random.Random(args.seed)
+    counts = {"reviews": args.reviews, "questions": args.questions}
+    seed_database(rng, args.reviews, args.questions, args.saved)
+
+    # Stubbed Wikipedia; the shared client is kept by the startup hook
+    services._http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app(StubState())))
+    services.WIKIPEDIA_API_URL = "http://stub/w/api.php"
+
+    scenarios = build_scenarios(counts)
+    selected = args.scenarios or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    results = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: getattr(args, k) for k in ("requests", "concurrency", "seed", "reviews", "questions", "saved")},
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with main.app.router.lifespan_context(main.app), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://bench", limits=limits, timeout=60,
+    ) as client:
+        await asyncio.sleep(0.5)  # let the refresh scheduler warm descriptions from the stub
+        print(f"{'scenario':<22} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for i, name in enumerate(selected):
+            result = await run_scenario(client, scenarios[name], args.requests, args.concurrency, args.seed + i)
+            results["scenarios"][name] = result
+            print(f"{name:<22} {result['throughput_rps'] or 0:>9.1f} {result['p50_ms'] or 0:>9.2f} "
+                  f"{result['p95_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f} {result['errors']:>7}")
+            for sample in result["error_samples"]:
+                print(f"    {sample}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load suite for the API.")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--reviews", type=int, default=20000, help="seeded reviews")
+    parser.add_argument("--questions", type=int, default=2000, help="seeded questions")
+    parser.add_argument("--saved", type=int, default=1000, help="seeded saved properties")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional slowdown")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    args = parser.parse_args()
+    # Resolve before run() moves into a temporary working directory
+    args.output, args.baseline = args.output.resolve(), args.baseline.resolve()
+
+    results = asyncio.run(run(args))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nresults written to {args.output}")
+
+    # Every scenario must be error-free, whatever the baseline says
+    errors = {name: r["errors"] for name, r in results["scenarios"].items() if r["errors"]}
+    if errors:
+        print("\nFAILED: requests failed in " + ", ".join(f"{name} ({n})" for name, n in errors.items()))
+        if args.save_baseline:
+            print("baseline not saved")
+        sys.exit(1)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nwarning: no baseline at {args.baseline}, skipping the comparison; "
+              "record one on this machine with --save-baseline")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print(f"\nregressions against {args.baseline.name} (tolerance {args.tolerance:.0%}):")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"no regressions against {args.baseline.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Local stand-in for the Wikipedia extracts API, with configurable latency and failures.
+
+Serve it and point the app at it:
+
+    python benchmarks/stub_upstream.py serve --port 8081 --latency 2 --fail-rate 0.3
+    WIKIPEDIA_API_URL=http://127.0.0.1:8081/w/api.php uvicorn main:app
+
+or run the in-process check, which drives /city-info against a slow stub
+(latency must not reach the request path) and then a dead one (the circuit
+breaker must open and requests keep being served from the warmed store):
+
+    python benchmarks/stub_upstream.py check [--latency 2] [--requests 200]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class StubState:
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.down = False
+        self.calls = 0
+
+
+def make_app(state: StubState) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/w/api.php")
+    async def api(request: Request):
+        state.calls += 1
+        await asyncio.sleep(state.latency)
+        if state.down or random.random() < state.fail_rate:
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        title = request.query_params.get("titles", "")
+        extract = f"{title} is a city served by the stub upstream (call {state.calls})."
+        return {"query": {"pages": {"1": {"pageid": 1, "title": title, "extract": extract}}}}
+
+    return app
+
+
+async def check(latency: float, requests: int):
+    # The app opens database.db in the working directory; keep it out of the tree
+    os.chdir(tempfile.mkdtemp(prefix="stub_upstream_"))
+    os.environ.setdefault("CITY_REFRESH_BACKOFF_BASE", "0.2")
+    os.environ.setdefault("CITY_REFRESH_BREAKER_RESET", "2")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+    import httpx
+    import main
+    import services
+
+    state = StubState(latency=latency)
+    stub_transport = httpx.ASGITransport(app=make_app(state))
+    # Route the shared upstream client to the stub; startup keeps an open client
+    services._http_client = httpx.AsyncClient(transport=stub_transport)
+    services.WIKIPEDIA_API_URL = "http://stub/w/api.php"
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            async def timed(city):
+                started = time.perf_counter()
+                response = await client.get(f"/city-info/{city}")
+                return time.perf_counter() - started, response.json()["description"]
+
+            cities = [c.title() for c in services.city_data.snapshot.cities]
+            passes = -(-len(cities) // services.refresh_scheduler.concurrency)
+            await asyncio.sleep(passes * latency + 0.5)  # first warm-up pass
+            samples = [await timed(random.choice(cities)) for _ in range(requests)]
+            warmed = sum(services.DESCRIPTION_UNAVAILABLE != d for _, d in samples)
+            latencies = sorted(s for s, _ in samples)
+            print(f"upstream latency {latency:.1f}s; {requests} requests over {len(cities)} cities")
+            print(f"  /city-info p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                  f"max {latencies[-1] * 1000:.1f} ms, served warm {warmed}/{requests}")
+
+            # Cold city: answered immediately, filled in the background
+            elapsed, description = await timed("Mysuru")
+            await asyncio.sleep(latency + 1.5)
+            _, later = await timed("Mysuru")
+            print(f"  cold city first response {elapsed * 1000:.1f} ms "
+                  f"({'fallback' if description == services.DESCRIPTION_UNAVAILABLE else 'warm'}), "
+                  f"after refresh: {'warm' if later != services.DESCRIPTION_UNAVAILABLE else 'fallback'}")
+
+            state.down, state.latency = True, 0.0
+            scheduler = services.refresh_scheduler
+            for job in list(scheduler._due):
+                scheduler._due[job] = 0.0  # make every job due so the outage is hit at once
+            scheduler._wake.set()
+            await asyncio.sleep(2.0)
+            calls = state.calls
+            await asyncio.sleep(1.0)
+            elapsed, description = await timed(cities[0])
+            print(f"  upstream down: breaker {scheduler.stats()['breakers']['wikipedia']}, "
+                  f"{state.calls - calls} upstream calls in the next 1s, "
+                  f"request still served warm: {description != services.DESCRIPTION_UNAVAILABLE} "
+                  f"({elapsed * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--port", type=int, default=8081)
+    serve.add_argument("--latency", type=float, default=0.0)
+    serve.add_argument("--fail-rate", type=float, default=0.0)
+    run = sub.add_parser("check")
+    run.add_argument("--latency", type=float, default=2.0)
+    run.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(make_app(StubState(args.latency, args.fail_rate)), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(check(args.latency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
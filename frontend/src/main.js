@@ -145,7 +145,7 @@ window.loadQuestions = async function () {
   if (!feed) return;
 
   try {
-    const res = await fetch(`${apiBase}/questions`);
+    const res = await fetch(`${apiBase}/questions?limit=50&fields=id,text,user_name,timestamp,upvotes`);
     if (!res.ok) return;
 
     const questions = await res.json();
@@ -566,13 +566,54 @@ function loadMap(city) {
     </iframe>`;
 }
 
+// Review summary: precomputed on the server, so no need to download every review
+async function loadReviewSummary(city) {
+  const box = document.getElementById('reviews-summary');
+  try {
+    const res = await fetch(`${apiBase}/reviews/${city}/summary`);
+    const summary = await res.json();
+
+    if (!summary.review_count) {
+      box.classList.add('hidden');
+      return;
+    }
+
+    const rated = Object.values(summary.rating_histogram).reduce((a, b) => a + b, 0) || 1;
+    const bars = ['5', '4', '3', '2', '1'].map(star => `
+               <div class="flex items-center gap-2 text-xs text-gray-500">
+                   <span class="w-4">${star}★</span>
+                   <div class="flex-grow bg-gray-100 dark:bg-gray-700 rounded h-2">
+                       <div class="bg-yellow-400 h-2 rounded" style="width: ${100 * summary.rating_histogram[star] / rated}%"></div>
+                   </div>
+                   <span class="w-6 text-right">${summary.rating_histogram[star]}</span>
+               </div>`).join('');
+    const keywords = summary.keywords.slice(0, 8).map(k => `
+               <span class="bg-indigo-50 text-indigo-600 text-xs px-2 py-1 rounded-full">${k.word} · ${k.count}</span>`).join('');
+
+    box.innerHTML = `
+           <div class="bg-gray-50 dark:bg-gray-800 p-4 rounded-xl border border-gray-100 dark:border-gray-700">
+               <div class="flex items-center gap-4 mb-3">
+                   <div class="text-3xl font-bold text-gray-900 dark:text-white">${summary.average_rating ?? '-'}</div>
+                   <div class="text-sm text-gray-500">${summary.review_count} reviews</div>
+               </div>
+               <div class="space-y-1 mb-3">${bars}</div>
+               <div class="flex flex-wrap gap-2">${keywords}</div>
+           </div>`;
+    box.classList.remove('hidden');
+  } catch (err) {
+    console.error(err);
+    box.classList.add('hidden');
+  }
+}
+
 // Load Reviews
 async function loadReviews(city) {
   const list = document.getElementById('reviews-list');
   list.innerHTML = '<p class="text-gray-400 text-center">Loading reviews...</p>';
+  loadReviewSummary(city);
 
   try {
-    const res = await fetch(`${apiBase}/reviews/${city}`);
+    const res = await fetch(`${apiBase}/reviews/${city}?limit=50&fields=id,review_text,rating,likes`);
     const reviews = await res.json();
 
     list.innerHTML = '';
@@ -588,10 +629,9 @@ async function loadReviews(city) {
       div.innerHTML = `
                <div class="flex-grow">
                    <div class="flex items-center gap-2 mb-1">
-                       <span class="font-bold text-gray-900">₹${rev.rent_amount.toLocaleString('en-IN')}</span>
-                       <span class="text-xs bg-gray-200 px-2 py-0.5 rounded text-gray-600">${rev.property_type}</span>
+                       <span class="font-bold text-yellow-500">${'★'.repeat(rev.rating)}${'☆'.repeat(5 - rev.rating)}</span>
                    </div>
-                   <p class="text-sm text-gray-600 italic">"${rev.comment}"</p>
+                   <p class="text-sm text-gray-600 italic">"${rev.review_text}"</p>
                </div>
                <div class="ml-4 flex flex-col items-center">
                    <button onclick="likeReview(${rev.id})" class="text-gray-400 hover:text-red-500 transition text-lg">
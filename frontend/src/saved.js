@@ -1,12 +1,39 @@
 // Saved Properties Logic (API-based)
 window.savedProperties = [];
 
+const SAVED_FIELDS = 'listing_id,name,price,area,city,image,type';
+const SYNC_DELAY_MS = 400;
+
+// Anonymous per-browser id; the backend keeps saved properties per X-User-Id
+function savedUserId() {
+  let id = localStorage.getItem('savedUserId');
+  if (!id) {
+    id = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem('savedUserId', id);
+  }
+  return id;
+}
+
+const savedHeaders = { 'X-User-Id': savedUserId() };
+
 // Initialize
 (async function initSaved() {
   try {
-    const res = await fetch(`${apiBase}/saved-properties`);
+    // Follow the keyset cursor until every saved property is loaded
+    const saved = [];
+    let cursor = null;
+    let res;
+    do {
+      const params = new URLSearchParams({ limit: '200', fields: SAVED_FIELDS });
+      if (cursor) params.set('cursor', cursor);
+      res = await fetch(`${apiBase}/saved-properties?${params}`, { headers: savedHeaders });
+      if (!res.ok) break;
+      saved.push(...await res.json());
+      cursor = res.headers.get('X-Next-Cursor');
+    } while (cursor);
+
     if (res.ok) {
-      window.savedProperties = await res.json();
+      window.savedProperties = saved;
       // Render if on saved page
       if (window.location.hash === '#saved') renderSaved();
       // Update buttons on current page (if any)
@@ -17,25 +44,62 @@ window.savedProperties = [];
   }
 })();
 
-window.toggleSave = async function (listingId, name, price, area, city, image, type) {
+// Changes made in quick succession are sent together to /saved-properties/batch
+const pendingSaves = new Map(); // listing_id -> property
+const pendingDeletes = new Set();
+let syncTimer = null;
+
+function scheduleSync() {
+  clearTimeout(syncTimer);
+  syncTimer = setTimeout(syncSaved, SYNC_DELAY_MS);
+}
+
+async function syncSaved() {
+  if (pendingSaves.size === 0 && pendingDeletes.size === 0) return;
+  const save = [...pendingSaves.values()];
+  const del = [...pendingDeletes];
+  pendingSaves.clear();
+  pendingDeletes.clear();
+
+  try {
+    const res = await fetch(`${apiBase}/saved-properties/batch`, {
+      method: 'POST',
+      headers: { ...savedHeaders, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ save, delete: del })
+    });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+  } catch (e) {
+    console.error("Failed to sync saved properties:", e);
+    // Keep the changes for the next attempt unless newer ones replaced them
+    save.forEach(p => { if (!pendingDeletes.has(p.listing_id)) pendingSaves.set(p.listing_id, p); });
+    del.forEach(id => { if (!pendingSaves.has(id)) pendingDeletes.add(id); });
+    alert("Failed to sync saved properties. Check connection.");
+  }
+}
+
+window.addEventListener('pagehide', () => {
+  if (pendingSaves.size === 0 && pendingDeletes.size === 0) return;
+  // Flush on navigation away; keepalive lets the request outlive the page
+  fetch(`${apiBase}/saved-properties/batch`, {
+    method: 'POST',
+    keepalive: true,
+    headers: { ...savedHeaders, 'Content-Type': 'application/json' },
+    body: JSON.stringify({ save: [...pendingSaves.values()], delete: [...pendingDeletes] })
+  });
+});
+
+window.toggleSave = function (listingId, name, price, area, city, image, type) {
   const idStr = String(listingId);
-  console.log('Toggling save for:', idStr);
   const existingIndex = window.savedProperties.findIndex(p => String(p.listing_id) === idStr);
 
+  // Optimistic UI update; the backend catches up on the next sync
   if (existingIndex !== -1) {
-    // Remove from Backend
-    try {
-      await fetch(`${apiBase}/saved-properties/${idStr}`, { method: 'DELETE' });
-      // Optimistic UI Update
-      window.savedProperties.splice(existingIndex, 1);
-      updateSaveButton(listingId, false);
-      if (window.location.hash === '#saved') renderSaved();
-    } catch (e) {
-      console.error("Failed to remove saved property:", e);
-      alert("Failed to unsave. Check connection.");
-    }
+    window.savedProperties.splice(existingIndex, 1);
+    pendingSaves.delete(idStr);
+    pendingDeletes.add(idStr);
+    updateSaveButton(listingId, false);
+    if (window.location.hash === '#saved') renderSaved();
   } else {
-    // Add to Backend
     const newProp = {
       listing_id: idStr,
       name,
@@ -45,24 +109,12 @@ window.toggleSave = async function (listingId, name, price, area, city, image, t
       image,
       type
     };
-
-    try {
-      const res = await fetch(`${apiBase}/saved-properties`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(newProp)
-      });
-
-      if (res.ok) {
-        const savedProp = await res.json();
-        window.savedProperties.push(savedProp);
-        updateSaveButton(listingId, true);
-      }
-    } catch (e) {
-      console.error("Failed to save property:", e);
-      alert("Failed to save. Check connection.");
-    }
+    window.savedProperties.push(newProp);
+    pendingDeletes.delete(idStr);
+    pendingSaves.set(idStr, newProp);
+    updateSaveButton(listingId, true);
   }
+  scheduleSync();
 };
 
 window.isSaved = function (listingId) {